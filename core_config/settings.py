@@ -146,6 +146,21 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # La URL base para acceder a esos archivos subidos
 MEDIA_URL = '/media/'
 
+# Archivos generados por la app que se pueden regenerar en cualquier momento
+# (snapshots del catálogo de perfiles, etc.). No se versionan en git.
+CACHE_ROOT = BASE_DIR / 'cache'
+
+# Caché de PDFs de cotizaciones (cotizador_app/pdf_cache.py). Al pasar del
+# máximo se borran los PDFs menos descargados.
+PDF_CACHE_BACKEND = 'cotizador_app.pdf_cache.DiskBackend'
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Threads por proceso que pre-renderizan PDFs (cotizador_app/pdf_queue.py).
+# Con 0 los PDFs se renderizan en el request que los pide.
+PDF_RENDER_WORKERS = 2
+# Procesos que renderizan los PDFs del comando exportar_pdfs. La exportación
+# desde la web renderiza en el request, sin procesos extra.
+PDF_EXPORT_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
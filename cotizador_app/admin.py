@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Cotizacion, MaterialEstructural, CostoAdicional, SeccionMaterial
+from .models import Carpeta, Cotizacion, MaterialEstructural, CostoAdicional, SeccionMaterial
+from .signals import aplazar_actualizaciones
 
 class MaterialEstructuralInline(admin.TabularInline):
     model = MaterialEstructural
@@ -16,10 +17,21 @@ class SeccionMaterialInline(admin.TabularInline):
 
 @admin.register(Cotizacion)
 class CotizacionAdmin(admin.ModelAdmin):
-    list_display = ('id', 'proyecto_nombre', 'cliente', 'total_costo', 'fecha_creacion')
-    list_filter = ('fecha_creacion', 'cliente')
+    list_display = ('id', 'proyecto_nombre', 'cliente', 'estado', 'carpeta', 'total_costo', 'fecha_creacion')
+    list_filter = ('estado', 'carpeta', 'fecha_creacion', 'cliente')
     search_fields = ('proyecto_nombre', 'cliente__nombre')
     inlines = [SeccionMaterialInline, MaterialEstructuralInline, CostoAdicionalInline]
+    readonly_fields = ('total_materiales', 'total_adicional', 'peso_total_kg', 'cant_materiales', 'cant_costos')
+
+    def save_related(self, request, form, formsets, change):
+        # Los inlines guardan ítem por ítem: totales e índice se actualizan una sola vez
+        with aplazar_actualizaciones():
+            super().save_related(request, form, formsets, change)
+
+@admin.register(Carpeta)
+class CarpetaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'orden', 'fecha_creacion')
+    search_fields = ('nombre',)
 
 @admin.register(SeccionMaterial)
 class SeccionMaterialAdmin(admin.ModelAdmin):
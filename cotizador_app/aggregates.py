@@ -0,0 +1,216 @@
+"""
+Agregados almacenados de cotizaciones y secciones, y conteos por carpeta y
+estado.
+
+Cotizacion y SeccionMaterial guardan sus totales (valor de materiales,
+costos adicionales, peso y conteos de ítems) para que el listado no tenga
+que cargar todos los materiales de cada cotización. Este módulo los
+recalcula en la BD con un UPDATE ... SET campo = (SELECT SUM(...)) por
+tabla (las expresiones de CotizacionQuerySet / SeccionMaterialQuerySet),
+así que recalcular una cotización o diez mil cuesta lo mismo en consultas.
+
+Quién los mantiene:
+
+- signals.py: save/delete de MaterialEstructural y CostoAdicional (admin,
+  shell, vistas que guardan de a uno)
+- Las vistas que usan bulk_create llaman a recalcular_totales() al final
+- editor.py los ajusta con las diferencias de cada edición
+  (ajustar_totales)
+- El comando recalcular_totales reconstruye o verifica todo en lotes
+
+Los valores usan las mismas reglas que MaterialEstructural.total_value y
+peso_total: valor = cant_a_comprar × METROS_POR_BARRA × valor_unitario_m,
+peso = largo_m × peso_kg_m.
+
+Los conteos de ConteoCotizaciones se mantienen con incrementar_conteo()
+(+1/-1 por cotización) y se reconstruyen con recalcular_conteos().
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, When
+
+from .models import ConteoCotizaciones, Cotizacion, SeccionMaterial
+
+
+def recalcular_totales(cotizacion_ids=None):
+    """
+    Recalcula los agregados de las cotizaciones indicadas y de todas sus
+    secciones (None = todas). Dos UPDATE en total.
+
+    Conviene llamarla dentro de la misma transacción que modificó los
+    ítems, para que los totales nunca queden desfasados.
+
+    Returns:
+        Cantidad de cotizaciones actualizadas
+    """
+    cotizaciones = Cotizacion.objects.all()
+    secciones = SeccionMaterial.objects.all()
+    if cotizacion_ids is not None:
+        cotizacion_ids = list(cotizacion_ids)
+        if not cotizacion_ids:
+            return 0
+        cotizaciones = cotizaciones.filter(pk__in=cotizacion_ids)
+        secciones = secciones.filter(cotizacion_id__in=cotizacion_ids)
+
+    secciones.update(**SeccionMaterial.objects.expresiones_totales())
+    return cotizaciones.update(**Cotizacion.objects.expresiones_totales())
+
+
+# Sumas que la columna redondea (largo × peso a 3 decimales, cantidad ×
+# valor a 2): sumarles diferencias acumularía el error de redondeo de cada
+# edición, así que ajustar_totales las vuelve a sumar
+_CAMPOS_REDONDEADOS = ('peso_total_kg', 'total_adicional')
+
+
+def ajustar_totales(cotizacion_id, delta, deltas_secciones=None):
+    """
+    Suma diferencias a los agregados de una cotización y de sus secciones
+    en vez de recalcularlos desde todos sus ítems.
+
+    Los valores de materiales y los conteos son exactos a la escala de la
+    columna y se ajustan con F() + diferencia. Los de _CAMPOS_REDONDEADOS
+    se recalculan, pero solo para esta cotización y las secciones
+    afectadas. Dos UPDATE en total.
+
+    Args:
+        cotizacion_id: Cotización editada
+        delta: {campo: diferencia} para Cotizacion (un campo de
+            _CAMPOS_REDONDEADOS presente se recalcula, sea cual sea su valor)
+        deltas_secciones: {seccion_id: {campo: diferencia}} para las
+            secciones cuyos materiales cambiaron
+    """
+    expresiones = Cotizacion.objects.expresiones_totales()
+    campos = {}
+    for campo, diferencia in delta.items():
+        if campo in _CAMPOS_REDONDEADOS:
+            campos[campo] = expresiones[campo]
+        elif diferencia:
+            campos[campo] = F(campo) + diferencia
+    if campos:
+        Cotizacion.objects.filter(pk=cotizacion_id).update(**campos)
+
+    deltas_secciones = {pk: cambios for pk, cambios in (deltas_secciones or {}).items() if pk is not None}
+    if not deltas_secciones:
+        return
+    expresiones = SeccionMaterial.objects.expresiones_totales()
+    campos = {}
+    for campo in SeccionMaterial.CAMPOS_AGREGADOS:
+        if campo in _CAMPOS_REDONDEADOS:
+            campos[campo] = expresiones[campo]
+            continue
+        # Una diferencia distinta por sección en un solo UPDATE
+        casos = [
+            When(pk=pk, then=F(campo) + cambios[campo])
+            for pk, cambios in deltas_secciones.items() if cambios.get(campo)
+        ]
+        if casos:
+            campos[campo] = Case(*casos, default=F(campo), output_field=SeccionMaterial._meta.get_field(campo))
+    SeccionMaterial.objects.filter(pk__in=deltas_secciones, cotizacion_id=cotizacion_id).update(**campos)
+
+
+def totales_desalineados(cotizacion_ids=None):
+    """
+    Compara los agregados almacenados con los calculados desde los ítems.
+
+    Returns:
+        Lista de (instancia, campo, almacenado, esperado) con las diferencias
+    """
+    diferencias = []
+    consultas = [
+        (Cotizacion.objects.all(), Cotizacion.CAMPOS_AGREGADOS, Cotizacion.objects.expresiones_totales(), 'pk__in'),
+        (SeccionMaterial.objects.all(), SeccionMaterial.CAMPOS_AGREGADOS, SeccionMaterial.objects.expresiones_totales(), 'cotizacion_id__in'),
+    ]
+    for queryset, campos, expresiones, filtro in consultas:
+        if cotizacion_ids is not None:
+            queryset = queryset.filter(**{filtro: list(cotizacion_ids)})
+        anotaciones = {f'_esperado_{campo}': expresion for campo, expresion in expresiones.items()}
+        for instancia in queryset.order_by().annotate(**anotaciones):
+            for campo in campos:
+                almacenado = getattr(instancia, campo)
+                esperado = _redondear(queryset.model._meta.get_field(campo), getattr(instancia, f'_esperado_{campo}'))
+                if almacenado != esperado:
+                    diferencias.append((instancia, campo, almacenado, esperado))
+    return diferencias
+
+
+def _redondear(field, valor):
+    """
+    Lleva el valor calculado a la escala de la columna, como al guardarlo
+    (la BD redondea SUM(largo × peso) a 3 decimales al escribirlo).
+    """
+    if isinstance(field, DecimalField) and valor is not None:
+        return Decimal(valor).quantize(Decimal(1).scaleb(-field.decimal_places), context=field.context)
+    return valor
+
+
+def incrementar_conteo(clave, delta):
+    """Suma 'delta' al conteo de clave = (carpeta_id, estado)."""
+    carpeta_id, estado = clave
+    conteos = ConteoCotizaciones.objects.filter(carpeta_id=carpeta_id, estado=estado)
+    if conteos.update(cantidad=F('cantidad') + delta):
+        return
+    try:
+        # Savepoint: si otra transacción creó la fila entre medio, el
+        # IntegrityError no invalida la transacción externa
+        with transaction.atomic():
+            ConteoCotizaciones.objects.create(carpeta_id=carpeta_id, estado=estado, cantidad=delta)
+    except IntegrityError:
+        conteos.update(cantidad=F('cantidad') + delta)
+
+
+def mover_conteos_a_sin_carpeta(carpeta_id):
+    """Al borrar una carpeta sus cotizaciones quedan sin carpeta (SET_NULL)."""
+    for conteo in ConteoCotizaciones.objects.filter(carpeta_id=carpeta_id):
+        incrementar_conteo((ConteoCotizaciones.SIN_CARPETA, conteo.estado), conteo.cantidad)
+        conteo.delete()
+
+
+def _conteos_reales():
+    rows = Cotizacion.objects.order_by().values('carpeta_id', 'estado').annotate(cantidad=Count('id'))
+    return {
+        (row['carpeta_id'] or ConteoCotizaciones.SIN_CARPETA, row['estado']): row['cantidad']
+        for row in rows
+    }
+
+
+def recalcular_conteos():
+    """Reconstruye ConteoCotizaciones con un GROUP BY sobre Cotizacion."""
+    ConteoCotizaciones.objects.all().delete()
+    ConteoCotizaciones.objects.bulk_create([
+        ConteoCotizaciones(carpeta_id=carpeta_id, estado=estado, cantidad=cantidad)
+        for (carpeta_id, estado), cantidad in _conteos_reales().items()
+    ])
+
+
+def conteos_desalineados():
+    """Lista de ((carpeta_id, estado), almacenado, real) que no coinciden."""
+    reales = _conteos_reales()
+    almacenados = {
+        (conteo.carpeta_id, conteo.estado): conteo.cantidad
+        for conteo in ConteoCotizaciones.objects.all()
+    }
+    return [
+        (clave, almacenados.get(clave, 0), reales.get(clave, 0))
+        for clave in sorted(set(reales) | set(almacenados))
+        if almacenados.get(clave, 0) != reales.get(clave, 0)
+    ]
+
+
+def resumen_conteos():
+    """
+    Conteos para los filtros del listado, desde ConteoCotizaciones.
+
+    Returns:
+        {'total', 'por_estado': {estado: n}, 'por_carpeta': {carpeta_id: n}}
+        (carpeta_id = ConteoCotizaciones.SIN_CARPETA para "Sin Carpeta")
+    """
+    resumen = {'total': 0, 'por_estado': {}, 'por_carpeta': {}}
+    # Las filas que llegaron a 0 se conservan para el próximo incremento
+    conteos = ConteoCotizaciones.objects.exclude(cantidad=0)
+    for carpeta_id, estado, cantidad in conteos.values_list('carpeta_id', 'estado', 'cantidad'):
+        resumen['total'] += cantidad
+        resumen['por_estado'][estado] = resumen['por_estado'].get(estado, 0) + cantidad
+        resumen['por_carpeta'][carpeta_id] = resumen['por_carpeta'].get(carpeta_id, 0) + cantidad
+    return resumen
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CotizadorAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cotizador_app'
+
+    def ready(self):
+        # Registra los receivers que mantienen los totales almacenados
+        from . import signals  # noqa: F401
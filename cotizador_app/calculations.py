@@ -0,0 +1,235 @@
+"""
+Motor de cálculo de cotizaciones (equivalente en servidor del
+CalculationEngine de crear_cotizacion.html).
+
+El navegador calcula barras, pesos y totales para mostrarlos mientras el
+usuario arma la cotización, pero al guardar no confiamos en esos números:
+se recalculan aquí a partir de los cortes originales de cada perfil.
+
+Para cada material:
+
+    largo_m          = Σ largo del corte × cantidad de piezas
+    unidad_comercial = largo_m / METROS_POR_BARRA
+    cant_necesaria   = ⌈unidad_comercial⌉
+    cant_a_comprar   = ⌈cant_necesaria × MARGEN_SEGURIDAD⌉
+    peso_total       = largo_m × peso_kg_m
+    valor_total      = cant_a_comprar × METROS_POR_BARRA × valor_unitario_m
+
+Los cortes de todos los ítems se procesan en una sola pasada con
+aritmética entera en milímetros: los redondeos hacia arriba son exactos
+(sin los 6.000000001 m que produce el punto flotante) y miles de cortes se
+calculan en pocos milisegundos.
+"""
+
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from fractions import Fraction
+
+from .constants import MARGEN_SEGURIDAD, METROS_POR_BARRA
+
+MM_POR_METRO = 1000
+MM_POR_BARRA = int(METROS_POR_BARRA * MM_POR_METRO)
+
+# Margen como fracción exacta (1.25 -> 5/4) para redondear con enteros
+_MARGEN = Fraction(MARGEN_SEGURIDAD)
+
+_CENTAVOS = Decimal('0.01')
+_GRAMOS = Decimal('0.001')
+_PESOS = Decimal('1')
+
+# Resultado por material, con los nombres de campo de MaterialEstructural
+MaterialCalculado = namedtuple('MaterialCalculado', [
+    'profile_id',
+    'material_nombre',
+    'seccion_id',
+    'cortes',
+    'largo_m',
+    'unidad_comercial',
+    'cant_necesaria',
+    'cant_a_comprar',
+    'peso_kg_m',
+    'valor_unitario_m',
+    'peso_total',
+    'valor_total',
+])
+
+CotizacionCalculada = namedtuple('CotizacionCalculada', [
+    'materiales',
+    'total_estructural',
+    'total_adicional',
+    'total_costo',
+    'peso_total',
+])
+
+
+class CalculationError(ValueError):
+    """Un ítem de la cotización trae datos que no se pueden calcular."""
+
+
+def calcular_barras(largo_mm):
+    """
+    Retorna (cant_necesaria, cant_a_comprar) para un largo total en mm.
+
+    Es la misma regla que calculateBarsToBuy en el navegador.
+    """
+    necesarias = -(-largo_mm // MM_POR_BARRA)
+    a_comprar = -(-necesarias * _MARGEN.numerator // _MARGEN.denominator)
+    return necesarias, a_comprar
+
+
+def calcular_cotizacion(structural_items, overhead_items=()):
+    """
+    Recalcula todos los materiales estructurales y los totales de una
+    cotización a partir de los datos crudos que envía el formulario.
+
+    Cada ítem estructural trae 'cortes' ([{largo_m, cantidad}, ...]).
+    Los ítems antiguos sin 'cortes' se interpretan como un solo corte de
+    'largo_m'.
+
+    Raises:
+        CalculationError: Si algún ítem trae valores negativos o no numéricos
+    """
+    if not isinstance(structural_items, (list, tuple)) or not isinstance(overhead_items, (list, tuple)):
+        raise CalculationError("Los ítems de la cotización deben ser listas")
+
+    # 1. Aplanamos los cortes de todos los ítems y acumulamos los mm por ítem
+    largos_mm = [0] * len(structural_items)
+    cortes_normalizados = [[] for _ in structural_items]
+
+    for indice, item in enumerate(structural_items):
+        if not isinstance(item, dict):
+            raise CalculationError(f"Ítem estructural #{indice + 1} inválido")
+
+        for largo_mm, cantidad in cortes_mm(item, indice):
+            largos_mm[indice] += largo_mm * cantidad
+            cortes_normalizados[indice].append({'largo_m': largo_mm / MM_POR_METRO, 'cantidad': cantidad})
+
+    # 2. Con los totales por ítem calculamos barras, pesos y valores
+    materiales = []
+    for indice, item in enumerate(structural_items):
+        largo_mm = largos_mm[indice]
+        necesarias, a_comprar = calcular_barras(largo_mm)
+
+        largo_m = Decimal(largo_mm) / MM_POR_METRO
+        # Redondeamos a la precisión de las columnas de MaterialEstructural
+        # antes de multiplicar, para que los totales calcen con lo guardado
+        peso_kg_m = _decimal(item.get('peso_kg_m', 0), f"peso del ítem #{indice + 1}") \
+            .quantize(_GRAMOS, ROUND_HALF_UP)
+        valor_unitario_m = _decimal(item.get('valor_unitario_m', 0), f"valor del ítem #{indice + 1}") \
+            .quantize(_CENTAVOS, ROUND_HALF_UP)
+
+        materiales.append(MaterialCalculado(
+            profile_id=_profile_id(item.get('profile_id')),
+            material_nombre=item.get('material_nombre', ''),
+            seccion_id=item.get('seccion_id'),
+            cortes=cortes_normalizados[indice],
+            largo_m=largo_m.quantize(_CENTAVOS, ROUND_HALF_UP),
+            unidad_comercial=(Decimal(largo_mm) / MM_POR_BARRA).quantize(_CENTAVOS, ROUND_HALF_UP),
+            cant_necesaria=necesarias,
+            cant_a_comprar=a_comprar,
+            peso_kg_m=peso_kg_m,
+            valor_unitario_m=valor_unitario_m,
+            peso_total=(largo_m * peso_kg_m).quantize(_GRAMOS, ROUND_HALF_UP),
+            valor_total=a_comprar * METROS_POR_BARRA * valor_unitario_m,
+        ))
+
+    total_estructural = sum((material.valor_total for material in materiales), Decimal(0))
+    total_adicional = sum(
+        (
+            _decimal(item.get('cantidad', 1), 'cantidad de costo adicional')
+            * _decimal(item.get('valor_unitario', 0), 'valor de costo adicional')
+            for item in overhead_items
+            if isinstance(item, dict)
+        ),
+        Decimal(0),
+    )
+
+    return CotizacionCalculada(
+        materiales=materiales,
+        total_estructural=total_estructural,
+        total_adicional=total_adicional,
+        # total_costo se guarda sin decimales (pesos chilenos)
+        total_costo=(total_estructural + total_adicional).quantize(_PESOS, ROUND_HALF_UP),
+        peso_total=sum((material.peso_total for material in materiales), Decimal(0)),
+    )
+
+
+def cortes_mm(item, indice=0):
+    """
+    Cortes de un ítem estructural como [(largo_mm, cantidad), ...].
+
+    Raises:
+        CalculationError: Si algún corte trae valores negativos o no numéricos
+    """
+    cortes = []
+    for corte in _cortes_de(item):
+        largo_mm = _milimetros(corte.get('largo_m'), indice)
+        cantidad = corte.get('cantidad', 1)
+        if type(cantidad) is not int or cantidad < 0:
+            cantidad = _entero(cantidad, f"cantidad del ítem #{indice + 1}")
+        cortes.append((largo_mm, cantidad))
+    return cortes
+
+
+def material_como_json(material):
+    """Snapshot de un material calculado para structural_items_json."""
+    return {
+        'profile_id': material.profile_id,
+        'material_nombre': material.material_nombre,
+        'seccion_id': material.seccion_id,
+        'cortes': material.cortes,
+        'largo_m': float(material.largo_m),
+        'unidad_comercial': float(material.unidad_comercial),
+        'cant_necesaria': material.cant_necesaria,
+        'cant_a_comprar': material.cant_a_comprar,
+        'peso_kg_m': float(material.peso_kg_m),
+        'valor_unitario_m': float(material.valor_unitario_m),
+        'peso_total': float(material.peso_total),
+        'valor_total': float(material.valor_total),
+    }
+
+
+def _cortes_de(item):
+    cortes = item.get('cortes')
+    if cortes is None:
+        # Formato anterior: un único largo por ítem
+        return [{'largo_m': item.get('largo_m', 0), 'cantidad': 1}]
+    if not isinstance(cortes, list):
+        raise CalculationError("'cortes' debe ser una lista")
+    return [corte if isinstance(corte, dict) else {'largo_m': None} for corte in cortes]
+
+
+def _profile_id(value):
+    """El id del perfil es solo una referencia: si no es un entero se descarta."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _milimetros(largo_m, indice):
+    """Largo en metros -> mm enteros."""
+    if type(largo_m) in (int, float) and 0 <= largo_m < float('inf'):
+        # Camino rápido para lo que envía el navegador: round() absorbe el
+        # error de representación (2.35 * 1000 = 2350.0000000000005)
+        return round(largo_m * MM_POR_METRO)
+    largo = _decimal(largo_m, f"largo del ítem #{indice + 1}")
+    return int((largo * MM_POR_METRO).to_integral_value(ROUND_HALF_UP))
+
+
+def _decimal(value, campo):
+    """Convierte a Decimal no negativo (vía str para no arrastrar error de float)."""
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise CalculationError(f"Valor no numérico en {campo}: {value!r}")
+    if not number.is_finite() or number < 0:
+        raise CalculationError(f"Valor inválido en {campo}: {value!r}")
+    return number
+
+
+def _entero(value, campo):
+    number = _decimal(value, campo)
+    if number != number.to_integral_value():
+        raise CalculationError(f"Se esperaba un entero en {campo}: {value!r}")
+    return int(number)
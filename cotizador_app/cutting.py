@@ -0,0 +1,371 @@
+"""
+Optimizador de cortes (cutting stock) para la compra de barras.
+
+calculations.py estima las barras como ⌈metros totales / 6⌉, como si los
+cortes se pudieran empalmar. En la práctica cada corte debe salir entero
+de una barra, así que ese número puede quedarse corto (muchos cortes de
+3.5 m: uno por barra) o sobrar. Este módulo arma el plan de corte real:
+
+1. Best-Fit Decreasing (BFD): cada corte, de mayor a menor, va a la barra
+   abierta donde deja menos sobrante. Con las barras ordenadas por sobrante
+   y bisect cuesta O(n log b), así que decenas de miles de cortes se
+   resuelven en milisegundos.
+
+2. Si BFD no alcanza la cota inferior (L2 de Martello-Toth), se intenta
+   mejorar dentro de un presupuesto de tiempo:
+
+   - Patrones de máximo llenado (Minimum Bin Slack): en cada paso se busca,
+     con una mochila acotada sobre bitsets, la combinación de cortes
+     pendientes que más llena una barra junto al corte más largo, y se
+     repite mientras la demanda lo permita.
+   - Vaciado de barras: se toma la barra con más sobrante y se intenta
+     repartir sus cortes en las demás, intercambiando un corte por otro
+     más corto cuando no hay espacio directo.
+
+Los largos se manejan en mm enteros y el plan se agrupa en patrones
+(barras idénticas + repeticiones).
+"""
+
+import bisect
+import time
+from collections import Counter, namedtuple
+
+from .constants import METROS_POR_BARRA
+
+LARGO_BARRA_MM = int(METROS_POR_BARRA * 1000)
+
+# Presupuesto por defecto para la fase de mejora (segundos)
+TIEMPO_MAXIMO_S = 0.25
+
+# Patrón de corte: los cortes (mm, de mayor a menor) de una barra y cuántas
+# barras se cortan igual
+Patron = namedtuple('Patron', ['cortes_mm', 'repeticiones', 'desperdicio_mm'])
+
+PlanCorte = namedtuple('PlanCorte', [
+    'largo_barra_mm',
+    'barras',
+    'piezas',
+    'largo_cortes_mm',
+    'desperdicio_mm',
+    'cota_inferior',
+    'optimo',
+    'metodo',
+    'patrones',
+])
+
+
+class CuttingError(ValueError):
+    """La lista de cortes no se puede planificar (ej. un corte más largo que la barra)."""
+
+
+def optimizar_cortes(cortes, largo_barra_mm=LARGO_BARRA_MM, kerf_mm=0, tiempo_maximo=TIEMPO_MAXIMO_S):
+    """
+    Calcula el plan de corte para una lista de cortes de un mismo perfil.
+
+    Args:
+        cortes: Iterable de (largo_mm, cantidad)
+        largo_barra_mm: Largo de la barra comercial
+        kerf_mm: Material que se pierde en cada corte (espesor de la sierra)
+        tiempo_maximo: Segundos disponibles para mejorar el plan BFD
+
+    Returns:
+        PlanCorte
+
+    Raises:
+        CuttingError: Si un corte no cabe en una barra o los datos son inválidos
+    """
+    limite = time.perf_counter() + tiempo_maximo
+    demanda = _normalizar(cortes, largo_barra_mm)
+
+    # Con kerf: cada corte consume largo + kerf y la barra "mide" largo + kerf
+    # (el último corte de la barra no necesita pasada de sierra)
+    capacidad = largo_barra_mm + kerf_mm
+    pesos = {largo: largo + kerf_mm for largo in demanda}
+    for largo, peso in pesos.items():
+        if peso > capacidad:
+            raise CuttingError(f"El corte de {largo} mm no cabe en una barra de {largo_barra_mm} mm")
+
+    piezas = sum(demanda.values())
+    largo_cortes = sum(largo * cantidad for largo, cantidad in demanda.items())
+    cota_inferior = _cota_inferior(demanda, pesos, capacidad)
+
+    barras = _best_fit_decreasing(demanda, pesos, capacidad)
+    metodo = 'bfd'
+
+    if len(barras) > cota_inferior:
+        patrones = _patrones_maximo_llenado(demanda, pesos, capacidad, limite)
+        if len(patrones) < len(barras):
+            barras = patrones
+            metodo = 'patrones'
+
+    if len(barras) > cota_inferior:
+        vaciadas = _vaciar_barras(barras, pesos, capacidad, cota_inferior, limite)
+        if len(vaciadas) < len(barras):
+            barras = vaciadas
+            metodo += '+vaciado'
+
+    total_barras = len(barras)
+    return PlanCorte(
+        largo_barra_mm=largo_barra_mm,
+        barras=total_barras,
+        piezas=piezas,
+        largo_cortes_mm=largo_cortes,
+        desperdicio_mm=total_barras * largo_barra_mm - largo_cortes,
+        cota_inferior=cota_inferior,
+        optimo=total_barras == cota_inferior,
+        metodo=metodo,
+        patrones=_agrupar_patrones(barras, largo_barra_mm),
+    )
+
+
+def plan_como_json(plan):
+    """Representación JSON del plan (para la API)."""
+    return {
+        'largo_barra_mm': plan.largo_barra_mm,
+        'barras': plan.barras,
+        'piezas': plan.piezas,
+        'largo_cortes_mm': plan.largo_cortes_mm,
+        'desperdicio_mm': plan.desperdicio_mm,
+        'desperdicio_pct': round(100 * plan.desperdicio_mm / (plan.barras * plan.largo_barra_mm), 2)
+        if plan.barras else 0.0,
+        'cota_inferior': plan.cota_inferior,
+        'optimo': plan.optimo,
+        'metodo': plan.metodo,
+        'patrones': [
+            {
+                'cortes_mm': list(patron.cortes_mm),
+                'repeticiones': patron.repeticiones,
+                'desperdicio_mm': patron.desperdicio_mm,
+            }
+            for patron in plan.patrones
+        ],
+    }
+
+
+def _normalizar(cortes, largo_barra_mm):
+    if largo_barra_mm <= 0:
+        raise CuttingError("El largo de la barra debe ser positivo")
+
+    demanda = Counter()
+    for largo, cantidad in cortes:
+        if largo <= 0 or cantidad < 0:
+            raise CuttingError(f"Corte inválido: {cantidad} × {largo} mm")
+        if cantidad:
+            demanda[largo] += cantidad
+    return demanda
+
+
+def _cota_inferior(demanda, pesos, capacidad):
+    """
+    Cota L2 de Martello-Toth: ninguna solución puede usar menos barras.
+
+    Para cada umbral k <= capacidad/2, los cortes > capacidad - k van solos,
+    los > capacidad/2 no comparten barra entre sí, y los cortes entre k y
+    capacidad/2 deben caber en lo que sobra de éstos o en barras nuevas.
+    Se evalúa con sumas acumuladas sobre los pesos ordenados.
+    """
+    ordenados = sorted(pesos[largo] for largo in demanda)
+    cantidades = [0]
+    sumas = [0]
+    peso_a_largo = {pesos[largo]: largo for largo in demanda}
+    for peso in ordenados:
+        cantidad = demanda[peso_a_largo[peso]]
+        cantidades.append(cantidades[-1] + cantidad)
+        sumas.append(sumas[-1] + peso * cantidad)
+
+    def rango(desde, hasta):
+        """(cantidad, suma) de los cortes con desde < peso <= hasta."""
+        i = bisect.bisect_right(ordenados, desde)
+        j = bisect.bisect_right(ordenados, hasta)
+        return cantidades[j] - cantidades[i], sumas[j] - sumas[i]
+
+    mitad = capacidad // 2
+    mejor = -(-sumas[-1] // capacidad)
+    for k in [0] + [peso for peso in ordenados if peso <= mitad]:
+        n1, _ = rango(capacidad - k, capacidad)
+        n2, s2 = rango(mitad, capacidad - k)
+        _, s3 = rango(k - 1, mitad)
+        espacio_libre = n2 * capacidad - s2
+        mejor = max(mejor, n1 + n2 + max(0, -(-(s3 - espacio_libre) // capacidad)))
+    return mejor
+
+
+def _best_fit_decreasing(demanda, pesos, capacidad):
+    """
+    BFD con las barras abiertas ordenadas por sobrante.
+
+    'sobrantes' es una lista ordenada de (sobrante, índice de barra): el
+    primer sobrante >= peso es la barra donde el corte deja menos espacio.
+    """
+    barras = []
+    sobrantes = []
+
+    for largo in sorted(demanda, reverse=True):
+        peso = pesos[largo]
+        for _ in range(demanda[largo]):
+            posicion = bisect.bisect_left(sobrantes, (peso, -1))
+            if posicion < len(sobrantes):
+                sobrante, indice = sobrantes.pop(posicion)
+            else:
+                sobrante, indice = capacidad, len(barras)
+                barras.append([])
+
+            barras[indice].append(largo)
+            sobrante -= peso
+            if sobrante > 0:
+                bisect.insort(sobrantes, (sobrante, indice))
+
+    return barras
+
+
+def _patrones_maximo_llenado(demanda, pesos, capacidad, limite):
+    """
+    Heurística secuencial: repite la combinación que más llena una barra.
+
+    Si se agota el tiempo, lo que queda se completa con BFD.
+    """
+    pendiente = Counter(demanda)
+    barras = []
+
+    while pendiente:
+        if time.perf_counter() > limite:
+            barras.extend(_best_fit_decreasing(pendiente, pesos, capacidad))
+            break
+
+        patron = _mejor_patron(pendiente, pesos, capacidad)
+        uso = Counter(patron)
+        repeticiones = min(pendiente[largo] // cantidad for largo, cantidad in uso.items())
+
+        barras.extend([list(patron) for _ in range(repeticiones)])
+        for largo, cantidad in uso.items():
+            pendiente[largo] -= cantidad * repeticiones
+            if not pendiente[largo]:
+                del pendiente[largo]
+
+    return barras
+
+
+def _mejor_patron(pendiente, pesos, capacidad):
+    """
+    Mochila acotada: la combinación de cortes pendientes que más llena una
+    barra, incluyendo siempre el corte pendiente más largo (como en Minimum
+    Bin Slack: los cortes largos son los difíciles de acomodar al final y
+    así se desempatan los patrones igual de llenos).
+
+    Las sumas alcanzables se guardan como bits de un int (bitset) y cada
+    largo se divide en paquetes 1, 2, 4, ... (división binaria).
+    """
+    mayor = max(pendiente)
+    capacidad -= pesos[mayor]
+
+    mascara = (1 << (capacidad + 1)) - 1
+    alcanzables = 1
+    historia = []  # (largo, copias, bitset antes de agregar el paquete)
+
+    for largo in sorted(pendiente, reverse=True):
+        peso = pesos[largo]
+        disponibles = pendiente[largo] - (largo == mayor)
+        restante = min(disponibles, capacidad // peso)
+        copias = 1
+        while restante:
+            paquete = min(copias, restante)
+            historia.append((largo, paquete, alcanzables))
+            alcanzables = (alcanzables | (alcanzables << (peso * paquete))) & mascara
+            restante -= paquete
+            copias *= 2
+
+    # Reconstrucción: recorremos los paquetes hacia atrás
+    objetivo = alcanzables.bit_length() - 1
+    patron = [mayor]
+    for largo, paquete, anteriores in reversed(historia):
+        if not (anteriores >> objetivo) & 1:
+            patron.extend([largo] * paquete)
+            objetivo -= pesos[largo] * paquete
+    return sorted(patron, reverse=True)
+
+
+def _vaciar_barras(barras, pesos, capacidad, cota_inferior, limite):
+    """
+    Intenta eliminar barras repartiendo sus cortes en las demás.
+
+    Se prueba primero la barra con más sobrante. Cada corte va a la barra
+    con el menor sobrante donde cabe; si no cabe en ninguna, se cambia por
+    el corte más corto que libere el espacio necesario y se sigue con ese
+    (los cortes desplazados son cada vez más cortos, así que no hay ciclos).
+    Si algún corte no se puede ubicar, se deshacen los cambios.
+    """
+    barras = [list(barra) for barra in barras]
+    sobrantes = [capacidad - sum(pesos[largo] for largo in barra) for barra in barras]
+    descartadas = set()
+
+    while len(barras) > cota_inferior and time.perf_counter() < limite:
+        candidatas = [i for i in range(len(barras)) if i not in descartadas]
+        if not candidatas:
+            break
+        vaciar = max(candidatas, key=sobrantes.__getitem__)
+
+        respaldo = {}
+        if all(
+            _reubicar(corte, vaciar, barras, sobrantes, pesos, respaldo, limite)
+            for corte in sorted(barras[vaciar], reverse=True)
+        ):
+            del barras[vaciar]
+            del sobrantes[vaciar]
+            descartadas = set()
+        else:
+            for indice, (cortes, sobrante) in respaldo.items():
+                barras[indice] = cortes
+                sobrantes[indice] = sobrante
+            descartadas.add(vaciar)
+
+    return barras
+
+
+def _reubicar(corte, vaciar, barras, sobrantes, pesos, respaldo, limite):
+    """Ubica 'corte' fuera de la barra 'vaciar'. Retorna False si no fue posible."""
+    while time.perf_counter() < limite:
+        peso = pesos[corte]
+
+        destino = None
+        for indice, sobrante in enumerate(sobrantes):
+            if indice != vaciar and sobrante >= peso and (destino is None or sobrante < sobrantes[destino]):
+                destino = indice
+        if destino is not None:
+            _respaldar(destino, barras, sobrantes, respaldo)
+            barras[destino].append(corte)
+            sobrantes[destino] -= peso
+            return True
+
+        # Sin espacio directo: intercambio por el corte más corto que alcance
+        cambio = None
+        for indice, sobrante in enumerate(sobrantes):
+            if indice == vaciar:
+                continue
+            for otro in barras[indice]:
+                peso_otro = pesos[otro]
+                if peso_otro < peso <= sobrante + peso_otro and (cambio is None or peso_otro < pesos[cambio[1]]):
+                    cambio = (indice, otro)
+        if cambio is None:
+            return False
+
+        indice, otro = cambio
+        _respaldar(indice, barras, sobrantes, respaldo)
+        barras[indice].remove(otro)
+        barras[indice].append(corte)
+        sobrantes[indice] += pesos[otro] - peso
+        corte = otro
+
+    return False
+
+
+def _respaldar(indice, barras, sobrantes, respaldo):
+    if indice not in respaldo:
+        respaldo[indice] = (list(barras[indice]), sobrantes[indice])
+
+
+def _agrupar_patrones(barras, largo_barra_mm):
+    conteo = Counter(tuple(sorted(barra, reverse=True)) for barra in barras)
+    return [
+        Patron(cortes_mm=cortes, repeticiones=repeticiones, desperdicio_mm=largo_barra_mm - sum(cortes))
+        for cortes, repeticiones in sorted(conteo.items(), key=lambda par: (-par[1], par[0]))
+    ]
@@ -0,0 +1,566 @@
+"""
+Edición de cotizaciones guardadas aplicando solo los cambios.
+
+En vez de borrar y recrear todos los materiales y costos (caro en
+cotizaciones grandes y cambia sus ids), el constructor envía un patch con
+lo que cambió; cada parte es opcional:
+
+    {
+        "cotizacion": {"proyecto_nombre": "...", "notas_internas": "...",
+                       "cliente_id": 3, "carpeta_id": null, "estado": "POR_REVISAR"},
+        "secciones": {
+            "agregar":   [{"id": "sec_3", "nombre": "Techo", "orden": 2, "colapsada": false}],
+            "modificar": [{"id": 12, "nombre": "Muros", "colapsada": true}],
+            "orden":     [12, "sec_3", 10],   # ids en el orden nuevo
+            "eliminar":  [11]                 # sus materiales pasan a "General"
+        },
+        "materiales": {
+            "agregar":   [{"material_nombre": "...", "cortes": [...], "seccion_id": 12 | "sec_3" | null, ...}],
+            "modificar": [{"id": 40, "cortes": [...], "valor_unitario_m": 2100}],
+            "eliminar":  [41, 42]
+        },
+        "costos": {
+            "agregar":   [{"descripcion": "Flete", "unidad": "Viaje", "cantidad": 2, "valor_unitario": 85000}],
+            "modificar": [{"id": 7, "cantidad": 3}],
+            "eliminar":  [8]
+        }
+    }
+
+Los materiales agregados o modificados se recalculan con
+calculations.calcular_cotizacion; un material modificado conserva los
+campos que el patch no trae, incluidos sus cortes. Cada tabla se escribe
+con un bulk_create, un bulk_update y un DELETE filtrado, y los agregados
+almacenados se ajustan con las diferencias (aggregates.ajustar_totales) en
+vez de recalcularse desde todos los ítems.
+
+structural_items_json y overhead_items_json se mantienen al día: cada
+entrada lleva el 'id' del material o costo que representa. Las entradas
+de cotizaciones anteriores (sin 'id') se asocian por posición, que es el
+orden en que se crearon los ítems.
+"""
+
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+
+from .aggregates import ajustar_totales
+from .calculations import CalculationError, calcular_cotizacion, material_como_json
+from .constants import METROS_POR_BARRA
+from .importer import ImportacionError, validar_costo, validar_material
+from .models import Carpeta, Cliente, CostoAdicional, Cotizacion, MaterialEstructural, SeccionMaterial
+from .signals import aplazar_actualizaciones
+
+# Campos que un patch puede cambiar en cada parte
+CAMPOS_COTIZACION = ('proyecto_nombre', 'notas_internas', 'cliente_id', 'carpeta_id', 'estado')
+CAMPOS_SECCION = ('nombre', 'orden', 'colapsada')
+CAMPOS_MATERIAL = ('profile_id', 'material_nombre', 'cortes', 'largo_m', 'peso_kg_m', 'valor_unitario_m', 'seccion_id')
+CAMPOS_COSTO = ('descripcion', 'unidad', 'cantidad', 'valor_unitario')
+
+# Columnas que reescribe bulk_update
+_COLUMNAS_MATERIAL = (
+    'seccion', 'profile_id', 'material_nombre', 'largo_m', 'unidad_comercial',
+    'cant_necesaria', 'cant_a_comprar', 'peso_kg_m', 'valor_unitario_m',
+)
+
+ResultadoEdicion = namedtuple('ResultadoEdicion', [
+    'cotizacion',   # Cotizacion con los agregados y total_costo ya ajustados
+    'secciones',    # {id del navegador: id en la BD} de las secciones agregadas
+    'materiales',   # ids de los materiales agregados, en el orden del patch
+    'costos',       # ids de los costos agregados, en el orden del patch
+])
+
+
+class EdicionError(ValueError):
+    """El patch no se puede aplicar a la cotización; no se guarda nada."""
+
+
+def aplicar_cambios(cotizacion_id, patch):
+    """
+    Aplica un patch (ver arriba) a la cotización en una transacción.
+
+    Raises:
+        Cotizacion.DoesNotExist: Si la cotización no existe
+        EdicionError: Si el patch no es válido o nombra ítems de otra cotización
+    """
+    if not isinstance(patch, dict):
+        raise EdicionError('El patch debe ser un objeto')
+    _sin_campos_extra(patch, ('cotizacion', 'secciones', 'materiales', 'costos'), 'patch')
+
+    # totales=False: los agregados se ajustan aquí con las diferencias; el
+    # índice de búsqueda se actualiza igual al salir del bloque
+    with transaction.atomic(), aplazar_actualizaciones(totales=False):
+        # Bloqueamos la cotización: dos ediciones simultáneas no pueden
+        # sumar sus diferencias sobre los mismos agregados a la vez
+        cotizacion = Cotizacion.objects.select_for_update().get(pk=cotizacion_id)
+        edicion = _Edicion(cotizacion)
+        edicion.aplicar_cotizacion(_objeto(patch.get('cotizacion'), 'cotizacion'))
+        secciones = edicion.aplicar_secciones(_objeto(patch.get('secciones'), 'secciones'))
+        materiales = edicion.aplicar_materiales(_objeto(patch.get('materiales'), 'materiales'))
+        costos = edicion.aplicar_costos(_objeto(patch.get('costos'), 'costos'))
+        edicion.guardar()
+
+    return ResultadoEdicion(cotizacion, secciones, materiales, costos)
+
+
+def datos_edicion(cotizacion):
+    """
+    Estado actual de la cotización para cargarlo en el constructor, con los
+    ids que luego usa el patch. Los cortes salen del snapshot.
+    """
+    cortes = {
+        entrada['id']: entrada.get('cortes')
+        for entrada in _snapshot_con_ids(cotizacion.structural_items_json, cotizacion.materiales_estructurales)
+    }
+    materiales = cotizacion.materiales_estructurales.order_by('id')
+    return {
+        'cotizacion': {
+            'id': cotizacion.id,
+            'proyecto_nombre': cotizacion.proyecto_nombre,
+            'notas_internas': cotizacion.notas_internas,
+            'cliente_id': cotizacion.cliente_id,
+            'carpeta_id': cotizacion.carpeta_id,
+            'estado': cotizacion.estado,
+        },
+        'secciones': [
+            {'id': seccion.id, 'nombre': seccion.nombre, 'orden': seccion.orden, 'colapsada': seccion.colapsada}
+            for seccion in cotizacion.secciones.all()
+        ],
+        'materiales': [
+            {
+                'id': material.id,
+                'seccion_id': material.seccion_id,
+                'profile_id': material.profile_id,
+                'material_nombre': material.material_nombre,
+                'cortes': cortes.get(material.id) or [{'largo_m': float(material.largo_m), 'cantidad': 1}],
+                'peso_kg_m': float(material.peso_kg_m),
+                'valor_unitario_m': float(material.valor_unitario_m),
+            }
+            for material in materiales
+        ],
+        'costos': [
+            {
+                'id': costo.id,
+                'descripcion': costo.descripcion,
+                'unidad': costo.unidad,
+                'cantidad': float(costo.cantidad),
+                'valor_unitario': float(costo.valor_unitario),
+            }
+            for costo in cotizacion.costos_adicionales.order_by('id')
+        ],
+    }
+
+
+class _Edicion:
+    """Cambios de un patch y las diferencias que dejan en los agregados."""
+
+    def __init__(self, cotizacion):
+        self.cotizacion = cotizacion
+        self.delta = Counter()
+        self.deltas_secciones = defaultdict(Counter)
+        self.secciones_vigentes = None
+        self.secciones_nuevas = {}
+        self.secciones_eliminadas = set()
+        self.structural = None
+        self.overhead = None
+
+    def aplicar_cotizacion(self, cambios):
+        _sin_campos_extra(cambios, CAMPOS_COTIZACION, 'cotizacion')
+        cotizacion = self.cotizacion
+        if 'proyecto_nombre' in cambios:
+            cotizacion.proyecto_nombre = _texto(cambios['proyecto_nombre'], 'proyecto_nombre', 255)
+            if not cotizacion.proyecto_nombre:
+                raise EdicionError('proyecto_nombre no puede quedar vacío')
+        if 'notas_internas' in cambios:
+            cotizacion.notas_internas = _texto(cambios['notas_internas'], 'notas_internas')
+        if 'estado' in cambios:
+            if cambios['estado'] not in dict(Cotizacion.ESTADOS):
+                raise EdicionError(f"Estado inválido: {cambios['estado']!r}")
+            cotizacion.estado = cambios['estado']
+        for campo, modelo in (('cliente_id', Cliente), ('carpeta_id', Carpeta)):
+            if campo in cambios:
+                valor = cambios[campo]
+                if valor is not None and not (_es_id(valor) and modelo.objects.filter(pk=valor).exists()):
+                    raise EdicionError(f'{campo} inválido: {valor!r}')
+                setattr(cotizacion, campo, valor)
+
+    def aplicar_secciones(self, cambios):
+        _sin_campos_extra(cambios, ('agregar', 'modificar', 'orden', 'eliminar'), 'secciones')
+        agregar = _lista(cambios.get('agregar'), 'secciones.agregar')
+        modificar = _lista(cambios.get('modificar'), 'secciones.modificar')
+        orden = _lista(cambios.get('orden'), 'secciones.orden')
+        eliminar = _ids(cambios.get('eliminar'), 'secciones.eliminar')
+        if not (agregar or modificar or orden or eliminar):
+            return {}
+
+        existentes = {seccion.id: seccion for seccion in self.cotizacion.secciones.all()}
+        _verificar_ids(eliminar, existentes, 'Secciones')
+        self.secciones_eliminadas = set(eliminar)
+        vigentes = {pk: seccion for pk, seccion in existentes.items() if pk not in self.secciones_eliminadas}
+        modificadas = {}
+
+        for cambio in modificar:
+            cambio = _objeto(cambio, 'secciones.modificar')
+            _sin_campos_extra(cambio, ('id',) + CAMPOS_SECCION, 'secciones.modificar')
+            pk = cambio.get('id')
+            _verificar_ids([pk], vigentes, 'Secciones')
+            seccion = modificadas[pk] = vigentes[pk]
+            _asignar_seccion(seccion, cambio)
+
+        for posicion, data in enumerate(agregar):
+            data = _objeto(data, 'secciones.agregar')
+            _sin_campos_extra(data, ('id',) + CAMPOS_SECCION, 'secciones.agregar')
+            ref = data.get('id')
+            if not isinstance(ref, str) or not ref or ref in self.secciones_nuevas:
+                raise EdicionError(f'Sección nueva #{posicion + 1} sin id del navegador (ej. "sec_1") o repetida')
+            seccion = SeccionMaterial(cotizacion=self.cotizacion, orden=len(existentes) + posicion)
+            _asignar_seccion(seccion, data)
+            if not seccion.nombre:
+                raise EdicionError(f'La sección nueva {ref!r} no tiene nombre')
+            self.secciones_nuevas[ref] = seccion
+
+        # Reordenar: la posición en la lista es el orden nuevo
+        for posicion, ref in enumerate(orden):
+            seccion = self._seccion_de(ref, vigentes)
+            seccion.orden = posicion
+            if seccion.pk is not None:
+                modificadas[seccion.pk] = seccion
+
+        nombres = Counter(
+            seccion.nombre.lower()
+            for seccion in [*vigentes.values(), *self.secciones_nuevas.values()]
+        )
+        repetidos = sorted(nombre for nombre, cantidad in nombres.items() if cantidad > 1)
+        if repetidos:
+            raise EdicionError(f'Secciones con el mismo nombre: {", ".join(repetidos)}')
+
+        if eliminar:
+            # SET_NULL deja sus materiales en "General" (UPDATE sin señales)
+            SeccionMaterial.objects.filter(pk__in=eliminar).delete()
+        SeccionMaterial.objects.bulk_update(modificadas.values(), CAMPOS_SECCION)
+        SeccionMaterial.objects.bulk_create(self.secciones_nuevas.values())
+
+        self.secciones_vigentes = set(vigentes)
+        if eliminar:
+            # El snapshot de los materiales movidos a "General"
+            for entrada in self._structural():
+                if entrada.get('seccion_id') in self.secciones_eliminadas:
+                    entrada['seccion_id'] = None
+        return {ref: seccion.id for ref, seccion in self.secciones_nuevas.items()}
+
+    def aplicar_materiales(self, cambios):
+        _sin_campos_extra(cambios, ('agregar', 'modificar', 'eliminar'), 'materiales')
+        agregar = _lista(cambios.get('agregar'), 'materiales.agregar')
+        modificar = [_objeto(cambio, 'materiales.modificar') for cambio in _lista(cambios.get('modificar'), 'materiales.modificar')]
+        eliminar = _ids(cambios.get('eliminar'), 'materiales.eliminar')
+        if not (agregar or modificar or eliminar):
+            return []
+
+        ids_modificar = _ids([cambio.get('id') for cambio in modificar], 'materiales.modificar')
+        if set(ids_modificar) & set(eliminar):
+            raise EdicionError('Un material no se puede modificar y eliminar en el mismo patch')
+        filas = MaterialEstructural.objects.filter(cotizacion=self.cotizacion).in_bulk([*ids_modificar, *eliminar])
+        _verificar_ids([*ids_modificar, *eliminar], filas, 'Materiales')
+
+        # Ítems en el formato de structural_items_json: los modificados
+        # parten de la fila y de los cortes del snapshot (que se asocia a
+        # las filas antes de escribir)
+        snapshot = {entrada['id']: entrada for entrada in self._structural()}
+        items = []
+        for cambio in modificar:
+            _sin_campos_extra(cambio, ('id',) + CAMPOS_MATERIAL, 'materiales.modificar')
+            fila = filas[cambio['id']]
+            item = {
+                'profile_id': fila.profile_id,
+                'material_nombre': fila.material_nombre,
+                'cortes': snapshot.get(fila.id, {}).get('cortes') or [{'largo_m': fila.largo_m, 'cantidad': 1}],
+                'peso_kg_m': fila.peso_kg_m,
+                'valor_unitario_m': fila.valor_unitario_m,
+            }
+            if 'largo_m' in cambio and 'cortes' not in cambio:
+                # Formato anterior: un único largo reemplaza los cortes
+                del item['cortes']
+            item.update(cambio)
+            items.append(item)
+        for item in agregar:
+            _sin_campos_extra(_objeto(item, 'materiales.agregar'), CAMPOS_MATERIAL, 'materiales.agregar')
+        items.extend(agregar)
+
+        try:
+            calculo = calcular_cotizacion(items)
+            for material in calculo.materiales:
+                validar_material(material)
+        except (CalculationError, ImportacionError) as exc:
+            raise EdicionError(str(exc))
+
+        modificadas = []
+        entradas = {}
+        for cambio, material in zip(modificar, calculo.materiales):
+            fila = filas[cambio['id']]
+            self._sumar_material(fila, -1)
+            if 'seccion_id' in cambio:
+                fila.seccion_id = self._resolver_seccion(cambio['seccion_id'])
+            _asignar_material(fila, material)
+            self._sumar_material(fila, 1)
+            modificadas.append(fila)
+            entradas[fila.id] = _entrada_material(fila, material)
+
+        nuevas = []
+        for item, material in zip(agregar, calculo.materiales[len(modificar):]):
+            fila = MaterialEstructural(
+                cotizacion=self.cotizacion,
+                seccion_id=self._resolver_seccion(item.get('seccion_id')),
+            )
+            _asignar_material(fila, material)
+            nuevas.append((fila, material))
+
+        for pk in eliminar:
+            self._sumar_material(filas[pk], -1)
+        if eliminar:
+            MaterialEstructural.objects.filter(pk__in=eliminar).delete()
+        MaterialEstructural.objects.bulk_update(modificadas, _COLUMNAS_MATERIAL)
+        MaterialEstructural.objects.bulk_create([fila for fila, _ in nuevas])
+        for fila, material in nuevas:
+            self._sumar_material(fila, 1)
+
+        self.structural = _actualizar_snapshot(
+            self._structural(), entradas, eliminar,
+            [_entrada_material(fila, material) for fila, material in nuevas],
+        )
+        return [fila.id for fila, _ in nuevas]
+
+    def aplicar_costos(self, cambios):
+        _sin_campos_extra(cambios, ('agregar', 'modificar', 'eliminar'), 'costos')
+        agregar = _lista(cambios.get('agregar'), 'costos.agregar')
+        modificar = [_objeto(cambio, 'costos.modificar') for cambio in _lista(cambios.get('modificar'), 'costos.modificar')]
+        eliminar = _ids(cambios.get('eliminar'), 'costos.eliminar')
+        if not (agregar or modificar or eliminar):
+            return []
+
+        ids_modificar = _ids([cambio.get('id') for cambio in modificar], 'costos.modificar')
+        if set(ids_modificar) & set(eliminar):
+            raise EdicionError('Un costo no se puede modificar y eliminar en el mismo patch')
+        filas = CostoAdicional.objects.filter(cotizacion=self.cotizacion).in_bulk([*ids_modificar, *eliminar])
+        _verificar_ids([*ids_modificar, *eliminar], filas, 'Costos')
+        # Antes de escribir: el snapshot viejo se asocia a las filas actuales
+        snapshot = self._overhead()
+
+        try:
+            modificadas = []
+            entradas = {}
+            for indice, cambio in enumerate(modificar):
+                _sin_campos_extra(cambio, ('id',) + CAMPOS_COSTO, 'costos.modificar')
+                fila = filas[cambio['id']]
+                datos = {campo: getattr(fila, campo) for campo in CAMPOS_COSTO}
+                datos.update((campo, valor) for campo, valor in cambio.items() if campo != 'id')
+                costo = validar_costo(datos, indice)
+                self._sumar_costo(-1)
+                for campo, valor in costo.items():
+                    setattr(fila, campo, valor)
+                self._sumar_costo(1)
+                modificadas.append(fila)
+                entradas[fila.id] = _entrada_costo(fila)
+
+            nuevas = []
+            for indice, item in enumerate(agregar):
+                _sin_campos_extra(_objeto(item, 'costos.agregar'), CAMPOS_COSTO, 'costos.agregar')
+                nuevas.append(CostoAdicional(cotizacion=self.cotizacion, **validar_costo(item, indice)))
+        except ImportacionError as exc:
+            raise EdicionError(str(exc))
+
+        for pk in eliminar:
+            self._sumar_costo(-1)
+        if eliminar:
+            CostoAdicional.objects.filter(pk__in=eliminar).delete()
+        CostoAdicional.objects.bulk_update(modificadas, CAMPOS_COSTO)
+        CostoAdicional.objects.bulk_create(nuevas)
+        for fila in nuevas:
+            self._sumar_costo(1)
+
+        self.overhead = _actualizar_snapshot(
+            snapshot, entradas, eliminar, [_entrada_costo(fila) for fila in nuevas],
+        )
+        return [fila.id for fila in nuevas]
+
+    def guardar(self):
+        """Ajusta los agregados y guarda la cotización con su snapshot."""
+        cotizacion = self.cotizacion
+        if self.delta:
+            ajustar_totales(cotizacion.id, self.delta, self.deltas_secciones)
+            cotizacion.refresh_from_db(fields=Cotizacion.CAMPOS_AGREGADOS)
+            # total_costo se guarda sin decimales, como al crear
+            cotizacion.total_costo = (cotizacion.total_materiales + cotizacion.total_adicional) \
+                .quantize(Decimal(1), ROUND_HALF_UP)
+        if self.structural is not None:
+            cotizacion.structural_items_json = self.structural
+        if self.overhead is not None:
+            cotizacion.overhead_items_json = self.overhead
+        # El post_save reindexa la cotización (nombres de materiales incluidos)
+        cotizacion.save()
+
+    def _sumar_material(self, fila, signo):
+        aporte = {
+            'total_materiales': signo * fila.cant_a_comprar * METROS_POR_BARRA * fila.valor_unitario_m,
+            # Se recalcula (ver aggregates.ajustar_totales); basta con marcarlo
+            'peso_total_kg': 0,
+            'cant_materiales': signo,
+        }
+        self.delta.update(aporte)
+        if fila.seccion_id is not None:
+            self.deltas_secciones[fila.seccion_id].update(aporte)
+
+    def _sumar_costo(self, signo):
+        # total_adicional se recalcula, igual que el peso
+        self.delta.update({'total_adicional': 0, 'cant_costos': signo})
+
+    def _seccion_de(self, ref, vigentes):
+        """SeccionMaterial de un id de la BD o de una sección nueva del patch."""
+        if _es_id(ref) and ref in vigentes:
+            return vigentes[ref]
+        if isinstance(ref, str) and ref in self.secciones_nuevas:
+            return self.secciones_nuevas[ref]
+        raise EdicionError(f'Sección desconocida: {ref!r}')
+
+    def _resolver_seccion(self, ref):
+        """seccion_id de un material: None ("General"), id de la BD o id de una sección nueva."""
+        if ref is None:
+            return None
+        if self.secciones_vigentes is None:
+            self.secciones_vigentes = set(self.cotizacion.secciones.values_list('id', flat=True))
+        if _es_id(ref) and ref in self.secciones_vigentes:
+            return ref
+        if isinstance(ref, str) and ref in self.secciones_nuevas:
+            return self.secciones_nuevas[ref].id
+        raise EdicionError(f'Sección desconocida: {ref!r}')
+
+    def _structural(self):
+        if self.structural is None:
+            self.structural = _snapshot_con_ids(
+                self.cotizacion.structural_items_json, self.cotizacion.materiales_estructurales,
+            )
+        return self.structural
+
+    def _overhead(self):
+        if self.overhead is None:
+            self.overhead = _snapshot_con_ids(
+                self.cotizacion.overhead_items_json, self.cotizacion.costos_adicionales,
+            )
+        return self.overhead
+
+
+def _snapshot_con_ids(entradas, relacionados):
+    """
+    Copia de un snapshot con el 'id' de la fila en cada entrada.
+
+    Las entradas anteriores a la edición no lo traen: se asocian por
+    posición con las filas en orden de id. Si las cantidades no calzan (ej.
+    ítems editados desde el admin), esas entradas se descartan y cada fila
+    sin entrada toma la que se arma al modificarla.
+    """
+    entradas = [dict(entrada) for entrada in entradas or [] if isinstance(entrada, dict)]
+    if all('id' in entrada for entrada in entradas):
+        return entradas
+    ids = list(relacionados.order_by('id').values_list('id', flat=True))
+    if len(ids) != len(entradas):
+        return [entrada for entrada in entradas if 'id' in entrada]
+    for entrada, pk in zip(entradas, ids):
+        entrada['id'] = pk
+    return entradas
+
+
+def _actualizar_snapshot(entradas, reemplazos, eliminados, nuevas):
+    """Quita los eliminados, reemplaza los modificados y agrega los nuevos al final."""
+    eliminados = set(eliminados)
+    resultado = []
+    for entrada in entradas:
+        if entrada.get('id') in eliminados:
+            continue
+        resultado.append(reemplazos.pop(entrada.get('id'), entrada))
+    # Modificados que no estaban en el snapshot (ver _snapshot_con_ids)
+    resultado.extend(reemplazos.values())
+    resultado.extend(nuevas)
+    return resultado
+
+
+def _entrada_material(fila, material):
+    return dict(material_como_json(material), id=fila.id, seccion_id=fila.seccion_id)
+
+
+def _entrada_costo(fila):
+    return {
+        'id': fila.id,
+        'descripcion': fila.descripcion,
+        'unidad': fila.unidad,
+        'cantidad': float(fila.cantidad),
+        'valor_unitario': float(fila.valor_unitario),
+    }
+
+
+def _asignar_material(fila, material):
+    for campo in _COLUMNAS_MATERIAL[1:]:
+        setattr(fila, campo, getattr(material, campo))
+
+
+def _asignar_seccion(seccion, data):
+    if 'nombre' in data:
+        seccion.nombre = SeccionMaterial.normalizar_nombre(_texto(data['nombre'], 'nombre de sección', 200))
+        if not seccion.nombre:
+            raise EdicionError('El nombre de una sección no puede quedar vacío')
+    if 'orden' in data:
+        if type(data['orden']) is not int:
+            raise EdicionError(f"Orden inválido en la sección {seccion.nombre!r}: {data['orden']!r}")
+        seccion.orden = data['orden']
+    if 'colapsada' in data:
+        seccion.colapsada = bool(data['colapsada'])
+
+
+def _verificar_ids(ids, existentes, nombre):
+    faltan = sorted(set(ids) - set(existentes), key=str)
+    if faltan:
+        raise EdicionError(f'{nombre} que no son de esta cotización: {", ".join(map(str, faltan))}')
+
+
+def _sin_campos_extra(data, permitidos, contexto):
+    extra = sorted(set(data) - set(permitidos))
+    if extra:
+        raise EdicionError(f'Campos desconocidos en {contexto}: {", ".join(extra)}')
+
+
+def _es_id(value):
+    return type(value) is int and value > 0
+
+
+def _ids(value, campo):
+    ids = _lista(value, campo)
+    if not all(_es_id(pk) for pk in ids):
+        raise EdicionError(f'{campo} debe ser una lista de ids')
+    if len(set(ids)) != len(ids):
+        raise EdicionError(f'{campo} tiene ids repetidos')
+    return ids
+
+
+def _objeto(value, campo):
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise EdicionError(f'{campo} debe ser un objeto')
+    return value
+
+
+def _lista(value, campo):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise EdicionError(f'{campo} debe ser una lista')
+    return value
+
+
+def _texto(value, campo, max_length=None):
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise EdicionError(f'{campo} debe ser texto')
+    texto = value.strip()
+    if max_length and len(texto) > max_length:
+        raise EdicionError(f'{campo} excede {max_length} caracteres')
+    return texto
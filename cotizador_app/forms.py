@@ -12,6 +12,11 @@ class CotizacionForm(forms.ModelForm):
     """
     
     # Los campos JSON se gestionan a través de ModelForm y se fuerzan a HiddenInput en widgets.
+    
+    # Secciones del constructor ([{id, nombre, orden, colapsada}]). No es un
+    # campo del modelo: la vista crea los SeccionMaterial y enlaza los
+    # materiales por su seccion_id.
+    secciones_json = forms.JSONField(required=False, widget=forms.HiddenInput())
 
     class Meta:
         model = Cotizacion
@@ -0,0 +1,499 @@
+"""
+Importación masiva de cotizaciones (ej. cotizaciones históricas desde
+planillas).
+
+Cada cotización es un objeto:
+
+    {
+        "ref": "COT-2019-001",            # opcional, identifica la cotización en los errores
+        "proyecto_nombre": "Galpón Lampa",
+        "cliente": "Constructora Ñuñoa",  # nombre; se crea si no existe
+        "carpeta": "Históricas 2019",     # nombre; se crea si no existe
+        "estado": "TERMINADO",            # default BORRADOR
+        "fecha_creacion": "2019-03-14",   # ISO o dd-mm-aaaa; default ahora
+        "notas_internas": "...",
+        "secciones": [{"nombre": "Techo", "materiales": [...]}],
+        "materiales": [...],              # materiales sin sección
+        "costos": [{"descripcion": "Flete", "unidad": "Viaje", "cantidad": 2, "valor_unitario": 85000}]
+    }
+
+Los materiales usan el formato de structural_items_json (material_nombre,
+profile_id, cortes o largo_m, peso_kg_m, valor_unitario_m). Barras, pesos y
+total_costo se recalculan con calculations.calcular_cotizacion, igual que
+al crear una cotización desde el formulario.
+
+En CSV cada fila es un material o un costo (columna 'tipo') y las filas
+consecutivas con la misma 'ref' forman una cotización (ver
+agrupar_filas_csv).
+
+Las cotizaciones válidas se insertan en lotes de BATCH_SIZE, una
+transacción y un bulk_create por tabla por lote. bulk_create no envía
+señales, así que al final de cada lote se actualizan los agregados, el
+índice de búsqueda y los conteos por carpeta/estado (lo que hace
+signals.py de a una cotización). Las cotizaciones inválidas se reportan con
+su número y ref, sin detener el resto de la importación.
+
+Los materiales necesitan el id de su sección recién creada: bulk_create lo
+entrega en PostgreSQL y en SQLite ≥ 3.35.
+"""
+
+import time as _time
+from collections import Counter, namedtuple
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from profiles_api.readers import detect_format, iter_records, read_records
+
+from . import search
+from .aggregates import incrementar_conteo, recalcular_totales
+from .calculations import CalculationError, calcular_cotizacion, material_como_json
+from .models import Carpeta, Cliente, CostoAdicional, Cotizacion, MaterialEstructural, SeccionMaterial
+
+BATCH_SIZE = 500
+
+# Columnas de la cotización en el CSV (se toman de su primera fila)
+COLUMNAS_COTIZACION = ('proyecto_nombre', 'cliente', 'carpeta', 'estado', 'fecha_creacion', 'notas_internas')
+
+# Formatos de fecha de planilla aceptados además de ISO
+_FORMATOS_FECHA = ('%d-%m-%Y', '%d/%m/%Y')
+
+# Columnas que se copian de MaterialCalculado / del costo validado
+_CAMPOS_MATERIAL = (
+    'profile_id', 'material_nombre', 'largo_m', 'unidad_comercial',
+    'cant_necesaria', 'cant_a_comprar', 'valor_unitario_m', 'peso_kg_m',
+)
+_CAMPOS_COSTO = ('descripcion', 'unidad', 'cantidad', 'valor_unitario')
+
+_CENTAVOS = Decimal('0.01')
+_MAX_ENTERO = 2 ** 31 - 1
+
+ErrorFila = namedtuple('ErrorFila', ['numero', 'ref', 'mensaje'])
+
+ResultadoImportacion = namedtuple('ResultadoImportacion', ['creadas', 'errores', 'segundos'])
+
+# Cotización validada y recalculada, lista para insertar
+_CotizacionImportada = namedtuple('_CotizacionImportada', [
+    'numero',
+    'ref',
+    'campos',       # campos de Cotizacion (sin cliente ni carpeta)
+    'cliente',
+    'carpeta',
+    'secciones',    # [(nombre, orden)]
+    'materiales',   # [(índice de sección o None, MaterialCalculado)]
+    'costos',       # [dict con los campos de CostoAdicional]
+])
+
+
+class ImportacionError(ValueError):
+    """Una cotización del archivo no se puede importar."""
+
+
+def leer_cotizaciones(path, format=None):
+    """Itera las cotizaciones de un archivo JSON, NDJSON o CSV (opcionalmente .gz)."""
+    format = format or detect_format(path)
+    records = read_records(path, format)
+    return agrupar_filas_csv(records) if format == 'csv' else records
+
+
+def leer_cotizaciones_stream(stream, format):
+    """Igual que leer_cotizaciones, sobre un stream de texto ya abierto."""
+    records = iter_records(stream, format)
+    return agrupar_filas_csv(records) if format == 'csv' else records
+
+
+def agrupar_filas_csv(rows):
+    """
+    Arma cotizaciones desde filas CSV.
+
+    Columnas:
+        ref                        agrupa las filas consecutivas de una cotización
+        proyecto_nombre, cliente, carpeta, estado, fecha_creacion, notas_internas
+        tipo                       'material' o 'costo' (vacío: fila solo con datos
+                                   de la cotización)
+        seccion                    sección del material (opcional)
+        material_nombre, profile_id, largo_m, cantidad, peso_kg_m, valor_unitario_m
+        descripcion, unidad, cantidad, valor_unitario
+
+    Cada fila de material es un corte (largo_m × cantidad piezas); las filas
+    del mismo material en la misma sección se juntan en un solo ítem.
+    """
+    actual = None
+    ref = None
+    for row in rows:
+        row_ref = row.get('ref')
+        if actual is None or row_ref != ref:
+            if actual is not None:
+                yield _cotizacion_de_filas(actual)
+            actual, ref = [], row_ref
+        actual.append(row)
+    if actual is not None:
+        yield _cotizacion_de_filas(actual)
+
+
+def _cotizacion_de_filas(rows):
+    data = {'ref': rows[0].get('ref')}
+    data.update((columna, rows[0][columna]) for columna in COLUMNAS_COTIZACION if columna in rows[0])
+    secciones = {}
+    materiales = {}
+    costos = []
+
+    for row in rows:
+        tipo = str(row.get('tipo', '')).strip().lower()
+        if tipo == 'material':
+            seccion = row.get('seccion')
+            destino = secciones.setdefault(str(seccion), []) if seccion not in (None, '') else None
+            clave = (seccion, row.get('material_nombre'), row.get('profile_id'),
+                     row.get('peso_kg_m'), row.get('valor_unitario_m'))
+            material = materiales.get(clave)
+            if material is None:
+                material = materiales[clave] = {
+                    'material_nombre': row.get('material_nombre', ''),
+                    'profile_id': row.get('profile_id'),
+                    'peso_kg_m': row.get('peso_kg_m', 0),
+                    'valor_unitario_m': row.get('valor_unitario_m', 0),
+                    'cortes': [],
+                }
+                (destino if destino is not None else data.setdefault('materiales', [])).append(material)
+            material['cortes'].append({'largo_m': row.get('largo_m'), 'cantidad': row.get('cantidad', 1)})
+        elif tipo == 'costo':
+            costos.append({
+                campo: row[campo]
+                for campo in ('descripcion', 'unidad', 'cantidad', 'valor_unitario')
+                if campo in row
+            })
+        elif tipo:
+            data.setdefault('_errores', []).append(f"Tipo de fila desconocido: {row.get('tipo')!r}")
+
+    data['secciones'] = [{'nombre': nombre, 'materiales': items} for nombre, items in secciones.items()]
+    data['costos'] = costos
+    return data
+
+
+def importar_cotizaciones(items, batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Valida e inserta las cotizaciones de 'items' (cualquier iterable de
+    dicts, ej. leer_cotizaciones()).
+
+    Se consume en lotes de 'batch_size'; cada lote se inserta en su propia
+    transacción, así que un error a mitad de archivo no deshace los lotes
+    anteriores. Si un lote falla en la BD se reintenta de a una cotización
+    para aislar la que falló. Con dry_run=True solo se valida. 'progress',
+    si se entrega, se llama después de cada lote con las cotizaciones
+    leídas.
+
+    Returns:
+        ResultadoImportacion con las cotizaciones creadas, los ErrorFila y
+        el tiempo total en segundos
+    """
+    started = _time.perf_counter()
+    creadas = 0
+    errores = []
+    lote = []
+    leidas = 0
+
+    def insertar_lote():
+        nonlocal creadas
+        if not dry_run:
+            creadas += _insertar(lote, errores)
+        else:
+            creadas += len(lote)
+        lote.clear()
+        if progress:
+            progress(leidas)
+
+    for numero, data in enumerate(items, start=1):
+        leidas = numero
+        try:
+            lote.append(validar_cotizacion(data, numero))
+        except ImportacionError as exc:
+            errores.append(ErrorFila(numero, _ref(data), str(exc)))
+        if len(lote) >= batch_size:
+            insertar_lote()
+
+    if lote:
+        insertar_lote()
+    return ResultadoImportacion(creadas, errores, _time.perf_counter() - started)
+
+
+def validar_cotizacion(data, numero=1):
+    """
+    Valida una cotización y recalcula sus materiales y totales.
+
+    Raises:
+        ImportacionError: Con el primer problema encontrado
+    """
+    if not isinstance(data, dict):
+        raise ImportacionError('Se esperaba un objeto con los datos de la cotización')
+    if data.get('_errores'):
+        raise ImportacionError(data['_errores'][0])
+
+    proyecto = _texto(data.get('proyecto_nombre'), 'proyecto_nombre', 255)
+    if not proyecto:
+        raise ImportacionError('Falta proyecto_nombre')
+
+    estado = _texto(data.get('estado'), 'estado', 20) or Cotizacion.ESTADO_BORRADOR
+    if estado not in dict(Cotizacion.ESTADOS):
+        raise ImportacionError(f'Estado inválido: {estado!r}')
+
+    # Secciones con el nombre normalizado como en SeccionMaterial.clean
+    secciones = []
+    structural = []
+    indices_seccion = []
+    vistas = set()
+    for orden, seccion in enumerate(_lista(data.get('secciones'), 'secciones')):
+        if not isinstance(seccion, dict):
+            raise ImportacionError(f'Sección #{orden + 1} inválida')
+        nombre = SeccionMaterial.normalizar_nombre(_texto(seccion.get('nombre'), 'nombre de sección', 200))
+        if not nombre:
+            raise ImportacionError(f'La sección #{orden + 1} no tiene nombre')
+        if nombre.lower() in vistas:
+            raise ImportacionError(f'Sección repetida: {nombre!r}')
+        vistas.add(nombre.lower())
+        orden = seccion.get('orden', orden)
+        if type(orden) is not int:
+            raise ImportacionError(f'Orden inválido en la sección {nombre!r}: {orden!r}')
+        secciones.append((nombre, orden))
+        materiales = _lista(seccion.get('materiales'), f'materiales de {nombre!r}')
+        structural.extend(materiales)
+        indices_seccion.extend([len(secciones) - 1] * len(materiales))
+
+    sin_seccion = _lista(data.get('materiales'), 'materiales')
+    structural.extend(sin_seccion)
+    indices_seccion.extend([None] * len(sin_seccion))
+
+    costos = [validar_costo(item, indice) for indice, item in enumerate(_lista(data.get('costos'), 'costos'))]
+
+    try:
+        calculo = calcular_cotizacion(structural, costos)
+    except CalculationError as exc:
+        raise ImportacionError(str(exc))
+
+    for material in calculo.materiales:
+        validar_material(material)
+    _validar_rango(calculo.total_costo, Cotizacion, 'total_costo')
+
+    campos = {
+        'proyecto_nombre': proyecto,
+        'estado': estado,
+        'fecha_creacion': _fecha(data.get('fecha_creacion')),
+        'notas_internas': _texto(data.get('notas_internas'), 'notas_internas'),
+        'total_costo': calculo.total_costo,
+        'structural_items_json': [material_como_json(material) for material in calculo.materiales],
+        'overhead_items_json': [
+            dict(costo, cantidad=float(costo['cantidad']), valor_unitario=float(costo['valor_unitario']))
+            for costo in costos
+        ],
+    }
+    return _CotizacionImportada(
+        numero=numero,
+        ref=_ref(data),
+        campos=campos,
+        cliente=_texto(data.get('cliente'), 'cliente', 200) or None,
+        carpeta=_texto(data.get('carpeta'), 'carpeta', 120) or None,
+        secciones=secciones,
+        materiales=list(zip(indices_seccion, calculo.materiales)),
+        costos=costos,
+    )
+
+
+def _insertar(lote, errores):
+    """Inserta un lote; si la BD lo rechaza, reintenta de a una cotización."""
+    try:
+        with transaction.atomic():
+            _insertar_lote(lote)
+        return len(lote)
+    except DatabaseError as exc:
+        if len(lote) == 1:
+            errores.append(ErrorFila(lote[0].numero, lote[0].ref, f'Error de base de datos: {exc}'))
+            return 0
+
+    creadas = 0
+    for importada in lote:
+        try:
+            with transaction.atomic():
+                _insertar_lote([importada])
+            creadas += 1
+        except DatabaseError as exc:
+            errores.append(ErrorFila(importada.numero, importada.ref, f'Error de base de datos: {exc}'))
+    return creadas
+
+
+def _insertar_lote(lote):
+    clientes = _resolver_clientes({importada.cliente for importada in lote if importada.cliente})
+    carpetas = _resolver_carpetas({importada.carpeta for importada in lote if importada.carpeta})
+
+    # Instancias nuevas en cada intento: si el lote se reintenta, no
+    # arrastran las pk de la transacción revertida
+    cotizaciones = [
+        Cotizacion(
+            cliente_id=clientes.get(importada.cliente),
+            carpeta_id=carpetas.get(importada.carpeta),
+            **importada.campos,
+        )
+        for importada in lote
+    ]
+    Cotizacion.objects.bulk_create(cotizaciones)
+
+    secciones = [
+        [SeccionMaterial(cotizacion=cotizacion, nombre=nombre, orden=orden) for nombre, orden in importada.secciones]
+        for importada, cotizacion in zip(lote, cotizaciones)
+    ]
+    SeccionMaterial.objects.bulk_create([seccion for grupo in secciones for seccion in grupo])
+
+    # Materiales y costos (la mayoría de las filas) no necesitan sus ids:
+    # van con executemany, sin instanciar modelos
+    materiales = []
+    costos = []
+    for importada, cotizacion, grupo in zip(lote, cotizaciones, secciones):
+        for indice, item in importada.materiales:
+            materiales.append((
+                cotizacion.id,
+                grupo[indice].id if indice is not None else None,
+                *(getattr(item, campo) for campo in _CAMPOS_MATERIAL),
+            ))
+        costos.extend(
+            (cotizacion.id, *(costo[campo] for campo in _CAMPOS_COSTO))
+            for costo in importada.costos
+        )
+    _insertar_filas(MaterialEstructural, ('cotizacion', 'seccion', *_CAMPOS_MATERIAL), materiales)
+    _insertar_filas(CostoAdicional, ('cotizacion', *_CAMPOS_COSTO), costos)
+
+    # Lo que signals.py haría cotización por cotización
+    ids = [cotizacion.id for cotizacion in cotizaciones]
+    recalcular_totales(ids)
+    search.index_cotizaciones(ids)
+    for clave, cantidad in Counter(cotizacion.clave_conteo() for cotizacion in cotizaciones).items():
+        incrementar_conteo(clave, cantidad)
+
+
+def _insertar_filas(model, campos, filas):
+    """
+    INSERT ... VALUES con executemany. bulk_create prepara cada valor con
+    get_db_prep_save y arma una consulta por cada pocos cientos de filas
+    (límite de parámetros de SQLite): con decenas de miles de materiales
+    por lote era más de la mitad del tiempo de la importación.
+    """
+    if not filas:
+        return
+    quote = connection.ops.quote_name
+    columnas = ', '.join(quote(model._meta.get_field(campo).column) for campo in campos)
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table), columnas, ', '.join(['%s'] * len(campos)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def _resolver_clientes(nombres):
+    """{nombre: id}; crea los clientes que no existen (si hay repetidos, el más antiguo)."""
+    if not nombres:
+        return {}
+    ids = dict(Cliente.objects.filter(nombre__in=nombres).order_by('-id').values_list('nombre', 'id'))
+    nuevos = [Cliente(nombre=nombre) for nombre in sorted(nombres - ids.keys())]
+    Cliente.objects.bulk_create(nuevos)
+    ids.update((cliente.nombre, cliente.id) for cliente in nuevos)
+    return ids
+
+
+def _resolver_carpetas(nombres):
+    """{nombre: id}; crea las carpetas que no existen."""
+    if not nombres:
+        return {}
+    Carpeta.objects.bulk_create([Carpeta(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+    return dict(Carpeta.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+
+
+def validar_material(material):
+    """Verifica que un MaterialCalculado quepa en las columnas de MaterialEstructural."""
+    if len(material.material_nombre or '') > 300:
+        raise ImportacionError('material_nombre excede 300 caracteres')
+    for campo in ('largo_m', 'unidad_comercial', 'peso_kg_m', 'valor_unitario_m'):
+        _validar_rango(getattr(material, campo), MaterialEstructural, campo)
+    if material.cant_a_comprar > _MAX_ENTERO:
+        raise ImportacionError(f'Cantidad de barras fuera de rango en {material.material_nombre!r}')
+
+
+def validar_costo(item, indice):
+    """Costo adicional con cantidad y valor a la precisión de CostoAdicional."""
+    if not isinstance(item, dict):
+        raise ImportacionError(f'Costo adicional #{indice + 1} inválido')
+    costo = {
+        'descripcion': _texto(item.get('descripcion'), 'descripción del costo', 200),
+        'unidad': _texto(item.get('unidad'), 'unidad del costo', 50) or 'Unidad',
+        'cantidad': _decimal(item.get('cantidad', 1), f'cantidad del costo #{indice + 1}'),
+        'valor_unitario': _decimal(item.get('valor_unitario', 0), f'valor del costo #{indice + 1}'),
+    }
+    for campo in ('cantidad', 'valor_unitario'):
+        _validar_rango(costo[campo], CostoAdicional, campo)
+    return costo
+
+
+def _decimal(value, campo):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ImportacionError(f'Valor no numérico en {campo}: {value!r}')
+    if not number.is_finite() or number < 0:
+        raise ImportacionError(f'Valor inválido en {campo}: {value!r}')
+    return number.quantize(_CENTAVOS, ROUND_HALF_UP)
+
+
+def _validar_rango(valor, modelo, campo):
+    """Evita que un valor que no cabe en la columna haga fallar el lote completo."""
+    field = modelo._meta.get_field(campo)
+    if abs(valor) >= Decimal(10) ** (field.max_digits - field.decimal_places):
+        raise ImportacionError(f'{campo} fuera de rango: {valor}')
+
+
+def _texto(value, campo, max_length=None):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        raise ImportacionError(f'{campo} debe ser texto')
+    texto = str(value).strip()
+    if max_length and len(texto) > max_length:
+        raise ImportacionError(f'{campo} excede {max_length} caracteres')
+    return texto
+
+
+def _lista(value, campo):
+    if value in (None, ''):
+        return []
+    if not isinstance(value, list):
+        raise ImportacionError(f'{campo} debe ser una lista')
+    return value
+
+
+def _fecha(value):
+    """Fecha-hora ISO, fecha ISO o dd-mm-aaaa (hora local); vacío = ahora."""
+    if value in (None, ''):
+        return timezone.now()
+    texto = str(value).strip()
+    fecha = None
+    try:
+        fecha = parse_datetime(texto)
+        if fecha is None:
+            dia = parse_date(texto)
+            if dia is None:
+                for formato in _FORMATOS_FECHA:
+                    try:
+                        dia = datetime.strptime(texto, formato).date()
+                        break
+                    except ValueError:
+                        continue
+            if dia is not None:
+                fecha = datetime.combine(dia, time())
+    except ValueError:
+        pass
+    if fecha is None:
+        raise ImportacionError(f'Fecha inválida: {value!r}')
+    return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+
+def _ref(data):
+    ref = data.get('ref') if isinstance(data, dict) else None
+    return None if ref is None else str(ref)
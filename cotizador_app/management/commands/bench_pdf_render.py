@@ -0,0 +1,95 @@
+import random
+import time
+import tracemalloc
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+
+from cotizador_app.pdf import PdfData, render_pdf
+
+
+class Command(BaseCommand):
+    help = 'Mide el render del PDF de cotizaciones sintéticas de distintos tamaños'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 1000, 10000],
+            help='Cantidades de materiales sintéticos a medir (default: 10 1000 10000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por medición')
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Mide también el pico de memoria (tracemalloc, hace el render más lento)',
+        )
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            data = self._synthetic_quote(size)
+            # Los costos adicionales son ~1 por cada 10 materiales
+            filas = len(data.materiales) + len(data.costos)
+
+            # Las repeticiones grandes pueden tardar minutos: las acotamos
+            repeat = options['repeat'] if size <= 1000 else 1
+            best = min(self._time(lambda: render_pdf(data)) for _ in range(repeat))
+            pdf_size = len(render_pdf(data))
+            self.stdout.write(
+                f'{size:>7} materiales  {best * 1000:10.1f} ms  {best / filas * 1e6:8.1f} µs/fila  '
+                f'{pdf_size / 1024:8.1f} KB'
+            )
+
+            if options['memory']:
+                tracemalloc.start()
+                render_pdf(data)
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(f'{"":>7}             pico de memoria {peak / 1024 / 1024:8.1f} MB')
+
+    @staticmethod
+    def _time(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _synthetic_quote(size):
+        rng = random.Random(size)
+        materiales = []
+        for i in range(size):
+            largo_m = round(rng.uniform(0.5, 24), 2)
+            cant = rng.randrange(1, 8)
+            valor = round(rng.uniform(500, 40000), 2)
+            peso = round(rng.uniform(2, 150), 3)
+            materiales.append((
+                f'H {rng.randrange(100, 1200, 50)}x{rng.randrange(100, 600, 25)} {peso}',
+                largo_m, 6.0, cant, valor, valor * cant * 6, peso, peso * largo_m,
+                i // 500 + 1,  # secciones de 500 materiales
+            ))
+        secciones = []
+        for seccion_id, filas in groupby(materiales, key=itemgetter(8)):
+            filas = list(filas)
+            secciones.append((
+                seccion_id, f'Sección {seccion_id}', sum(f[5] for f in filas), sum(f[7] for f in filas),
+            ))
+        costos = [
+            (f'Insumo {i}', 'Unidad', round(rng.uniform(1, 20), 2), round(rng.uniform(100, 90000), 2), 0)
+            for i in range(max(1, size // 10))
+        ]
+        costos = [(d, u, c, v, c * v) for d, u, c, v, _total in costos]
+
+        materiales_total = sum(fila[5] for fila in materiales)
+        adicional_total = sum(fila[4] for fila in costos)
+        return PdfData(
+            id=size,
+            proyecto_nombre=f'Benchmark {size}',
+            fecha_creacion='01-01-2025 12:00',
+            cliente_nombre='Cliente de prueba',
+            notas_internas='Cotización sintética\npara medir el render.',
+            total_costo=materiales_total + adicional_total,
+            materiales_calculado=materiales_total,
+            peso_calculado=sum(fila[7] for fila in materiales),
+            adicional_calculado=adicional_total,
+            secciones=secciones,
+            materiales=materiales,
+            costos=costos,
+        )
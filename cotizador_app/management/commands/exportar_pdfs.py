@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cotizador_app.models import Cotizacion
+from cotizador_app.pdf_export import exportar_zip, seleccionar_cotizaciones
+
+
+class Command(BaseCommand):
+    help = 'Exporta los PDFs de varias cotizaciones (ej. de un cliente o un mes) a un archivo ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Archivo ZIP a generar')
+        parser.add_argument('ids', nargs='*', type=int, help='Ids de las cotizaciones (por defecto todas)')
+        parser.add_argument('--cliente', type=int, help='Solo las cotizaciones de este cliente (id)')
+        parser.add_argument('--desde', help='Creadas desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Creadas hasta esta fecha (AAAA-MM-DD), inclusive')
+        parser.add_argument('--estado', choices=dict(Cotizacion.ESTADOS))
+        parser.add_argument(
+            '--workers', type=int,
+            help='Procesos que renderizan los PDFs (por defecto PDF_EXPORT_WORKERS; 0 para no usar procesos)',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Cotizacion.objects.all()
+        if options['estado']:
+            queryset = queryset.filter(estado=options['estado'])
+        try:
+            cotizacion_ids = list(seleccionar_cotizaciones(
+                ids=options['ids'] or None,
+                cliente=options['cliente'],
+                desde=options['desde'],
+                hasta=options['hasta'],
+                queryset=queryset,
+            ))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not cotizacion_ids:
+            raise CommandError('No hay cotizaciones para exportar')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Exportando {len(cotizacion_ids)} cotizaciones a {options["output"]}'
+        ))
+
+        self._exportadas = 0
+        self._verbosity = options['verbosity']
+        started = time.perf_counter()
+        with open(options['output'], 'wb') as output:
+            for chunk in exportar_zip(
+                cotizacion_ids,
+                workers=options['workers'],
+                progress=self._report_progress,
+            ):
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Exportados {self._exportadas} PDFs en {time.perf_counter() - started:.2f} s.'
+        ))
+
+    def _report_progress(self, nombre):
+        self._exportadas += 1
+        if self._verbosity >= 1 and self._exportadas % 100 == 0:
+            self.stdout.write(f'Exportados {self._exportadas} PDFs...')
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cotizador_app.importer import BATCH_SIZE, importar_cotizaciones, leer_cotizaciones
+from profiles_api.readers import FORMATS, ReaderError
+
+# Errores por cotización que se listan en la salida (el resto solo se cuenta)
+MAX_ERRORES_MOSTRADOS = 50
+
+
+class Command(BaseCommand):
+    help = 'Importa cotizaciones (ej. históricas) desde un archivo JSON, NDJSON o CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Archivo de cotizaciones, opcionalmente .gz')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Formato del archivo (por defecto se deduce de la extensión)',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Valida las cotizaciones sin guardarlas',
+        )
+
+    def handle(self, *args, **options):
+        file_path = options['file']
+
+        self.stdout.write(self.style.SUCCESS(f'Importando cotizaciones desde {file_path}'))
+
+        # Los lotes ya importados se mantienen si el archivo falla a la mitad
+        try:
+            result = importar_cotizaciones(
+                leer_cotizaciones(file_path, options['format']),
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                progress=self._report_progress if options['verbosity'] >= 1 else None,
+            )
+        except FileNotFoundError:
+            raise CommandError(f'No se encontró el archivo {file_path}')
+        except (ReaderError, UnicodeDecodeError) as exc:
+            raise CommandError(f'No se pudo leer {file_path}: {exc}')
+
+        for error in result.errores[:MAX_ERRORES_MOSTRADOS]:
+            ref = f' ({error.ref})' if error.ref is not None else ''
+            self.stdout.write(self.style.WARNING(f'Cotización #{error.numero}{ref}: {error.mensaje}'))
+        if len(result.errores) > MAX_ERRORES_MOSTRADOS:
+            self.stdout.write(self.style.WARNING(
+                f'... y {len(result.errores) - MAX_ERRORES_MOSTRADOS} errores más.'
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {result.creadas} cotizaciones válidas, {len(result.errores)} con errores. '
+                f'No se guardó ningún cambio.'
+            ))
+        else:
+            por_segundo = result.creadas / result.segundos if result.segundos else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'Importadas {result.creadas} cotizaciones ({len(result.errores)} con errores) '
+                f'en {result.segundos:.2f} s ({por_segundo:.0f}/s).'
+            ))
+
+    def _report_progress(self, processed):
+        self.stdout.write(f'Procesadas {processed} cotizaciones...')
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cotizador_app.aggregates import (
+    conteos_desalineados, recalcular_conteos, recalcular_totales, totales_desalineados,
+)
+from cotizador_app.models import Cotizacion
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Recalcula (o verifica) los totales almacenados y los conteos por carpeta/estado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Solo compara los totales almacenados con los calculados; falla si hay diferencias',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Cotizacion.objects.order_by('pk').values_list('pk', flat=True))
+        diferencias = 0
+        actualizadas = 0
+
+        for start in range(0, len(ids), batch_size):
+            lote = ids[start:start + batch_size]
+            if options['verificar']:
+                for instancia, campo, almacenado, esperado in totales_desalineados(lote):
+                    diferencias += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{instancia._meta.verbose_name} #{instancia.pk}: {campo} = {almacenado}, '
+                        f'esperado {esperado}'
+                    ))
+            else:
+                # Un lote por transacción: los totales de cada cotización
+                # se reemplazan de una vez
+                with transaction.atomic():
+                    actualizadas += recalcular_totales(lote)
+
+        if options['verificar']:
+            for (carpeta_id, estado), almacenado, real in conteos_desalineados():
+                diferencias += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Conteo carpeta {carpeta_id} / {estado}: {almacenado}, esperado {real}'
+                ))
+        else:
+            with transaction.atomic():
+                recalcular_conteos()
+
+        if options['verificar']:
+            if diferencias:
+                raise CommandError(f'{diferencias} totales no coinciden; ejecute recalcular_totales sin --verificar')
+            self.stdout.write(self.style.SUCCESS(f'Totales verificados en {len(ids)} cotizaciones.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Totales recalculados en {actualizadas} cotizaciones.'))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cotizacion',
+            name='cant_costos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='N° Costos Adicionales'),
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='cant_materiales',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='N° Materiales'),
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='peso_total_kg',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=14, verbose_name='Peso Total (kg)'),
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='total_adicional',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Total Costos Adicionales ($)'),
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='total_materiales',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Total Materiales ($)'),
+        ),
+        migrations.AddField(
+            model_name='seccionmaterial',
+            name='cant_materiales',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='N° Materiales'),
+        ),
+        migrations.AddField(
+            model_name='seccionmaterial',
+            name='peso_total_kg',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=14, verbose_name='Peso Total (kg)'),
+        ),
+        migrations.AddField(
+            model_name='seccionmaterial',
+            name='total_materiales',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Total Materiales ($)'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Copia de constants.METROS_POR_BARRA: la migración no debe cambiar si
+# cambia la constante
+METROS_POR_BARRA = Decimal('6.0')
+
+
+def _agregado(queryset, campo, funcion, output_field):
+    # Misma subconsulta que aggregates._agregado, sobre los modelos históricos
+    subquery = (
+        queryset.filter(**{campo: OuterRef('pk')})
+        .order_by()
+        .values(campo)
+        .annotate(valor=funcion)
+        .values('valor')
+    )
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Calcula los agregados de las cotizaciones y secciones existentes (un UPDATE por tabla)."""
+    Cotizacion = apps.get_model('cotizador_app', 'Cotizacion')
+    SeccionMaterial = apps.get_model('cotizador_app', 'SeccionMaterial')
+    MaterialEstructural = apps.get_model('cotizador_app', 'MaterialEstructural')
+    CostoAdicional = apps.get_model('cotizador_app', 'CostoAdicional')
+
+    valor = DecimalField(max_digits=14, decimal_places=2)
+    peso = DecimalField(max_digits=14, decimal_places=3)
+    entero = IntegerField()
+    valor_material = Sum(
+        F('cant_a_comprar') * F('valor_unitario_m') * Value(METROS_POR_BARRA, output_field=valor),
+        output_field=valor,
+    )
+    peso_material = Sum(F('largo_m') * F('peso_kg_m'), output_field=peso)
+    valor_costo = Sum(F('cantidad') * F('valor_unitario'), output_field=valor)
+
+    materiales = MaterialEstructural.objects.all()
+    costos = CostoAdicional.objects.all()
+
+    SeccionMaterial.objects.update(
+        total_materiales=_agregado(materiales, 'seccion', valor_material, valor),
+        peso_total_kg=_agregado(materiales, 'seccion', peso_material, peso),
+        cant_materiales=_agregado(materiales, 'seccion', Count('id'), entero),
+    )
+    Cotizacion.objects.update(
+        total_materiales=_agregado(materiales, 'cotizacion', valor_material, valor),
+        total_adicional=_agregado(costos, 'cotizacion', valor_costo, valor),
+        peso_total_kg=_agregado(materiales, 'cotizacion', peso_material, peso),
+        cant_materiales=_agregado(materiales, 'cotizacion', Count('id'), entero),
+        cant_costos=_agregado(costos, 'cotizacion', Count('id'), entero),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0002_stored_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
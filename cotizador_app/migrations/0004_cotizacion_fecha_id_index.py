@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0003_backfill_stored_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='cotizacion_fecha_id_idx'),
+        ),
+    ]
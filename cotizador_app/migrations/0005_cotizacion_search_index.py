@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Nombres fijos: search.py consulta estas mismas tablas
+FTS_TABLE = 'cotizador_app_cotizacion_fts'
+PG_TABLE = 'cotizador_app_cotizacion_search'
+
+# Documento de cada cotización a partir de las tablas (para el backfill)
+_DOCUMENTS_SQL = '''
+    SELECT c.id, c.proyecto_nombre, COALESCE(cl.nombre, ''), COALESCE({materiales}, ''), c.notas_internas
+    FROM cotizador_app_cotizacion c
+    LEFT JOIN cotizador_app_cliente cl ON cl.id = c.cliente_id
+    LEFT JOIN cotizador_app_materialestructural m ON m.cotizacion_id = c.id
+    GROUP BY c.id, c.proyecto_nombre, cl.nombre, c.notas_internas
+'''
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"proyecto, cliente, materiales, notas, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, proyecto, cliente, materiales, notas) '
+            + _DOCUMENTS_SQL.format(materiales="GROUP_CONCAT(m.material_nombre, ' ')")
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            f'CREATE TABLE {PG_TABLE} ('
+            f'cotizacion_id bigint PRIMARY KEY REFERENCES cotizador_app_cotizacion (id) '
+            f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(f'CREATE INDEX {PG_TABLE}_document_idx ON {PG_TABLE} USING GIN (document)')
+        schema_editor.execute(
+            f'INSERT INTO {PG_TABLE} (cotizacion_id, document) '
+            f"SELECT id, setweight(to_tsvector('simple', unaccent(proyecto)), 'A') || "
+            f"setweight(to_tsvector('simple', unaccent(cliente)), 'B') || "
+            f"setweight(to_tsvector('simple', unaccent(materiales)), 'C') || "
+            f"setweight(to_tsvector('simple', unaccent(notas)), 'D') "
+            f'FROM (' + _DOCUMENTS_SQL.format(materiales="STRING_AGG(m.material_nombre, ' ')")
+            + ') AS docs (id, proyecto, cliente, materiales, notas)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {PG_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0004_cotizacion_fecha_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
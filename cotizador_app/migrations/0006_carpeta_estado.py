@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0005_cotizacion_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Carpeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=120, unique=True, verbose_name='Nombre')),
+                ('orden', models.IntegerField(default=0, verbose_name='Orden de Visualización')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Carpeta',
+                'verbose_name_plural': 'Carpetas',
+                'ordering': ['orden', 'nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoCotizaciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carpeta_id', models.PositiveIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('BORRADOR', 'Borrador'), ('POR_REVISAR', 'Por Revisar'), ('TERMINADO', 'Terminado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Conteo de Cotizaciones',
+                'verbose_name_plural': 'Conteos de Cotizaciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='estado',
+            field=models.CharField(choices=[('BORRADOR', 'Borrador'), ('POR_REVISAR', 'Por Revisar'), ('TERMINADO', 'Terminado'), ('CANCELADO', 'Cancelado')], default='BORRADOR', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddField(
+            model_name='cotizacion',
+            name='carpeta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cotizaciones', to='cotizador_app.carpeta', verbose_name='Carpeta'),
+        ),
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['estado', '-fecha_creacion', '-id'], name='cotizacion_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['carpeta', '-fecha_creacion', '-id'], name='cotizacion_carpeta_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conteocotizaciones',
+            constraint=models.UniqueConstraint(fields=('carpeta_id', 'estado'), name='conteo_carpeta_estado_unico'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_conteos(apps, schema_editor):
+    """Conteo inicial por (carpeta, estado): todas las cotizaciones existentes son BORRADOR sin carpeta."""
+    Cotizacion = apps.get_model('cotizador_app', 'Cotizacion')
+    ConteoCotizaciones = apps.get_model('cotizador_app', 'ConteoCotizaciones')
+
+    rows = Cotizacion.objects.order_by().values('carpeta_id', 'estado').annotate(cantidad=Count('id'))
+    ConteoCotizaciones.objects.bulk_create([
+        # 0 = sin carpeta (ConteoCotizaciones.SIN_CARPETA)
+        ConteoCotizaciones(carpeta_id=row['carpeta_id'] or 0, estado=row['estado'], cantidad=row['cantidad'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizador_app', '0006_carpeta_estado'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conteos, migrations.RunPython.noop),
+    ]
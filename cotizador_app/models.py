@@ -6,6 +6,8 @@ y costos adicionales del proyecto.
 """
 
 from django.db import models
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
@@ -14,6 +16,107 @@ from decimal import Decimal
 # Constante para barras estándar
 METROS_POR_BARRA = Decimal('6.00')
 
+# Tipos de salida de las sumas en SQL (misma escala que las columnas)
+_VALOR = models.DecimalField(max_digits=14, decimal_places=2)
+_PESO = models.DecimalField(max_digits=14, decimal_places=3)
+_ENTERO = models.IntegerField()
+
+
+def _suma_relacionada(queryset, campo, funcion, output_field):
+    """
+    Subconsulta correlacionada con el agregado de 'queryset' agrupado por
+    'campo' (la FK hacia la fila externa). COALESCE deja 0 cuando no hay
+    ítems.
+
+    Usamos una subconsulta por agregado en vez de Sum() sobre un JOIN:
+    unir materiales y costos a la vez multiplicaría las filas y los totales.
+    """
+    subquery = (
+        queryset.filter(**{campo: OuterRef('pk')})
+        .order_by()
+        .values(campo)
+        .annotate(valor=funcion)
+        .values('valor')
+    )
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def _valor_material():
+    """cant_a_comprar × METROS_POR_BARRA × valor_unitario_m (igual que total_value)."""
+    return Sum(
+        F('cant_a_comprar') * F('valor_unitario_m') * Value(METROS_POR_BARRA, output_field=_VALOR),
+        output_field=_VALOR,
+    )
+
+
+def _peso_material():
+    """largo_m × peso_kg_m (igual que peso_total)."""
+    return Sum(F('largo_m') * F('peso_kg_m'), output_field=_PESO)
+
+
+class CotizacionQuerySet(models.QuerySet):
+    """Totales de materiales y costos calculados en SQL, con precisión Decimal."""
+
+    @staticmethod
+    def expresiones_totales():
+        """Expresiones por columna agregada de Cotizacion (ver aggregates.py)."""
+        materiales = MaterialEstructural.objects.all()
+        costos = CostoAdicional.objects.all()
+        return {
+            'total_materiales': _suma_relacionada(materiales, 'cotizacion', _valor_material(), _VALOR),
+            'total_adicional': _suma_relacionada(
+                costos, 'cotizacion', Sum(F('cantidad') * F('valor_unitario'), output_field=_VALOR), _VALOR,
+            ),
+            'peso_total_kg': _suma_relacionada(materiales, 'cotizacion', _peso_material(), _PESO),
+            'cant_materiales': _suma_relacionada(materiales, 'cotizacion', Count('id'), _ENTERO),
+            'cant_costos': _suma_relacionada(costos, 'cotizacion', Count('id'), _ENTERO),
+        }
+
+    def with_totals(self):
+        """
+        Anota los totales en vivo desde los ítems, sin cargarlos:
+        materiales_calculado, adicional_calculado, peso_calculado y
+        total_calculado. Sirve para auditar total_costo y los agregados
+        almacenados.
+        """
+        expresiones = self.expresiones_totales()
+        return self.annotate(
+            materiales_calculado=expresiones['total_materiales'],
+            adicional_calculado=expresiones['total_adicional'],
+            peso_calculado=expresiones['peso_total_kg'],
+        ).annotate(
+            total_calculado=models.ExpressionWrapper(
+                F('materiales_calculado') + F('adicional_calculado'), output_field=_VALOR,
+            ),
+        )
+
+    def with_section_totals(self):
+        """Precarga las secciones de cada cotización con sus totales en SQL."""
+        return self.prefetch_related(
+            Prefetch('secciones', queryset=SeccionMaterial.objects.with_totals())
+        )
+
+
+class SeccionMaterialQuerySet(models.QuerySet):
+
+    @staticmethod
+    def expresiones_totales():
+        """Expresiones por columna agregada de SeccionMaterial."""
+        materiales = MaterialEstructural.objects.all()
+        return {
+            'total_materiales': _suma_relacionada(materiales, 'seccion', _valor_material(), _VALOR),
+            'peso_total_kg': _suma_relacionada(materiales, 'seccion', _peso_material(), _PESO),
+            'cant_materiales': _suma_relacionada(materiales, 'seccion', Count('id'), _ENTERO),
+        }
+
+    def with_totals(self):
+        """Anota materiales_calculado y peso_calculado de cada sección."""
+        expresiones = self.expresiones_totales()
+        return self.annotate(
+            materiales_calculado=expresiones['total_materiales'],
+            peso_calculado=expresiones['peso_total_kg'],
+        )
+
 
 class Cliente(models.Model):
     nombre = models.CharField(max_length=200)
@@ -27,6 +130,37 @@ class Cliente(models.Model):
         return self.nombre
 
 
+class Carpeta(models.Model):
+    """
+    Carpeta para organizar cotizaciones (ej. por obra o por año).
+
+    Cada cotización está en una carpeta o en ninguna ("Sin Carpeta").
+    """
+    nombre = models.CharField(
+        max_length=120,
+        unique=True,
+        verbose_name="Nombre"
+    )
+
+    orden = models.IntegerField(
+        default=0,
+        verbose_name="Orden de Visualización"
+    )
+
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Fecha de Creación"
+    )
+
+    class Meta:
+        verbose_name = "Carpeta"
+        verbose_name_plural = "Carpetas"
+        ordering = ['orden', 'nombre']
+
+    def __str__(self):
+        return self.nombre
+
+
 class Cotizacion(models.Model):
     """
     Modelo principal que representa una cotización de proyecto.
@@ -38,6 +172,18 @@ class Cotizacion(models.Model):
     Esto nos permite mantener un registro exacto de cómo estaba la cotización
     al momento de crearse, mientras permitimos edición futura si es necesario.
     """
+    # === Estados ===
+    ESTADO_BORRADOR = 'BORRADOR'
+    ESTADO_POR_REVISAR = 'POR_REVISAR'
+    ESTADO_TERMINADO = 'TERMINADO'
+    ESTADO_CANCELADO = 'CANCELADO'
+    ESTADOS = [
+        (ESTADO_BORRADOR, 'Borrador'),
+        (ESTADO_POR_REVISAR, 'Por Revisar'),
+        (ESTADO_TERMINADO, 'Terminado'),
+        (ESTADO_CANCELADO, 'Cancelado'),
+    ]
+
     # === Información General ===
     # default=timezone.now guarda la fecha actual al crear (permite modificación manual)
     # auto_now_add=True también guardaría la fecha actual pero NO permite modificación
@@ -64,6 +210,24 @@ class Cotizacion(models.Model):
         verbose_name="Cliente Asociado"
     )
     
+    # === Organización ===
+    # SET_NULL: borrar una carpeta deja sus cotizaciones "Sin Carpeta"
+    carpeta = models.ForeignKey(
+        Carpeta,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cotizaciones',
+        verbose_name="Carpeta"
+    )
+
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default=ESTADO_BORRADOR,
+        verbose_name="Estado"
+    )
+
     # === Totales Calculados ===
     # NOTA: Este campo es una desnormalización intencional
     # Guardamos el total para tener un snapshot histórico, pero también
@@ -80,6 +244,47 @@ class Cotizacion(models.Model):
         verbose_name="Notas Internas"
     )
 
+    # === Agregados Almacenados ===
+    # Desnormalización mantenida por cotizador_app/signals.py (y por
+    # aggregates.recalcular_totales después de un bulk_create): el listado
+    # muestra totales y conteos sin cargar los materiales de cada cotización.
+    # Se verifican/reconstruyen con el comando recalcular_totales.
+    total_materiales = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Total Materiales ($)"
+    )
+
+    total_adicional = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Total Costos Adicionales ($)"
+    )
+
+    peso_total_kg = models.DecimalField(
+        max_digits=14,
+        decimal_places=3,
+        default=0,
+        editable=False,
+        verbose_name="Peso Total (kg)"
+    )
+
+    cant_materiales = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="N° Materiales"
+    )
+
+    cant_costos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="N° Costos Adicionales"
+    )
+
     # === Snapshot JSON ===
     # Estos campos guardan el estado exacto de los ítems al momento de crear la cotización
     # Esto es útil porque:
@@ -98,39 +303,97 @@ class Cotizacion(models.Model):
         verbose_name="JSON Ítems Adicionales"
     )
 
+    # Campos que solo escribe aggregates.recalcular_totales
+    CAMPOS_AGREGADOS = ('total_materiales', 'total_adicional', 'peso_total_kg', 'cant_materiales', 'cant_costos')
+
+    objects = CotizacionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Cotización"
         verbose_name_plural = "Cotizaciones"
         # ordering con '-' ordena descendente (más reciente primero)
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Paginación keyset del listado (ver pagination.py), también
+            # filtrado por estado o carpeta
+            models.Index(fields=['-fecha_creacion', '-id'], name='cotizacion_fecha_id_idx'),
+            models.Index(fields=['estado', '-fecha_creacion', '-id'], name='cotizacion_estado_fecha_idx'),
+            models.Index(fields=['carpeta', '-fecha_creacion', '-id'], name='cotizacion_carpeta_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Cotización #{self.id} - {self.proyecto_nombre}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Carpeta y estado con que se cargó: signals.py los usa para mover
+        # el conteo de ConteoCotizaciones cuando cambian
+        instance._clave_conteo_original = instance.clave_conteo()
+        return instance
+
+    def clave_conteo(self):
+        """(carpeta, estado) en ConteoCotizaciones; None si no se cargaron ambos campos."""
+        deferred = self.get_deferred_fields()
+        if 'carpeta_id' in deferred or 'estado' in deferred:
+            return None
+        return (self.carpeta_id or ConteoCotizaciones.SIN_CARPETA, self.estado)
+
+    def save(self, *args, **kwargs):
+        """
+        Al actualizar no se escriben los agregados: una instancia cargada
+        antes de agregar ítems los pisaría con valores viejos.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = _campos_editables(self, self.CAMPOS_AGREGADOS)
+        super().save(*args, **kwargs)
     
     @property
     def calculated_total(self):
         """
-        Calcula el total dinámicamente sumando materiales y costos adicionales.
-        
-        Este property nos permite obtener el total actualizado si alguien
-        editó los ítems desde el admin, sin depender del campo total_costo.
-        
+        Total actual de materiales + costos adicionales.
+
+        A diferencia de total_costo (snapshot al crear), refleja las
+        ediciones hechas desde el admin. Si la cotización viene de
+        with_totals() usa el total calculado en SQL; si no, los agregados
+        almacenados. En ningún caso consulta los ítems.
+
         Returns:
             Decimal: Suma total de materiales + costos adicionales
         """
-        # Sumamos materiales: cantidad * precio unitario
-        materials_total = sum(
-            (item.cant_a_comprar * item.valor_unitario) 
-            for item in self.materiales_estructurales.all()
-        )
-        
-        # Sumamos costos adicionales: cantidad * precio unitario
-        overhead_total = sum(
-            (item.cantidad * item.valor_unitario) 
-            for item in self.costos_adicionales.all()
-        )
-        
-        return materials_total + overhead_total
+        if hasattr(self, 'total_calculado'):
+            return self.total_calculado
+        return self.total_materiales + self.total_adicional
+
+
+class ConteoCotizaciones(models.Model):
+    """
+    Cantidad de cotizaciones por (carpeta, estado).
+
+    Resumen para los contadores del listado: se mantiene de forma
+    incremental desde signals.py (+1/-1 al crear, mover o borrar una
+    cotización), así que leer todos los conteos es una consulta sobre unas
+    pocas filas en vez de un COUNT(*) por carpeta y estado. El comando
+    recalcular_totales lo reconstruye desde cero.
+
+    carpeta_id es un entero simple (SIN_CARPETA = 0) en vez de una FK: una
+    FK nula no entraría en la restricción única (NULL != NULL).
+    """
+    SIN_CARPETA = 0
+
+    carpeta_id = models.PositiveIntegerField(default=SIN_CARPETA)
+    estado = models.CharField(max_length=20, choices=Cotizacion.ESTADOS)
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Conteo de Cotizaciones"
+        verbose_name_plural = "Conteos de Cotizaciones"
+        constraints = [
+            models.UniqueConstraint(fields=['carpeta_id', 'estado'], name='conteo_carpeta_estado_unico'),
+        ]
+
+    def __str__(self):
+        return f"Carpeta {self.carpeta_id or '-'} / {self.estado}: {self.cantidad}"
 
 
 class SeccionMaterial(models.Model):
@@ -169,6 +432,33 @@ class SeccionMaterial(models.Model):
         auto_now_add=True,
         verbose_name="Fecha de Creación"
     )
+
+    # Agregados almacenados (ver Cotizacion.total_materiales)
+    total_materiales = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Total Materiales ($)"
+    )
+
+    peso_total_kg = models.DecimalField(
+        max_digits=14,
+        decimal_places=3,
+        default=0,
+        editable=False,
+        verbose_name="Peso Total (kg)"
+    )
+
+    cant_materiales = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="N° Materiales"
+    )
+    
+    CAMPOS_AGREGADOS = ('total_materiales', 'peso_total_kg', 'cant_materiales')
+
+    objects = SeccionMaterialQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Sección de Materiales"
@@ -190,7 +480,7 @@ class SeccionMaterial(models.Model):
         
         # Normalizar nombre (capitalizar cada palabra)
         if self.nombre:
-            self.nombre = self.nombre.strip().title()
+            self.nombre = self.normalizar_nombre(self.nombre)
         
         # Verificar duplicados case-insensitive
         duplicados = SeccionMaterial.objects.filter(
@@ -207,26 +497,32 @@ class SeccionMaterial(models.Model):
                 'nombre': f'Ya existe una sección con el nombre "{self.nombre}" en esta cotización.'
             })
     
+    @staticmethod
+    def normalizar_nombre(nombre):
+        """
+        Nombre como se guarda ("  baño 1" -> "Baño 1"). Quien use
+        bulk_create (que no pasa por clean) debe normalizar con esto y
+        evitar duplicados por nombre.lower().
+        """
+        return nombre.strip().title()
+    
     def save(self, *args, **kwargs):
         """Ejecuta validación automáticamente antes de guardar."""
         self.full_clean()
+        # Igual que Cotizacion.save: los agregados no se pisan al actualizar
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = _campos_editables(self, self.CAMPOS_AGREGADOS)
         super().save(*args, **kwargs)
     
     @property
     def subtotal_costo(self):
-        """Calcula el costo total de todos los materiales en esta sección."""
-        return sum(
-            material.total_value 
-            for material in self.materiales.all()
-        )
+        """Costo total de los materiales de esta sección (SQL o agregado almacenado)."""
+        return getattr(self, 'materiales_calculado', self.total_materiales)
     
     @property
     def subtotal_peso(self):
-        """Calcula el peso total de todos los materiales en esta sección."""
-        return sum(
-            material.total_weight
-            for material in self.materiales.all()
-        )
+        """Peso total de los materiales de esta sección (SQL o agregado almacenado)."""
+        return getattr(self, 'peso_calculado', self.peso_total_kg)
 
 
 class MaterialEstructural(models.Model):
@@ -385,4 +681,14 @@ class CostoAdicional(models.Model):
     @property
     def total_value(self):
         """Calcula el valor total de este costo adicional."""
-        return self.cantidad * self.valor_unitario
\ No newline at end of file
+        return self.cantidad * self.valor_unitario
+
+
+def _campos_editables(instance, excluidos):
+    """Campos concretos cargados del modelo, sin la PK ni los agregados almacenados."""
+    deferred = instance.get_deferred_fields()
+    return [
+        field.name
+        for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in excluidos and field.attname not in deferred
+    ]
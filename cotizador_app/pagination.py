@@ -0,0 +1,72 @@
+"""
+Paginación keyset del listado de cotizaciones.
+
+El listado se ordena por (fecha_creacion, id) descendente y cada página
+continúa desde la última fila vista:
+
+    WHERE fecha_creacion < f OR (fecha_creacion = f AND id < i)
+    ORDER BY fecha_creacion DESC, id DESC
+    LIMIT page_size + 1
+
+Con el índice (fecha_creacion, id) de Cotizacion la BD lee solo las filas
+de la página, sin importar cuán atrás esté (un OFFSET recorre todas las
+anteriores). El id desempata cotizaciones con la misma fecha, así que
+ninguna se repite ni se salta entre páginas.
+
+El cursor es la clave de la última fila en base64 ("<fecha ISO>|<id>"):
+opaco para el navegador, pero sin estado en el servidor.
+"""
+
+import base64
+import binascii
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+ORDERING = ('-fecha_creacion', '-id')
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor'])
+
+
+class CursorError(ValueError):
+    """El cursor recibido no es válido."""
+
+
+def encode_cursor(cotizacion):
+    raw = f'{cotizacion.fecha_creacion.isoformat()}|{cotizacion.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Retorna (fecha_creacion, id) del cursor."""
+    try:
+        fecha, _, pk = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+        return datetime.fromisoformat(fecha), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise CursorError('Cursor inválido')
+
+
+def paginate(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    Página de 'queryset' después de 'cursor' (None = primera página).
+
+    Returns:
+        KeysetPage con las cotizaciones y el cursor de la siguiente
+        página (None si es la última)
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    queryset = queryset.order_by(*ORDERING)
+    if cursor:
+        fecha, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk))
+
+    # Una fila extra indica si hay más páginas sin hacer COUNT(*)
+    items = list(queryset[:page_size + 1])
+    if len(items) > page_size:
+        items = items[:page_size]
+        return KeysetPage(items, encode_cursor(items[-1]))
+    return KeysetPage(items, None)
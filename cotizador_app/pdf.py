@@ -0,0 +1,434 @@
+"""
+PDF de una cotización (registro de costos internos).
+
+La generación se separa en dos pasos:
+
+1. load_pdf_data() lee de la BD todo lo que muestra el documento (cuatro
+   consultas) y lo deja en un PdfData con valores simples.
+2. render_pdf() arma el documento ReportLab solo con esos datos.
+
+Así el contenido del PDF se puede identificar con un hash (content_key,
+ver pdf_cache.py) sin renderizarlo, y renderizar no toca la BD.
+
+Las tablas de ítems se arman en tramos de pdf_styles.FILAS_POR_TABLA
+filas, cada uno con su encabezado y una fila de acumulado (o el subtotal
+de su sección), y cada tramo se formatea recién cuando ReportLab lo
+ubica en la página (_TablaDiferida). Partir una tabla cuesta en ReportLab
+proporcional a su largo, así que con tramos cortos el render crece en
+forma lineal con la cantidad de ítems, y solo el tramo en curso ocupa
+memoria como tabla.
+
+VERSION_PLANTILLA es parte del hash: hay que subirla al cambiar el diseño
+del documento para que no se sirvan PDFs cacheados con el diseño anterior.
+"""
+
+import hashlib
+import io
+import json
+import re
+from collections import namedtuple
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table
+
+from . import pdf_styles as estilos
+from .models import METROS_POR_BARRA, Cotizacion, SeccionMaterial
+
+VERSION_PLANTILLA = 2
+
+# Contenido del documento. materiales y costos son tuplas con los valores
+# de cada fila ya calculados (ver load_pdf_data)
+PdfData = namedtuple('PdfData', [
+    'id',
+    'proyecto_nombre',
+    'fecha_creacion',
+    'cliente_nombre',
+    'notas_internas',
+    'total_costo',
+    'materiales_calculado',
+    'peso_calculado',
+    'adicional_calculado',
+    'secciones',    # (id, nombre, materiales_calculado, peso_calculado), en orden
+    'materiales',   # (nombre, largo_m, unidad_comercial, cant_a_comprar, valor_unitario_m, valor_total, peso_kg_m, peso_total, seccion_id)
+    'costos',       # (descripcion, unidad, cantidad, valor_unitario, valor_total)
+])
+
+_SECCION = itemgetter(8)
+
+
+def load_pdf_data(cotizacion_id):
+    """
+    Datos del PDF de una cotización.
+
+    Los totales de materiales, secciones y costos salen de with_totals()
+    (SQL) y los de cada fila usan las mismas reglas que
+    MaterialEstructural.total_value y CostoAdicional.total_value. Los
+    materiales vienen agrupados por sección, en el orden de las secciones.
+
+    Raises:
+        Cotizacion.DoesNotExist: Si la cotización no existe
+    """
+    cotizacion = Cotizacion.objects.select_related('cliente').with_totals().get(id=cotizacion_id)
+
+    metros_por_barra = float(METROS_POR_BARRA)
+    materiales = [
+        (
+            nombre, largo_m, unidad_comercial, cant_a_comprar, valor_unitario_m,
+            float(valor_unitario_m) * cant_a_comprar * metros_por_barra,
+            peso_kg_m,
+            float(peso_kg_m) * float(largo_m),
+            seccion_id,
+        )
+        for nombre, largo_m, unidad_comercial, cant_a_comprar, valor_unitario_m, peso_kg_m, seccion_id
+        in cotizacion.materiales_estructurales.order_by('seccion__orden', 'seccion_id', 'id').values_list(
+            'material_nombre', 'largo_m', 'unidad_comercial', 'cant_a_comprar', 'valor_unitario_m', 'peso_kg_m',
+            'seccion_id',
+        )
+    ]
+    secciones = list(
+        SeccionMaterial.objects.filter(cotizacion_id=cotizacion.id).with_totals()
+        .order_by('orden', 'id').values_list('id', 'nombre', 'materiales_calculado', 'peso_calculado')
+    )
+    costos = [
+        (descripcion, unidad, cantidad, valor_unitario, cantidad * valor_unitario)
+        for descripcion, unidad, cantidad, valor_unitario
+        in cotizacion.costos_adicionales.order_by('id').values_list('descripcion', 'unidad', 'cantidad', 'valor_unitario')
+    ]
+
+    return PdfData(
+        id=cotizacion.id,
+        proyecto_nombre=cotizacion.proyecto_nombre,
+        fecha_creacion=cotizacion.fecha_creacion.strftime('%d-%m-%Y %H:%M'),
+        cliente_nombre=cotizacion.cliente.nombre if cotizacion.cliente else None,
+        notas_internas=cotizacion.notas_internas,
+        total_costo=cotizacion.total_costo,
+        materiales_calculado=cotizacion.materiales_calculado,
+        peso_calculado=cotizacion.peso_calculado,
+        adicional_calculado=cotizacion.adicional_calculado,
+        secciones=secciones,
+        materiales=materiales,
+        costos=costos,
+    )
+
+
+def content_key(data):
+    """Hash (sha256 hex) de todo lo que muestra el PDF y de la versión de la plantilla."""
+    payload = json.dumps([VERSION_PLANTILLA, *data], default=str, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def pdf_filename(data):
+    """
+    Genera un nombre de archivo descriptivo y seguro para el PDF.
+
+    Sanitiza el nombre del proyecto para prevenir path traversal y
+    caracteres problemáticos en sistemas de archivos.
+
+    Ejemplo: "cotizacion_Proyecto_Edificio_ABC_123.pdf"
+    """
+    # Eliminar caracteres peligrosos, permitir solo alfanuméricos, espacios, guiones y guiones bajos
+    safe_project_name = re.sub(r'[^a-zA-Z0-9\s\-_]', '', data.proyecto_nombre)
+
+    # Limitar largo para evitar nombres de archivo excesivamente largos
+    safe_project_name = safe_project_name[:50].strip()
+
+    # Reemplazar espacios por guiones bajos
+    safe_project_name = safe_project_name.replace(' ', '_')
+
+    # Si después de sanitizar quedó vacío, usar un nombre por defecto
+    if not safe_project_name:
+        safe_project_name = "sin_nombre"
+
+    return f"cotizacion_{safe_project_name}_{data.id}.pdf"
+
+
+def render_pdf(data):
+    """
+    Genera el PDF de la cotización y retorna sus bytes.
+
+    Esta función coordina la generación del PDF pero delega el trabajo
+    específico a funciones helper. Esto nos da:
+    - Código más legible y mantenible
+    - Facilidad para testear cada sección por separado
+    - Posibilidad de reutilizar secciones en otros reportes
+
+    Los estilos vienen ya construidos de pdf_styles.py.
+    """
+    buffer = io.BytesIO()
+
+    # Creamos el documento con márgenes personalizados
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=estilos.PAGINA,
+        leftMargin=estilos.MARGEN,
+        rightMargin=estilos.MARGEN,
+        topMargin=estilos.MARGEN,
+        bottomMargin=estilos.MARGEN,
+    )
+
+    # Story es una lista de elementos que ReportLab renderizará en orden
+    story = []
+
+    # Construimos cada sección del PDF
+    _build_header_section(story, data)
+    _build_materials_section(story, data)
+    _build_costs_section(story, data)
+    _build_total_section(story, data)
+    _build_notes_section(story, data)
+
+    # Renderizamos el PDF completo
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _build_header_section(story, data):
+    """
+    Construye la sección de encabezado del PDF con información general.
+
+    Incluye: Título, ID, fecha, cliente
+    """
+    # Título principal
+    story.append(Paragraph(
+        f"<b>REGISTRO DE COSTOS INTERNOS - PROYECTO: {data.proyecto_nombre.upper()}</b>",
+        estilos.TITULO
+    ))
+    story.append(Spacer(1, 0.2 * inch))
+
+    # Información básica
+    cliente_nombre = data.cliente_nombre or "N/A (Sin Cliente Asociado)"
+
+    story.append(Paragraph(f"<b>ID Cotización:</b> {data.id}", estilos.NORMAL))
+    story.append(Paragraph(f"<b>Fecha de Registro:</b> {data.fecha_creacion}", estilos.NORMAL))
+    story.append(Paragraph(f"<b>Cliente:</b> {cliente_nombre}", estilos.NORMAL))
+    story.append(Spacer(1, 0.1 * inch))
+
+
+def _build_materials_section(story, data):
+    """
+    Construye las tablas de materiales estructurales con totales.
+
+    Esta tabla incluye: material, largo, unidad comercial, cantidad,
+    valores unitarios y totales, pesos.
+
+    Si la cotización tiene secciones, cada una lleva su título y su
+    subtotal, y al final va el subtotal estructural. Los tramos largos
+    terminan con el acumulado de la sección hasta ese punto.
+    """
+    story.append(Paragraph("<b>1. Material Estructural (Metales, Planchas, etc.)</b>", estilos.SUBTITULO))
+    story.append(Spacer(1, 0.1 * inch))
+
+    # Fila de totales (calculados en SQL por with_totals)
+    subtotal = [
+        "SUBTOTAL ESTRUCTURAL:", '', '', '', '',
+        f"{data.materiales_calculado:,.0f}",
+        "PESO TOTAL:",
+        f"{data.peso_calculado:.3f}"
+    ]
+
+    if not data.secciones:
+        _append_tramos(story, data.materiales, _tabla_materiales, _suma_materiales, _pie_materiales, subtotal)
+    else:
+        secciones = {seccion_id: (nombre, total, peso) for seccion_id, nombre, total, peso in data.secciones}
+        for seccion_id, filas in groupby(data.materiales, key=_SECCION):
+            filas = list(filas)
+            if seccion_id in secciones:
+                nombre, total, peso = secciones[seccion_id]
+            else:
+                nombre, total, peso = "Sin sección", sum(f[5] for f in filas), sum(f[7] for f in filas)
+            story.append(Paragraph(nombre, estilos.SECCION))
+            _append_tramos(story, filas, _tabla_materiales, _suma_materiales, _pie_materiales, [
+                f"SUBTOTAL {nombre.upper()}:", '', '', '', '', f"{total:,.0f}", "PESO:", f"{peso:.3f}",
+            ])
+        story.append(_create_styled_table([subtotal], estilos.ANCHOS_MATERIALES, estilos.ESTILO_SUBTOTAL_MATERIALES))
+
+    story.append(Spacer(1, 0.3 * inch))
+
+
+def _tabla_materiales(filas, pie):
+    # Encabezado, una lista por fila (lo que pide Table) y pie
+    table_data = [list(estilos.ENCABEZADO_MATERIALES)]
+    table_data += [
+        [nombre, f"{largo_m:.2f}", f"{unidad_comercial:.2f}", cant_a_comprar,
+         f"{valor_unitario_m:,.0f}", f"{total_value:,.0f}", f"{peso_kg_m:.3f}", f"{total_weight:.3f}"]
+        for nombre, largo_m, unidad_comercial, cant_a_comprar, valor_unitario_m, total_value, peso_kg_m, total_weight, _s
+        in filas
+    ]
+    table_data.append(pie)
+
+    return _create_styled_table(
+        table_data, estilos.ANCHOS_MATERIALES, estilos.ESTILO_MATERIALES,
+        _alturas(fila[0] for fila in filas),
+    )
+
+
+def _suma_materiales(filas):
+    valor = peso = 0.0
+    for fila in filas:
+        valor += fila[5]
+        peso += fila[7]
+    return valor, peso
+
+
+def _pie_materiales(valor, peso):
+    return ["ACUMULADO:", '', '', '', '', f"{valor:,.0f}", "PESO:", f"{peso:.3f}"]
+
+
+def _build_costs_section(story, data):
+    """
+    Construye las tablas de costos adicionales con totales.
+
+    Incluye: descripción, unidad, cantidad, valores unitarios y totales.
+    """
+    story.append(Paragraph("<b>2. Insumos y Costos Adicionales</b>", estilos.SUBTITULO))
+    story.append(Spacer(1, 0.1 * inch))
+
+    _append_tramos(story, data.costos, _tabla_costos, _suma_costos, _pie_costos, [
+        "SUBTOTAL INSUMOS:", '', '', '',
+        f"{data.adicional_calculado:,.0f}"
+    ])
+    story.append(Spacer(1, 0.5 * inch))
+
+
+def _tabla_costos(filas, pie):
+    table_data = [list(estilos.ENCABEZADO_COSTOS)]
+    table_data += [
+        [descripcion, unidad, f"{cantidad:.2f}", f"{valor_unitario:,.0f}", f"{total_value:,.0f}"]
+        for descripcion, unidad, cantidad, valor_unitario, total_value in filas
+    ]
+    table_data.append(pie)
+
+    return _create_styled_table(
+        table_data, estilos.ANCHOS_COSTOS, estilos.ESTILO_COSTOS,
+        _alturas(descripcion + unidad for descripcion, unidad, *_valores in filas),
+    )
+
+
+def _suma_costos(filas):
+    return (sum(fila[4] for fila in filas),)
+
+
+def _pie_costos(valor):
+    return ["ACUMULADO:", '', '', '', f"{valor:,.0f}"]
+
+
+def _append_tramos(story, filas, tabla, suma, pie, subtotal):
+    """
+    Agrega las filas a la story en tramos de FILAS_POR_TABLA, cada uno con
+    su encabezado. Los tramos terminan con el acumulado hasta ese punto y
+    el último con el subtotal.
+
+    Args:
+        tabla: Función (filas, fila de pie) -> Table
+        suma: Función (filas) -> tupla de totales del tramo
+        pie: Función (*totales acumulados) -> fila de acumulado
+        subtotal: Fila de subtotal del último tramo
+    """
+    tamaño = estilos.FILAS_POR_TABLA
+    if len(filas) <= tamaño:
+        # Caso común: una sola tabla, se arma en el momento
+        story.append(tabla(filas, subtotal))
+        return
+
+    acumulado = None
+    for inicio in range(0, len(filas), tamaño):
+        fin = inicio + tamaño
+        tramo = filas[inicio:fin]
+        if fin >= len(filas):
+            fila_pie = subtotal
+        else:
+            totales = suma(tramo)
+            acumulado = totales if acumulado is None else tuple(map(sum, zip(acumulado, totales)))
+            fila_pie = pie(*acumulado)
+        story.append(_TablaDiferida(partial(tabla, tramo, fila_pie)))
+
+
+class _TablaDiferida(Flowable):
+    """
+    Tabla que se arma recién cuando ReportLab la ubica en la página.
+
+    doc.build descarta cada elemento de la story después de dibujarlo: con
+    esto las filas formateadas y los estilos por celda de Table existen
+    solo para el tramo en curso, no para toda la cotización.
+    """
+
+    def __init__(self, construir):
+        super().__init__()
+        self._construir = construir
+        self._tabla = None
+
+    def _table(self):
+        if self._tabla is None:
+            self._tabla = self._construir()
+        return self._tabla
+
+    def wrap(self, availWidth, availHeight):
+        self.width, self.height = self._table().wrap(availWidth, availHeight)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        return self._table().split(availWidth, availHeight)
+
+    def drawOn(self, canvas, x, y, _sW=0):
+        self._table().drawOn(canvas, x, y, _sW)
+
+
+def _build_total_section(story, data):
+    """
+    Construye la sección de total general destacada.
+
+    Usa el campo total_costo que se guardó al crear la cotización.
+    """
+    total_table = Table([[
+        "TOTAL GENERAL DE COSTOS:", f"${data.total_costo:,.0f}"
+    ]], colWidths=estilos.ANCHOS_TOTAL)
+    total_table.setStyle(estilos.ESTILO_TOTAL)
+
+    story.append(total_table)
+    story.append(Spacer(1, 0.5 * inch))
+
+
+def _build_notes_section(story, data):
+    """
+    Construye la sección de notas internas al final del documento.
+    """
+    story.append(Paragraph("<b>Notas Internas:</b>", estilos.SUBTITULO))
+
+    if data.notas_internas:
+        # Convertimos saltos de línea a tags HTML para que se muestren correctamente
+        formatted_notes = data.notas_internas.replace('\n', '<br/>')
+        story.append(Paragraph(formatted_notes, estilos.NORMAL))
+    else:
+        story.append(Paragraph("No se registraron notas internas.", estilos.CURSIVA))
+
+
+def _alturas(textos):
+    """
+    Altos de las filas de una tabla de ítems (encabezado, ítems y subtotal)
+    según el texto de cada ítem. Las filas con saltos de línea quedan en
+    None para que ReportLab las mida.
+    """
+    alturas = [estilos.ALTO_ENCABEZADO]
+    alturas += [None if '\n' in texto else estilos.ALTO_FILA for texto in textos]
+    alturas.append(estilos.ALTO_FILA)
+    return alturas
+
+
+def _create_styled_table(data, col_widths, style, row_heights=None):
+    """
+    Crea una tabla con uno de los estilos precompilados de pdf_styles.
+
+    Args:
+        data: Lista de listas con los datos de la tabla
+        col_widths: Lista con anchos de cada columna
+        style: TableStyle (ej. pdf_styles.ESTILO_MATERIALES)
+        row_heights: Alto de cada fila (ver _alturas), o None para medirlas
+
+    Returns:
+        Table: Objeto Table de ReportLab estilizado
+    """
+    table = Table(data, colWidths=col_widths, rowHeights=row_heights, repeatRows=1)
+    table.setStyle(style)
+    return table
@@ -0,0 +1,180 @@
+"""
+Caché de PDFs de cotizaciones, direccionado por contenido.
+
+Cada PDF se guarda bajo el hash de lo que muestra (pdf.content_key): si la
+cotización no cambió se sirve el archivo ya renderizado y si cambió el hash
+es otro, así que nunca se sirve un PDF desactualizado aunque la
+invalidación falle. Las señales (signals.py) de todas formas borran los
+PDFs de una cotización cuando ella o sus ítems cambian, para no ocupar
+disco con versiones que ya no se van a pedir.
+
+El backend se elige con PDF_CACHE_BACKEND. DiskBackend guarda los archivos
+en CACHE_ROOT/pdf/<cotizacion_id>/<hash>.pdf y, al pasar de
+PDF_CACHE_MAX_BYTES, borra los menos usados (LRU según el mtime, que se
+actualiza en cada lectura).
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .pdf import content_key, render_pdf
+
+# Al desalojar se baja hasta esta fracción del máximo, para no desalojar
+# de a un archivo en cada escritura
+_FRACCION_DESALOJO = 0.9
+
+
+class DiskBackend:
+    """PDFs en disco con límite de tamaño y desalojo LRU."""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or Path(settings.CACHE_ROOT) / 'pdf')
+        self.max_bytes = settings.PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    def open(self, cotizacion_id, key):
+        """Abre (en modo binario) el PDF cacheado, o retorna None si no está."""
+        path = self._path(cotizacion_id, key)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # marca de uso para el LRU
+        except FileNotFoundError:
+            pass  # otro worker lo desalojó; el archivo abierto sigue siendo legible
+        return file
+
+    def contains(self, cotizacion_id, key):
+        return self._path(cotizacion_id, key).is_file()
+
+    def save(self, cotizacion_id, key, data):
+        directory = self.root / str(cotizacion_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(cotizacion_id, key)
+        _atomic_write(path, data)
+
+        # Las versiones anteriores de la misma cotización ya no se van a pedir
+        for old in directory.glob('*.pdf'):
+            if old != path:
+                _unlink(old)
+
+        self._evict(keep=path)
+
+    def invalidate(self, cotizacion_ids):
+        for cotizacion_id in cotizacion_ids:
+            shutil.rmtree(self.root / str(cotizacion_id), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _path(self, cotizacion_id, key):
+        return self.root / str(cotizacion_id) / f'{key}.pdf'
+
+    def _entries(self):
+        try:
+            directories = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for directory in directories:
+            if not directory.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(directory.path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.endswith('.pdf'):
+                    yield entry
+
+    def _evict(self, keep):
+        if not self.max_bytes:
+            return
+
+        files = []
+        total = 0
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        objetivo = self.max_bytes * _FRACCION_DESALOJO
+        files.sort()
+        for _mtime, size, path in files:
+            if total <= objetivo:
+                break
+            if path == str(keep):
+                continue
+            _unlink(path)
+            total -= size
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass  # quedan otros archivos o ya no existe
+
+
+def get_backend():
+    """Backend configurado en settings.PDF_CACHE_BACKEND."""
+    return import_string(settings.PDF_CACHE_BACKEND)()
+
+
+def abrir_pdf(data, key=None):
+    """
+    Abre (en modo binario) el PDF de data, renderizándolo y guardándolo en
+    el caché si todavía no estaba. Lo cierra quien lo sirve (ej.
+    FileResponse). key es content_key(data), si quien llama ya lo calculó.
+    """
+    key = key or content_key(data)
+    backend = get_backend()
+
+    file = backend.open(data.id, key)
+    if file is not None:
+        return file
+
+    content = render_pdf(data)
+    try:
+        backend.save(data.id, key, content)
+    except OSError:
+        # Sin disco disponible igual servimos el PDF recién renderizado
+        return io.BytesIO(content)
+    return backend.open(data.id, key) or io.BytesIO(content)
+
+
+def invalidar(cotizacion_ids):
+    """Borra los PDFs cacheados de las cotizaciones al confirmar la transacción actual."""
+    cotizacion_ids = list(cotizacion_ids)
+    if cotizacion_ids:
+        transaction.on_commit(lambda: get_backend().invalidate(cotizacion_ids))
+
+
+def _atomic_write(path, data):
+    """Escribe en un archivo temporal y lo renombra: otro worker nunca lee un archivo a medias."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass  # otro worker lo borró primero
@@ -0,0 +1,191 @@
+"""
+Exportación masiva de PDFs de cotizaciones en un ZIP.
+
+exportar_zip() genera el ZIP de a pedazos (bytes) a medida que cada PDF
+está listo, para servirlo con StreamingHttpResponse o escribirlo a un
+archivo (comando exportar_pdfs) sin tener todos los PDFs en memoria:
+
+- Los datos de cada cotización se leen en el proceso principal (las
+  consultas de pdf.load_pdf_data) y se encolan en un pool de procesos que
+  solo ejecuta pdf.render_pdf. Hay a lo más 2 × workers PDFs en curso.
+  Los procesos se inician con 'spawn': hacer fork de un proceso con
+  threads (ej. los de pdf_queue) no es seguro.
+- Los PDFs que ya están en pdf_cache se copian del disco sin renderizar;
+  los renderizados se guardan en el caché para la próxima descarga.
+- Los PDFs se guardan sin comprimir (ZIP_STORED): ya vienen comprimidos
+  y deflate solo gastaría CPU.
+
+Con workers=0 todo se renderiza en el proceso actual; así lo usa la vista
+exportar_pdfs, para no crear procesos por cada request. El pool queda para
+el comando.
+"""
+
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import pdf_cache
+from .models import Cotizacion
+from .pdf import content_key, load_pdf_data, pdf_filename, render_pdf
+
+# Tamaño de los pedazos al copiar PDFs cacheados al ZIP
+CHUNK_SIZE = 64 * 1024
+
+
+def seleccionar_cotizaciones(ids=None, cliente=None, desde=None, hasta=None, queryset=None):
+    """
+    Ids de las cotizaciones a exportar, de la más reciente a la más antigua.
+
+    Args:
+        ids: Ids puntuales (opcional)
+        cliente: Id del cliente (opcional)
+        desde, hasta: Fechas 'AAAA-MM-DD' de creación, inclusive (opcional)
+        queryset: Cotizaciones ya filtradas (ej. por estado o carpeta)
+
+    Raises:
+        ValueError: Si una fecha no es válida
+    """
+    queryset = Cotizacion.objects.all() if queryset is None else queryset
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    if cliente:
+        queryset = queryset.filter(cliente_id=cliente)
+    for lookup, valor in (('gte', desde), ('lte', hasta)):
+        if valor:
+            fecha = parse_date(valor)
+            if fecha is None:
+                raise ValueError(f'Fecha inválida: {valor}')
+            queryset = queryset.filter(**{f'fecha_creacion__date__{lookup}': fecha})
+    return queryset.order_by('-fecha_creacion', '-id').values_list('id', flat=True)
+
+
+def exportar_zip(cotizacion_ids, workers=None, progress=None):
+    """
+    Genera (pedazos de bytes) un ZIP con el PDF de cada cotización.
+
+    Las cotizaciones que no existen (ej. borradas mientras se exporta) se
+    omiten. progress, si se indica, se llama con el nombre de cada PDF
+    agregado al ZIP. workers es la cantidad de procesos que renderizan
+    (por defecto PDF_EXPORT_WORKERS).
+    """
+    return (chunk for chunk in _generar_zip(cotizacion_ids, workers, progress) if chunk)
+
+
+def _generar_zip(cotizacion_ids, workers, progress):
+    salida = _Salida()
+    backend = pdf_cache.get_backend()
+    workers = settings.PDF_EXPORT_WORKERS if workers is None else workers
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+        for data, key, contenido in _pdfs(cotizacion_ids, backend, workers):
+            nombre = pdf_filename(data)
+            info = zipfile.ZipInfo(nombre, date_time=timezone.localtime().timetuple()[:6])
+
+            if contenido is not None:
+                zip_file.writestr(info, contenido)
+            else:
+                file = backend.open(data.id, key)
+                if file is None:
+                    # Lo desalojaron entre que lo vimos y ahora
+                    with pdf_cache.abrir_pdf(data, key) as file:
+                        zip_file.writestr(info, file.read())
+                else:
+                    info.file_size = os.fstat(file.fileno()).st_size
+                    with file, zip_file.open(info, 'w') as destino:
+                        while chunk := file.read(CHUNK_SIZE):
+                            destino.write(chunk)
+                            yield salida.take()
+            yield salida.take()
+
+            if progress:
+                progress(nombre)
+    yield salida.take()
+
+
+def _pdfs(cotizacion_ids, backend, workers):
+    """
+    (data, key, contenido) de cada cotización a medida que están listas.
+    contenido es None si el PDF se lee del caché.
+    """
+    pendientes = (item for item in (_cargar(cotizacion_id) for cotizacion_id in cotizacion_ids) if item)
+
+    if not workers:
+        for data, key in pendientes:
+            if backend.contains(data.id, key):
+                yield data, key, None
+            else:
+                yield data, key, _guardar(backend, data, key, render_pdf(data))
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+    ) as executor:
+        en_curso = {}
+        try:
+            for data, key in pendientes:
+                if backend.contains(data.id, key):
+                    yield data, key, None
+                    continue
+                en_curso[executor.submit(render_pdf, data)] = (data, key)
+                if len(en_curso) >= 2 * workers:
+                    yield from _terminados(en_curso, backend, FIRST_COMPLETED)
+            yield from _terminados(en_curso, backend)
+        finally:
+            # Si el cliente corta la descarga no seguimos renderizando
+            for future in en_curso:
+                future.cancel()
+
+
+def _terminados(en_curso, backend, return_when=ALL_COMPLETED):
+    listos, _ = wait(en_curso, return_when=return_when)
+    for future in listos:
+        data, key = en_curso.pop(future)
+        yield data, key, _guardar(backend, data, key, future.result())
+
+
+def _cargar(cotizacion_id):
+    try:
+        data = load_pdf_data(cotizacion_id)
+    except Cotizacion.DoesNotExist:
+        return None
+    return data, content_key(data)
+
+
+def _guardar(backend, data, key, contenido):
+    try:
+        backend.save(data.id, key, contenido)
+    except OSError:
+        pass  # sin caché el PDF igual va al ZIP
+    return contenido
+
+
+class _Salida:
+    """
+    Destino no posicionable del ZipFile: junta lo escrito hasta que se
+    retira con take(). Al no tener tell()/seek() zipfile escribe los
+    tamaños de cada archivo después de sus datos (data descriptor), así
+    que nunca tiene que volver atrás.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """Lo escrito desde la última llamada (puede ser b'')."""
+        data = b''.join(self._partes)
+        self._partes.clear()
+        return data
+
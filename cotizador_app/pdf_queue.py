@@ -0,0 +1,195 @@
+"""
+Cola de renders de PDF en segundo plano.
+
+Renderizar un PDF grande ocupa el worker de gunicorn durante todo el
+doc.build. Con esta cola el render corre en un pool de threads del mismo
+proceso (sin broker externo) y el resultado queda en pdf_cache: la
+descarga posterior solo lee el archivo.
+
+- encolar() programa el render de una cotización. crear_cotizacion y la
+  edición lo llaman al confirmar la transacción (pre-render).
+- estado() dice si el PDF de la versión actual ya está listo, para que el
+  navegador consulte antes de descargar (ver pdf_estado_api).
+- esperar_descarga() lo usa generar_pdf: si el PDF pedido se está
+  renderizando, espera ese render (a lo más ESPERA_DESCARGA segundos) en
+  vez de hacer otro igual. Si sigue en la cola detrás de otros renders lo
+  saca de ahí y la descarga lo renderiza por su cuenta.
+
+Los datos se leen de la BD en el thread que encola (cuatro consultas); los
+threads del pool solo renderizan y escriben en el caché, sin conexiones
+a la BD. Con PDF_RENDER_WORKERS = 0 no hay pool y encolar() renderiza en
+el momento.
+"""
+
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from . import pdf_cache
+from .models import Cotizacion
+from .pdf import content_key, load_pdf_data
+
+logger = logging.getLogger(__name__)
+
+LISTO = 'listo'
+PENDIENTE = 'pendiente'
+ERROR = 'error'
+
+# estado es LISTO, PENDIENTE o ERROR; key es el content_key de la versión actual
+EstadoPdf = namedtuple('EstadoPdf', ['estado', 'key'])
+
+# RLock: add_done_callback corre el callback en el mismo thread si el
+# render ya terminó, y el callback también toma el lock
+_lock = threading.RLock()
+_executor = None
+# (cotizacion_id, key) -> Future de los renders encolados o en curso
+_trabajos = {}
+# Claves de los renders fallidos que siguen en _trabajos (para informar
+# ERROR), del más antiguo al más reciente. Pasado MAX_FALLIDOS se olvidan
+# los más antiguos: si nadie vuelve a pedir ese PDF no hay que guardarlos
+MAX_FALLIDOS = 100
+_fallidos = OrderedDict()
+
+# Segundos que una descarga espera el render en curso antes de hacer el suyo
+ESPERA_DESCARGA = 10
+
+
+def encolar(cotizacion_id, reintentar=True):
+    """
+    Programa el render del PDF actual de la cotización si no está en el
+    caché ni en la cola, y retorna su EstadoPdf. Con reintentar=False un
+    render que falló se informa como ERROR en vez de volver a encolarse.
+
+    Raises:
+        Cotizacion.DoesNotExist: Si la cotización no existe
+    """
+    data = load_pdf_data(cotizacion_id)
+    key = content_key(data)
+    if pdf_cache.get_backend().contains(data.id, key):
+        return EstadoPdf(LISTO, key)
+
+    executor = _get_executor()
+    if executor is None:
+        _render(data, key)
+        return EstadoPdf(LISTO, key)
+
+    with _lock:
+        trabajo = _trabajos.get((data.id, key))
+        if trabajo is not None and _fallo(trabajo) and not reintentar:
+            return EstadoPdf(ERROR, key)
+        if trabajo is None or _fallo(trabajo):
+            # Los renders fallidos de versiones anteriores ya no se van a consultar
+            for anterior in [k for k in _trabajos if k[0] == data.id and k[1] != key]:
+                if _trabajos[anterior].done():
+                    del _trabajos[anterior]
+                    _fallidos.pop(anterior, None)
+            _fallidos.pop((data.id, key), None)
+            trabajo = executor.submit(_render, data, key)
+            _trabajos[(data.id, key)] = trabajo
+            trabajo.add_done_callback(lambda _trabajo: _terminar(data.id, key, _trabajo))
+    return _estado_trabajo(trabajo, key)
+
+
+def encolar_al_confirmar(cotizacion_id):
+    """encolar() al confirmar la transacción actual (la cotización ya es visible)."""
+    def _encolar():
+        try:
+            encolar(cotizacion_id)
+        except Cotizacion.DoesNotExist:
+            pass  # se borró antes de que llegáramos a encolarla
+    transaction.on_commit(_encolar)
+
+
+def estado(cotizacion_id):
+    """
+    EstadoPdf del PDF actual de la cotización. Si no está listo ni en la
+    cola, lo encola.
+
+    Raises:
+        Cotizacion.DoesNotExist: Si la cotización no existe
+    """
+    return encolar(cotizacion_id, reintentar=False)
+
+
+def esperar(cotizacion_id, key, timeout=None):
+    """Espera el render en curso de esa versión del PDF, si lo hay."""
+    with _lock:
+        trabajo = _trabajos.get((cotizacion_id, key))
+    if trabajo is not None:
+        try:
+            trabajo.result(timeout)
+        except Exception:
+            pass  # quien espera renderiza por su cuenta
+
+
+def esperar_descarga(cotizacion_id, key, timeout=ESPERA_DESCARGA):
+    """
+    Como esperar(), para quien va a servir el PDF: un render que todavía
+    no empieza se cancela (quien descarga lo hace por su cuenta, sin esperar
+    los renders encolados antes) y uno en curso se espera a lo más 'timeout'.
+    """
+    with _lock:
+        trabajo = _trabajos.get((cotizacion_id, key))
+    if trabajo is None or trabajo.cancel():
+        return
+    try:
+        trabajo.result(timeout)
+    except Exception:
+        pass  # incluye TimeoutError: quien espera renderiza por su cuenta
+
+
+def _get_executor():
+    global _executor
+    if not settings.PDF_RENDER_WORKERS:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PDF_RENDER_WORKERS, thread_name_prefix='pdf-render',
+            )
+        return _executor
+
+
+def _render(data, key):
+    backend = pdf_cache.get_backend()
+    if not backend.contains(data.id, key):
+        pdf_cache.abrir_pdf(data, key).close()
+
+
+def _fallo(trabajo):
+    return trabajo.done() and not trabajo.cancelled() and trabajo.exception() is not None
+
+
+def _terminar(cotizacion_id, key, trabajo):
+    if trabajo.cancelled():
+        # Lo canceló esperar_descarga: la descarga renderiza ese PDF
+        with _lock:
+            if _trabajos.get((cotizacion_id, key)) is trabajo:
+                del _trabajos[(cotizacion_id, key)]
+        return
+    if trabajo.exception() is not None:
+        logger.error("Falló el render del PDF de la cotización %s", cotizacion_id, exc_info=trabajo.exception())
+    with _lock:
+        if _trabajos.get((cotizacion_id, key)) is not trabajo:
+            return
+        if trabajo.exception() is None:
+            del _trabajos[(cotizacion_id, key)]
+            return
+        # Queda en _trabajos como ERROR hasta que se vuelva a encolar o
+        # hasta que lo desplacen fallos más recientes
+        _fallidos[(cotizacion_id, key)] = None
+        while len(_fallidos) > MAX_FALLIDOS:
+            antiguo, _ = _fallidos.popitem(last=False)
+            del _trabajos[antiguo]
+
+
+def _estado_trabajo(trabajo, key):
+    if not trabajo.done():
+        return EstadoPdf(PENDIENTE, key)
+    if _fallo(trabajo):
+        return EstadoPdf(ERROR, key)
+    return EstadoPdf(LISTO, key)
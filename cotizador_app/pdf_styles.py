@@ -0,0 +1,121 @@
+"""
+Estilos del PDF de cotizaciones, construidos una sola vez por proceso.
+
+getSampleStyleSheet() y cada TableStyle (que parsea su lista de comandos)
+cuestan lo mismo en cada render; aquí quedan listos al importar el módulo
+y pdf.py solo los referencia. Un TableStyle se puede aplicar a cualquier
+cantidad de tablas: las coordenadas negativas (ej. la fila de subtotal)
+se resuelven al aplicarlo a cada tabla.
+
+El documento usa las fuentes estándar de PDF (Helvetica), que no hay que
+registrar ni embeber. Para usar una TTF hay que registrarla aquí con
+pdfmetrics.registerFont y cambiar FUENTE / FUENTE_NEGRITA.
+"""
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import TableStyle
+
+FUENTE = 'Helvetica'
+FUENTE_NEGRITA = 'Helvetica-Bold'
+
+PAGINA = letter
+MARGEN = 0.5 * inch
+
+# Estilos de párrafo
+_hoja = getSampleStyleSheet()
+TITULO = _hoja['Heading1']
+SUBTITULO = _hoja['h2']
+NORMAL = _hoja['Normal']
+CURSIVA = _hoja['Italic']
+# Título de cada SeccionMaterial, siempre en la misma página que su tabla
+SECCION = ParagraphStyle('Seccion', parent=_hoja['h3'], keepWithNext=1)
+
+# Colores del diseño corporativo
+AZUL_ENCABEZADO = colors.HexColor('#002B5B')
+AMARILLO_BORDE = colors.HexColor('#FFCC00')
+
+# Diseño de columnas de cada tabla
+ANCHOS_MATERIALES = [1.8*inch, 0.6*inch, 0.7*inch, 0.6*inch, 0.9*inch, 1.1*inch, 0.8*inch, 1.0*inch]
+ENCABEZADO_MATERIALES = (
+    "Material", "Largo (m)", "Unidad Com.", "Cant. Comp.",
+    "Valor Unit. ($)", "Valor Total ($)", "Peso (kg/m)", "Peso Total (kg)",
+)
+ANCHOS_COSTOS = [2.8*inch, 0.8*inch, 0.8*inch, 1.2*inch, 1.2*inch]
+ENCABEZADO_COSTOS = (
+    "Descripción / Concepto", "Unidad", "Cantidad", "Valor Unitario ($)", "Valor Total ($)",
+)
+ANCHOS_TOTAL = [4*inch, 2*inch]
+
+# Alto de las filas de una línea (en puntos): leading 12 de Helvetica 10 más
+# el padding de 3 arriba y 3 abajo (el encabezado tiene 12 abajo). Dárselos
+# a Table le evita medir cada celda, lo que ReportLab hace en tiempo
+# cuadrático con la cantidad de filas
+ALTO_FILA = 18
+ALTO_ENCABEZADO = 27
+
+# Filas de ítems por tabla. Con encabezado y pie un tramo cabe en una página
+# carta (27 + 35 × 18 + 18 pt < 720 pt), así que ReportLab parte a lo más
+# una vez cada tabla
+FILAS_POR_TABLA = 35
+
+
+def _estilo_tabla(subtotal_span):
+    """
+    Estilo corporativo de las tablas de ítems.
+
+    Args:
+        subtotal_span: Tupla (start_col, end_col) para merge en última fila
+    """
+    return TableStyle([
+        # Encabezado: fondo azul oscuro, texto blanco
+        ('BACKGROUND', (0, 0), (-1, 0), AZUL_ENCABEZADO),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+
+        # Alineación: números a la derecha, texto a la izquierda
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+
+        # Tipografía
+        ('FONTNAME', (0, 0), (-1, 0), FUENTE_NEGRITA),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+
+        # Bordes para todas las filas excepto la última (subtotal)
+        ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
+
+        # Fila de subtotal: fondo gris, texto en negrita
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('SPAN', (subtotal_span[0], -1), (subtotal_span[1], -1)),  # Merge columnas especificadas
+        ('FONTNAME', (0, -1), (-1, -1), FUENTE_NEGRITA),
+
+        # Destacar columna de total en rojo
+        ('TEXTCOLOR', (-1, -1), (-1, -1), colors.red),
+    ])
+
+
+# Merge de las columnas de descripción en la fila de subtotal
+ESTILO_MATERIALES = _estilo_tabla((0, 4))
+ESTILO_COSTOS = _estilo_tabla((0, 3))
+
+# Subtotal estructural de las cotizaciones con secciones (tabla de una fila)
+ESTILO_SUBTOTAL_MATERIALES = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('SPAN', (0, 0), (4, 0)),
+    ('FONTNAME', (0, 0), (-1, -1), FUENTE_NEGRITA),
+    ('TEXTCOLOR', (-1, 0), (-1, 0), colors.red),
+])
+
+ESTILO_TOTAL = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.yellow),
+    ('GRID', (0, 0), (-1, -1), 1, AMARILLO_BORDE),
+    ('FONTNAME', (0, 0), (-1, -1), FUENTE_NEGRITA),
+    ('FONTSIZE', (0, 0), (0, 0), 16),
+    ('FONTSIZE', (1, 0), (1, 0), 20),
+    ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('INNERPADDING', (0, 0), (-1, -1), 10),
+])
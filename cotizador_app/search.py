@@ -0,0 +1,271 @@
+"""
+Índice de búsqueda full-text de cotizaciones.
+
+Cada cotización se indexa como un documento con cuatro campos, de mayor a
+menor peso en el ranking:
+
+    proyecto    proyecto_nombre
+    cliente     nombre del cliente
+    materiales  material_nombre de sus materiales estructurales
+    notas       notas_internas
+
+El backend depende de la BD:
+
+- SQLite:   tabla virtual FTS5 (cotizador_app_cotizacion_fts), ranking bm25
+- Postgres: tabla con una columna tsvector + índice GIN
+            (cotizador_app_cotizacion_search), ranking ts_rank
+- Otras:    sin índice; LIKE sobre las columnas (solo como respaldo)
+
+Las tablas se crean en la migración 0005 según el motor. El índice se
+mantiene desde signals.py (save/delete de la cotización o sus materiales);
+quien use bulk_create debe llamar a index_cotizaciones().
+
+Las consultas se interpretan como typeahead: cada palabra es un prefijo y
+deben aparecer todas ("galp nuñ" encuentra "Galpón Ñuñoa").
+
+Calcular la relevancia de una coincidencia cuesta mucho más que
+encontrarla: con 100k cotizaciones, ordenar todas las de un prefijo amplio
+("c", "perfil h") tarda 60-110 ms. Si una consulta tiene más de
+RANK_CANDIDATES coincidencias se ordenan por relevancia solo las más
+recientes (el índice las entrega en orden de id sin calcular nada), lo que
+deja cualquier consulta bajo ~40 ms, y SearchPage.truncated lo indica para
+que la API avise que hay resultados sin rankear. Las consultas específicas,
+que son las que importan en un typeahead, se rankean completas.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Cotizacion, MaterialEstructural
+
+FTS_TABLE = 'cotizador_app_cotizacion_fts'
+PG_TABLE = 'cotizador_app_cotizacion_search'
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Máximo de coincidencias que se ordenan por relevancia (ver arriba)
+RANK_CANDIDATES = 1000
+
+# Pesos de proyecto, cliente, materiales y notas en bm25
+_BM25_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+SearchPage = namedtuple('SearchPage', ['ids', 'has_more', 'truncated'])
+
+
+def tokenize(query):
+    """Palabras de la consulta en minúsculas y sin tildes."""
+    normalized = unicodedata.normalize('NFKD', query.lower())
+    normalized = ''.join(char for char in normalized if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(normalized)
+
+
+def get_backend():
+    """Backend de búsqueda para la conexión actual."""
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return LikeBackend()
+
+
+def search(query, page=1, page_size=PAGE_SIZE, queryset=None):
+    """
+    Ids de las cotizaciones que calzan con 'query', de mayor a menor
+    relevancia (a igual relevancia, las más recientes primero).
+
+    'queryset' (ej. Cotizacion.objects.filter(estado=...)) restringe la
+    búsqueda a esas cotizaciones; el filtro se aplica antes de elegir los
+    candidatos a rankear, así que no acorta las páginas.
+
+    Returns:
+        SearchPage con los ids de la página, si hay más resultados y si el
+        ranking se limitó a las RANK_CANDIDATES coincidencias más recientes
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return SearchPage([], False, False)
+
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    offset = (max(page, 1) - 1) * page_size
+    # Una fila extra indica si hay más páginas sin hacer COUNT(*)
+    ids, truncated = get_backend().search(tokens, page_size + 1, offset, queryset)
+    return SearchPage(ids[:page_size], len(ids) > page_size, truncated)
+
+
+def index_cotizaciones(cotizacion_ids):
+    """(Re)indexa las cotizaciones indicadas. Las que ya no existen se quitan."""
+    cotizacion_ids = list(cotizacion_ids)
+    if not cotizacion_ids:
+        return
+    backend = get_backend()
+    documents = list(_documents(cotizacion_ids))
+    backend.remove(cotizacion_ids)
+    backend.add(documents)
+
+
+def remove_cotizaciones(cotizacion_ids):
+    cotizacion_ids = list(cotizacion_ids)
+    if cotizacion_ids:
+        get_backend().remove(cotizacion_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Vacía y reconstruye el índice completo (migraciones, reparaciones)."""
+    backend = get_backend()
+    backend.clear()
+    ids = list(Cotizacion.objects.values_list('id', flat=True))
+    for start in range(0, len(ids), batch_size):
+        backend.add(_documents(ids[start:start + batch_size]))
+
+
+def _documents(cotizacion_ids):
+    """(id, proyecto, cliente, materiales, notas) en dos consultas."""
+    materiales = {}
+    rows = MaterialEstructural.objects.filter(cotizacion_id__in=cotizacion_ids) \
+        .order_by().values_list('cotizacion_id', 'material_nombre')
+    for cotizacion_id, nombre in rows:
+        materiales.setdefault(cotizacion_id, []).append(nombre)
+
+    rows = Cotizacion.objects.filter(id__in=cotizacion_ids).order_by() \
+        .values_list('id', 'proyecto_nombre', 'cliente__nombre', 'notas_internas')
+    for cotizacion_id, proyecto, cliente, notas in rows:
+        yield (
+            cotizacion_id,
+            proyecto or '',
+            cliente or '',
+            ' '.join(materiales.get(cotizacion_id, ())),
+            notas or '',
+        )
+
+
+def _restriction(column, queryset):
+    """' AND column IN (SELECT id ...)' para limitar la búsqueda a 'queryset'."""
+    if queryset is None:
+        return '', ()
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    return f' AND {column} IN ({sql})', params
+
+
+def _candidates(limit, offset):
+    # Las páginas más allá de RANK_CANDIDATES amplían el conjunto rankeado
+    return max(RANK_CANDIDATES, offset + limit)
+
+
+def _ranked(candidates_sql, params, rank, rank_params, limit, offset):
+    """
+    (ids, truncated): ordena por 'rank' (expresión SQL, lo más relevante
+    primero) las coincidencias más recientes. 'candidates_sql' retorna las
+    coincidencias con su id ('id') en orden de id descendente y termina en
+    LIMIT %s; se le pide un candidato extra que no se rankea: si llega,
+    quedaron coincidencias fuera del ranking.
+    """
+    candidates = _candidates(limit, offset)
+    sql = (
+        f'SELECT id, total FROM ('
+        f'SELECT *, COUNT(*) OVER () AS total, ROW_NUMBER() OVER (ORDER BY id DESC) AS pos '
+        f'FROM ({candidates_sql}) AS candidates'
+        f') AS ranked WHERE pos <= %s ORDER BY {rank}, id DESC LIMIT %s OFFSET %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, candidates + 1, candidates, *rank_params, limit, offset])
+        rows = cursor.fetchall()
+    return [row[0] for row in rows], bool(rows) and rows[0][1] > candidates
+
+
+class SQLiteFTSBackend:
+    """FTS5 con tokenizer unicode61 (sin tildes) e índices de prefijo de 2 y 3 letras."""
+
+    def search(self, tokens, limit, offset, queryset=None):
+        # Cada token entre comillas (escapa la sintaxis de FTS5) y como prefijo
+        match = ' AND '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+        bm25 = 'bm25({}, {})'.format(FTS_TABLE, ', '.join(str(weight) for weight in _BM25_WEIGHTS))
+        restriction, restriction_params = _restriction('rowid', queryset)
+        sql = (
+            f'SELECT rowid AS id, {bm25} AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{restriction} '
+            f'ORDER BY rowid DESC LIMIT %s'
+        )
+        return _ranked(sql, [match, *restriction_params], 'rank', [], limit, offset)
+
+    def add(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, proyecto, cliente, materiales, notas) VALUES (%s, %s, %s, %s, %s)',
+                list(documents),
+            )
+
+    def remove(self, cotizacion_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[pk] for pk in cotizacion_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+class PostgresBackend:
+    """tsvector con pesos A-D por campo; configuración 'simple' + unaccent."""
+
+    def search(self, tokens, limit, offset, queryset=None):
+        # to_tsquery con prefijos: 'galp:* & nun:*'
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        restriction, restriction_params = _restriction('cotizacion_id', queryset)
+        # ts_rank va fuera de la subconsulta: solo se calcula para los candidatos
+        sql = (
+            f'SELECT cotizacion_id AS id, document FROM {PG_TABLE} '
+            f"WHERE document @@ to_tsquery('simple', %s){restriction} "
+            f'ORDER BY cotizacion_id DESC LIMIT %s'
+        )
+        rank = "ts_rank(document, to_tsquery('simple', %s)) DESC"
+        return _ranked(sql, [query, *restriction_params], rank, [query], limit, offset)
+
+    def add(self, documents):
+        sql = (
+            f'INSERT INTO {PG_TABLE} (cotizacion_id, document) VALUES (%s, '
+            f"setweight(to_tsvector('simple', unaccent(%s)), 'A') || "
+            f"setweight(to_tsvector('simple', unaccent(%s)), 'B') || "
+            f"setweight(to_tsvector('simple', unaccent(%s)), 'C') || "
+            f"setweight(to_tsvector('simple', unaccent(%s)), 'D'))"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, list(documents))
+
+    def remove(self, cotizacion_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {PG_TABLE} WHERE cotizacion_id = ANY(%s)', [list(cotizacion_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {PG_TABLE}')
+
+
+class LikeBackend:
+    """Respaldo sin índice para motores sin soporte full-text configurado."""
+
+    def search(self, tokens, limit, offset, queryset=None):
+        queryset = Cotizacion.objects.all() if queryset is None else queryset
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(proyecto_nombre__icontains=token)
+                | Q(cliente__nombre__icontains=token)
+                | Q(materiales_estructurales__material_nombre__icontains=token)
+                | Q(notas_internas__icontains=token)
+            )
+        ids = queryset.order_by('-fecha_creacion', '-id').values_list('id', flat=True).distinct()
+        # Sin ranking no hay nada que truncar
+        return list(ids[offset:offset + limit]), False
+
+    def add(self, documents):
+        pass
+
+    def remove(self, cotizacion_ids):
+        pass
+
+    def clear(self):
+        pass
@@ -0,0 +1,151 @@
+"""
+Señales que mantienen los datos derivados de cada cotización:
+
+- Los agregados almacenados de Cotizacion y SeccionMaterial (aggregates.py)
+- Los conteos por carpeta y estado (ConteoCotizaciones)
+- El índice de búsqueda full-text (search.py)
+- Los PDFs cacheados (pdf_cache.py), que se borran al cambiar
+
+Cada save/delete individual de una cotización, material o costo adicional
+los actualiza dentro de la misma transacción. bulk_create y QuerySet.update
+no envían señales: quien los use debe llamar a
+aggregates.recalcular_totales() y search.index_cotizaciones(). Para guardar
+muchos ítems de una vez (ej. los inlines del admin) aplazar_actualizaciones()
+junta las cotizaciones afectadas y las actualiza una sola vez al salir del
+bloque.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import pdf_cache, search
+from .aggregates import incrementar_conteo, mover_conteos_a_sin_carpeta, recalcular_totales
+from .models import Carpeta, Cliente, ConteoCotizaciones, CostoAdicional, Cotizacion, MaterialEstructural
+
+
+@receiver(post_save, sender=MaterialEstructural)
+@receiver(post_save, sender=CostoAdicional)
+@receiver(post_delete, sender=MaterialEstructural)
+@receiver(post_delete, sender=CostoAdicional)
+def actualizar_totales(sender, instance, origin=None, **kwargs):
+    if _borrando_cotizacion(origin):
+        # Se borra la cotización completa: no hay totales que mantener
+        return
+
+    _marcar(instance.cotizacion_id, totales=True, busqueda=sender is MaterialEstructural)
+
+
+@receiver(post_save, sender=Cotizacion)
+def indexar_cotizacion(sender, instance, **kwargs):
+    _marcar(instance.id, busqueda=True)
+
+
+@receiver(pre_save, sender=Cotizacion)
+@receiver(pre_delete, sender=Cotizacion)
+def leer_clave_conteo(sender, instance, **kwargs):
+    # Instancia con carpeta o estado diferidos (ej. las del listado): leemos
+    # la clave guardada de esa fila para mover el conteo sin recontar todo
+    if not instance._state.adding and getattr(instance, '_clave_conteo_original', None) is None:
+        instance._clave_conteo_original = _clave_guardada(instance.pk)
+
+
+@receiver(post_save, sender=Cotizacion)
+def actualizar_conteo(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_clave_conteo_original', None)
+    # Los campos diferidos no se escriben: su valor es el que quedó en la fila
+    actual = instance.clave_conteo() or _clave_guardada(instance.pk)
+    if anterior != actual:
+        if anterior is not None:
+            incrementar_conteo(anterior, -1)
+        incrementar_conteo(actual, 1)
+    instance._clave_conteo_original = actual
+
+
+@receiver(post_delete, sender=Cotizacion)
+def quitar_cotizacion(sender, instance, **kwargs):
+    search.remove_cotizaciones([instance.id])
+    pdf_cache.invalidar([instance.id])
+
+    # leer_clave_conteo ya completó la clave de las instancias diferidas
+    clave = getattr(instance, '_clave_conteo_original', None) or instance.clave_conteo()
+    if clave is not None:
+        incrementar_conteo(clave, -1)
+
+
+@receiver(pre_delete, sender=Carpeta)
+def vaciar_carpeta(sender, instance, **kwargs):
+    # SET_NULL se aplica con un UPDATE sin señales: movemos los conteos aquí
+    mover_conteos_a_sin_carpeta(instance.id)
+
+
+@receiver(post_save, sender=Cliente)
+def reindexar_cliente(sender, instance, created, **kwargs):
+    # El nombre del cliente es parte del documento de sus cotizaciones
+    if not created:
+        for cotizacion_id in instance.cotizaciones.values_list('id', flat=True):
+            _marcar(cotizacion_id, busqueda=True)
+
+
+def _clave_guardada(cotizacion_id):
+    """(carpeta, estado) de la fila guardada; None si no existe."""
+    fila = Cotizacion.objects.filter(pk=cotizacion_id).values_list('carpeta_id', 'estado').first()
+    if fila is None:
+        return None
+    carpeta_id, estado = fila
+    return (carpeta_id or ConteoCotizaciones.SIN_CARPETA, estado)
+
+
+def _borrando_cotizacion(origin):
+    if isinstance(origin, QuerySet):
+        return origin.model is Cotizacion
+    return isinstance(origin, Cotizacion)
+
+
+def _marcar(cotizacion_id, totales=False, busqueda=False):
+    pendientes = getattr(_state, 'pendientes', None)
+    if pendientes is not None:
+        if totales:
+            pendientes['totales'].add(cotizacion_id)
+        if busqueda:
+            pendientes['busqueda'].add(cotizacion_id)
+        return
+
+    if totales:
+        recalcular_totales([cotizacion_id])
+    if busqueda:
+        search.index_cotizaciones([cotizacion_id])
+    # Todo lo que cambia totales o búsqueda también se ve en el PDF
+    pdf_cache.invalidar([cotizacion_id])
+
+
+_state = threading.local()
+
+
+@contextmanager
+def aplazar_actualizaciones(totales=True):
+    """
+    Actualiza totales e índice una vez al final del bloque en vez de una
+    vez por ítem guardado. Usar dentro de la transacción que guarda los ítems.
+
+    Con totales=False los totales no se recalculan: quien usa el bloque los
+    mantiene por su cuenta (ej. editor.py con aggregates.ajustar_totales).
+    """
+    if getattr(_state, 'pendientes', None) is not None:
+        # Bloque anidado: lo actualiza el bloque externo
+        yield
+        return
+
+    _state.pendientes = {'totales': set(), 'busqueda': set()}
+    try:
+        yield
+        pendientes = _state.pendientes
+    finally:
+        _state.pendientes = None
+    if totales:
+        recalcular_totales(pendientes['totales'])
+    search.index_cotizaciones(pendientes['busqueda'])
+    pdf_cache.invalidar(pendientes['totales'] | pendientes['busqueda'])
@@ -1,3 +1,1085 @@
-from django.test import TestCase
+"""
+Tests para el sistema de cotizaciones.
 
-# Create your tests here.
+Verifican que los cálculos de barras y totales se hagan en el servidor a
+partir de los cortes, sin depender de lo que calcula el navegador.
+"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.platypus import Table
+
+from cotizador_app.calculations import CalculationError, calcular_barras, calcular_cotizacion
+from cotizador_app.cutting import CuttingError, optimizar_cortes
+from cotizador_app.importer import importar_cotizaciones
+from cotizador_app.aggregates import conteos_desalineados, resumen_conteos, totales_desalineados
+from cotizador_app.models import (
+    Carpeta, Cliente, ConteoCotizaciones, CostoAdicional, Cotizacion, MaterialEstructural, SeccionMaterial,
+)
+from cotizador_app import search as search_module
+from cotizador_app.search import search
+from cotizador_app.pagination import paginate
+from cotizador_app import pdf_queue
+from cotizador_app import pdf_styles
+from cotizador_app.pdf import _TablaDiferida, _build_materials_section, content_key, load_pdf_data, render_pdf
+from cotizador_app.pdf_cache import DiskBackend
+from cotizador_app.signals import aplazar_actualizaciones
+
+
+class TestMotorCalculo(TestCase):
+    """Tests para cotizador_app/calculations.py."""
+
+    def test_barras_con_margen_de_seguridad(self):
+        """Misma regla que calculateBarsToBuy: ⌈m/6⌉ y luego ⌈×1.25⌉."""
+        self.assertEqual(calcular_barras(0), (0, 0))
+        self.assertEqual(calcular_barras(6000), (1, 2))
+        self.assertEqual(calcular_barras(6001), (2, 3))
+        self.assertEqual(calcular_barras(48000), (8, 10))
+
+    def test_largos_sin_error_de_punto_flotante(self):
+        """0.1 m × 60 son exactamente 6 m: una barra, no dos."""
+        calculo = calcular_cotizacion([{'cortes': [{'largo_m': 0.1, 'cantidad': 60}]}])
+        material = calculo.materiales[0]
+
+        self.assertEqual(material.largo_m, Decimal('6.00'))
+        self.assertEqual(material.cant_necesaria, 1)
+
+    def test_totales_de_la_cotizacion(self):
+        """El total suma lo que se COMPRA (con margen) más los costos adicionales."""
+        calculo = calcular_cotizacion(
+            [{
+                'profile_id': '7',
+                'cortes': [{'largo_m': 2.5, 'cantidad': 4}, {'largo_m': 1, 'cantidad': 1}],
+                'peso_kg_m': 10,
+                'valor_unitario_m': 1000,
+            }],
+            [{'cantidad': 2, 'valor_unitario': 500}],
+        )
+        material = calculo.materiales[0]
+
+        self.assertEqual(material.profile_id, 7)
+        self.assertEqual((material.cant_necesaria, material.cant_a_comprar), (2, 3))
+        self.assertEqual(material.peso_total, Decimal('110.000'))
+        # 3 barras × 6 m × $1.000 + 2 × $500
+        self.assertEqual(calculo.total_costo, Decimal('19000'))
+
+    def test_valores_invalidos(self):
+        """Largos negativos o cantidades fraccionarias se rechazan."""
+        with self.assertRaises(CalculationError):
+            calcular_cotizacion([{'cortes': [{'largo_m': -1, 'cantidad': 1}]}])
+        with self.assertRaises(CalculationError):
+            calcular_cotizacion([{'cortes': [{'largo_m': 1, 'cantidad': 1.5}]}])
+
+
+class TestOptimizadorCortes(TestCase):
+    """Tests para cotizador_app/cutting.py."""
+
+    def test_cortes_que_no_se_empalman(self):
+        """10 cortes de 3.5 m son 35 m (6 barras por metros), pero se necesitan 10."""
+        plan = optimizar_cortes([(3500, 10)])
+
+        self.assertEqual(plan.barras, 10)
+        self.assertTrue(plan.optimo)
+        self.assertEqual(plan.desperdicio_mm, 10 * 2500)
+
+    def test_mejora_sobre_bfd(self):
+        """BFD usa 4 barras; combinando 2100+1900+2000 alcanza con 3."""
+        plan = optimizar_cortes([(2100, 3), (2000, 3), (1900, 3)])
+
+        self.assertEqual(plan.barras, 3)
+        self.assertEqual(plan.cota_inferior, 3)
+        self.assertNotEqual(plan.metodo, 'bfd')
+
+    def test_plan_contiene_todos_los_cortes(self):
+        """Los patrones reparten exactamente los cortes pedidos."""
+        cortes = [(largo, largo % 7 + 1) for largo in range(400, 4000, 130)]
+        plan = optimizar_cortes(cortes)
+
+        piezas = sorted(
+            corte for patron in plan.patrones for corte in patron.cortes_mm * patron.repeticiones
+        )
+        esperado = sorted(largo for largo, cantidad in cortes for _ in range(cantidad))
+        self.assertEqual(piezas, esperado)
+        self.assertEqual(sum(patron.repeticiones for patron in plan.patrones), plan.barras)
+        self.assertGreaterEqual(plan.barras, plan.cota_inferior)
+
+    def test_kerf(self):
+        """Con sierra de 5 mm, 6 cortes de 1 m ya no caben en una barra de 6 m."""
+        self.assertEqual(optimizar_cortes([(1000, 6)]).barras, 1)
+        self.assertEqual(optimizar_cortes([(1000, 5)], kerf_mm=5).barras, 1)
+        self.assertEqual(optimizar_cortes([(1000, 6)], kerf_mm=5).barras, 2)
+
+    def test_corte_mas_largo_que_la_barra(self):
+        with self.assertRaises(CuttingError):
+            optimizar_cortes([(6001, 1)])
+
+
+class TestOptimizarCortesApi(TestCase):
+    """Tests para el endpoint optimizar_cortes_api."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+        self.url = reverse('cotizador_app:optimizar_cortes_api')
+
+    def post(self, data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+
+    def test_plan_por_perfil(self):
+        """Cada perfil trae su plan y la estimación por metros para comparar."""
+        response = self.post({'perfiles': [
+            {'profile_id': 3, 'cortes': [{'largo_m': 3.5, 'cantidad': 10}]},
+            {'profile_id': 4, 'cortes': [{'largo_m': 2, 'cantidad': 3}]},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        primero = data['perfiles'][0]
+        self.assertEqual(primero['profile_id'], 3)
+        self.assertEqual(primero['plan']['barras'], 10)
+        self.assertEqual(primero['estimacion'], {'cant_necesaria': 6, 'cant_a_comprar': 8})
+        self.assertEqual(primero['plan']['patrones'], [
+            {'cortes_mm': [3500], 'repeticiones': 10, 'desperdicio_mm': 2500},
+        ])
+        self.assertEqual(data['total_barras'], 11)
+
+    def test_solicitudes_invalidas(self):
+        """Cortes que no caben, valores negativos o JSON roto responden 400."""
+        self.assertEqual(self.post({'perfiles': [{'cortes': [{'largo_m': 7, 'cantidad': 1}]}]}).status_code, 400)
+        self.assertEqual(self.post({'perfiles': [{'cortes': [{'largo_m': -1, 'cantidad': 1}]}]}).status_code, 400)
+        self.assertEqual(self.post({'perfiles': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'no json', content_type='application/json').status_code, 400)
+
+    def test_solo_post(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class TestCrearCotizacion(TestCase):
+    """Tests para la vista crear_cotizacion."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+    def test_recalcula_totales_del_navegador(self):
+        """Los números enviados por el navegador se reemplazan por los recalculados."""
+        items = [{
+            'profile_id': 1,
+            'material_nombre': 'H 1000x350 179.1',
+            'cortes': [{'largo_m': 3, 'cantidad': 4}],
+            # Valores manipulados: deben ignorarse
+            'cant_a_comprar': 1,
+            'valor_unitario_m': 2000,
+            'peso_kg_m': 179.1,
+        }]
+        response = self.client.post(reverse('cotizador_app:crear_cotizacion'), {
+            'proyecto_nombre': 'Galpón',
+            'total_costo': 1,
+            'structural_items_json': json.dumps(items),
+            'overhead_items_json': json.dumps([]),
+        })
+
+        self.assertEqual(response.status_code, 302)
+        cotizacion = Cotizacion.objects.get()
+        material = cotizacion.materiales_estructurales.get()
+
+        # 12 m -> 2 barras necesarias -> 3 a comprar -> 18 m × $2.000
+        self.assertEqual(material.cant_a_comprar, 3)
+        self.assertEqual(material.profile_id, 1)
+        self.assertEqual(cotizacion.total_costo, Decimal('36000'))
+        self.assertEqual(cotizacion.structural_items_json[0]['cant_a_comprar'], 3)
+        self.assertEqual(cotizacion.total_materiales, Decimal('36000.00'))
+        self.assertEqual(cotizacion.cant_materiales, 1)
+
+    def _crear_con_secciones(self, cantidad):
+        secciones = [{'id': f'sec_{n}', 'nombre': f' sección {n} ', 'orden': n} for n in range(cantidad)]
+        items = [
+            {'profile_id': str(n), 'material_nombre': f'Perfil {n}', 'cortes': [{'largo_m': 1, 'cantidad': 1}],
+             'seccion_id': f'sec_{n}'}
+            for n in range(cantidad)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('cotizador_app:crear_cotizacion'), {
+                'proyecto_nombre': f'Con {cantidad} secciones',
+                'total_costo': 0,
+                'structural_items_json': json.dumps(items + [{'material_nombre': 'Sin sección', 'largo_m': 1}]),
+                'overhead_items_json': json.dumps([]),
+                'secciones_json': json.dumps(secciones),
+            })
+        return Cotizacion.objects.get(proyecto_nombre=f'Con {cantidad} secciones'), len(queries)
+
+    def test_secciones_y_perfiles_en_consultas_constantes(self):
+        # La primera cotización además crea la fila de ConteoCotizaciones
+        self._crear_con_secciones(1)
+        cotizacion, consultas_2 = self._crear_con_secciones(2)
+        _, consultas_20 = self._crear_con_secciones(20)
+        self.assertEqual(consultas_2, consultas_20)
+
+        seccion = cotizacion.secciones.get(orden=1)
+        material = seccion.materiales.get()
+        self.assertEqual((seccion.nombre, material.profile_id), ('Sección 1', 1))
+        self.assertEqual(seccion.cant_materiales, 1)
+        self.assertEqual(cotizacion.materiales_estructurales.filter(seccion__isnull=True).count(), 1)
+
+    def test_secciones_repetidas_se_juntan(self):
+        secciones = [{'id': 'sec_1', 'nombre': 'Techo'}, {'id': 'sec_2', 'nombre': 'techo '}]
+        items = [
+            {'material_nombre': 'A', 'largo_m': 1, 'seccion_id': 'sec_1'},
+            {'material_nombre': 'B', 'largo_m': 1, 'seccion_id': 'sec_2'},
+        ]
+        self.client.post(reverse('cotizador_app:crear_cotizacion'), {
+            'proyecto_nombre': 'Galpón',
+            'total_costo': 0,
+            'structural_items_json': json.dumps(items),
+            'overhead_items_json': json.dumps([]),
+            'secciones_json': json.dumps(secciones),
+        })
+
+        seccion = SeccionMaterial.objects.get()
+        self.assertEqual(seccion.nombre, 'Techo')
+        self.assertEqual(seccion.materiales.count(), 2)
+
+
+class TestTotalesAlmacenados(TestCase):
+    """Tests para los agregados almacenados (aggregates.py / signals.py)."""
+
+    def setUp(self):
+        self.cotizacion = Cotizacion.objects.create(proyecto_nombre='Bodega')
+        self.seccion = SeccionMaterial.objects.create(cotizacion=self.cotizacion, nombre='Techo')
+
+    def crear_material(self, **kwargs):
+        datos = {
+            'cotizacion': self.cotizacion,
+            'seccion': self.seccion,
+            'material_nombre': 'IN 200x100 20.1',
+            'largo_m': Decimal('12.50'),
+            'cant_a_comprar': 3,
+            'peso_kg_m': Decimal('20.123'),
+            'valor_unitario_m': Decimal('1234.56'),
+        }
+        datos.update(kwargs)
+        return MaterialEstructural.objects.create(**datos)
+
+    def test_save_y_delete_mantienen_los_totales(self):
+        material = self.crear_material()
+        CostoAdicional.objects.create(
+            cotizacion=self.cotizacion, descripcion='Flete', cantidad=Decimal('2'), valor_unitario=Decimal('15000.50'),
+        )
+
+        self.cotizacion.refresh_from_db()
+        self.seccion.refresh_from_db()
+        # 3 barras × 6 m × $1.234,56
+        self.assertEqual(self.cotizacion.total_materiales, Decimal('22222.08'))
+        self.assertEqual(self.cotizacion.total_adicional, Decimal('30001.00'))
+        self.assertEqual(self.cotizacion.peso_total_kg, Decimal('251.538'))
+        self.assertEqual(self.cotizacion.calculated_total, Decimal('52223.08'))
+        self.assertEqual((self.cotizacion.cant_materiales, self.cotizacion.cant_costos), (1, 1))
+        self.assertEqual(self.seccion.subtotal_costo, Decimal('22222.08'))
+
+        # Mover el material a otra sección y luego borrarlo
+        otra = SeccionMaterial.objects.create(cotizacion=self.cotizacion, nombre='Muros')
+        material.seccion = otra
+        material.save()
+        self.seccion.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual(self.seccion.cant_materiales, 0)
+        self.assertEqual(otra.cant_materiales, 1)
+
+        material.delete()
+        self.cotizacion.refresh_from_db()
+        self.assertEqual(self.cotizacion.total_materiales, 0)
+        self.assertEqual(self.cotizacion.cant_materiales, 0)
+
+    def test_aplazar_recalcula_una_vez(self):
+        """Dentro de aplazar_actualizaciones los ítems no disparan UPDATE por fila."""
+        with aplazar_actualizaciones():
+            with self.assertNumQueries(10):
+                for _ in range(10):
+                    self.crear_material()
+
+        self.cotizacion.refresh_from_db()
+        self.assertEqual(self.cotizacion.cant_materiales, 10)
+
+    def test_save_de_instancia_vieja_no_pisa_totales(self):
+        vieja = Cotizacion.objects.get(pk=self.cotizacion.pk)
+        self.crear_material()
+
+        vieja.proyecto_nombre = 'Bodega 2'
+        vieja.save()
+
+        self.cotizacion.refresh_from_db()
+        self.assertEqual(self.cotizacion.proyecto_nombre, 'Bodega 2')
+        self.assertEqual(self.cotizacion.cant_materiales, 1)
+
+    def test_borrar_cotizacion_con_items(self):
+        self.crear_material()
+        self.cotizacion.delete()
+        self.assertFalse(MaterialEstructural.objects.exists())
+
+    def test_comando_verifica_y_repara(self):
+        self.crear_material()
+        # update() no envía señales: simula totales desfasados
+        MaterialEstructural.objects.update(cant_a_comprar=5)
+
+        with self.assertRaises(CommandError):
+            call_command('recalcular_totales', verificar=True, stdout=io.StringIO())
+
+        call_command('recalcular_totales', stdout=io.StringIO())
+        call_command('recalcular_totales', verificar=True, stdout=io.StringIO())
+        self.cotizacion.refresh_from_db()
+        self.assertEqual(self.cotizacion.total_materiales, Decimal('37036.80'))
+
+
+class TestTotalesEnSQL(TestCase):
+    """Tests para CotizacionQuerySet.with_totals / with_section_totals."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+        self.cotizacion = Cotizacion.objects.create(proyecto_nombre='Bodega')
+        techo = SeccionMaterial.objects.create(cotizacion=self.cotizacion, nombre='Techo')
+        for valor in ('1234.56', '0.10'):
+            MaterialEstructural.objects.create(
+                cotizacion=self.cotizacion, seccion=techo, material_nombre='IN 200x100 20.1',
+                largo_m=Decimal('12.50'), cant_a_comprar=3,
+                peso_kg_m=Decimal('20.123'), valor_unitario_m=Decimal(valor),
+            )
+        for _ in range(3):
+            CostoAdicional.objects.create(
+                cotizacion=self.cotizacion, descripcion='Flete', cantidad=Decimal('0.10'), valor_unitario=Decimal('0.10'),
+            )
+        Cotizacion.objects.create(proyecto_nombre='Vacía')
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        override = override_settings(CACHE_ROOT=cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_totales_decimales_sin_cargar_items(self):
+        with self.assertNumQueries(1):
+            cotizaciones = {c.proyecto_nombre: c for c in Cotizacion.objects.with_totals()}
+
+        cotizacion = cotizaciones['Bodega']
+        # 3 × 6 × (1234.56 + 0.10); 3 × 0.10 × 0.10 = 0.03 exacto (en float sería 0.030000000000000006)
+        self.assertEqual(cotizacion.materiales_calculado, Decimal('22223.88'))
+        self.assertEqual(cotizacion.adicional_calculado, Decimal('0.03'))
+        self.assertEqual(cotizacion.total_calculado, Decimal('22223.91'))
+        self.assertEqual(cotizacion.calculated_total, cotizacion.total_calculado)
+        self.assertEqual(cotizaciones['Vacía'].total_calculado, 0)
+
+    def test_totales_por_seccion(self):
+        with self.assertNumQueries(2):
+            cotizacion = Cotizacion.objects.with_section_totals().get(pk=self.cotizacion.pk)
+            seccion = cotizacion.secciones.all()[0]
+
+        self.assertEqual(seccion.subtotal_costo, Decimal('22223.88'))
+        self.assertEqual(seccion.subtotal_peso.quantize(Decimal('0.001')), Decimal('503.075'))
+
+    def test_pdf_usa_totales_sql(self):
+        response = self.client.get(reverse('cotizador_app:generar_pdf', args=[self.cotizacion.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class TestCachePdf(TestCase):
+    """Tests para el caché de PDFs (pdf_cache.py)."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave-segura-123'))
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        override = override_settings(CACHE_ROOT=cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.cotizacion = Cotizacion.objects.create(proyecto_nombre='Bodega Norte')
+        self.material = MaterialEstructural.objects.create(
+            cotizacion=self.cotizacion, material_nombre='IN 200x100 20.1', largo_m=Decimal('12.50'),
+            cant_a_comprar=3, peso_kg_m=Decimal('20.123'), valor_unitario_m=Decimal('1234.56'),
+        )
+        self.url = reverse('cotizador_app:generar_pdf', args=[self.cotizacion.pk])
+        self.pdfs = DiskBackend().root / str(self.cotizacion.pk)
+
+    def descargar(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        if response.status_code == 200:
+            response.content_bytes = b''.join(response.streaming_content)
+        return response
+
+    def test_segunda_descarga_sale_del_cache(self):
+        primera = self.descargar()
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera['Content-Type'], 'application/pdf')
+        self.assertIn('cotizacion_Bodega_Norte_', primera['Content-Disposition'])
+        self.assertTrue(primera.content_bytes.startswith(b'%PDF'))
+        self.assertEqual(len(list(self.pdfs.glob('*.pdf'))), 1)
+
+        with self.assertNumQueries(6):  # sesión, usuario y las 4 consultas de load_pdf_data
+            segunda = self.descargar()
+        self.assertEqual(segunda.content_bytes, primera.content_bytes)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+        no_modificado = self.descargar(if_none_match=primera['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_cambios_invalidan_el_pdf(self):
+        primera = self.descargar()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.material.valor_unitario_m = Decimal('1500')
+            self.material.save()
+        self.assertEqual(list(self.pdfs.glob('*.pdf')), [])
+
+        segunda = self.descargar(if_none_match=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(len(list(self.pdfs.glob('*.pdf'))), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cotizacion.delete()
+        self.assertFalse(self.pdfs.exists())
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_filas_de_varias_lineas(self):
+        # Las filas con saltos de línea no usan el alto precalculado (pdf_styles.ALTO_FILA)
+        MaterialEstructural.objects.filter(id=self.material.id).update(material_nombre='IN 200x100\ncortado')
+        data = load_pdf_data(self.cotizacion.id)
+        self.assertTrue(render_pdf(data).startswith(b'%PDF'))
+
+    def test_desaloja_los_menos_usados(self):
+        backend = DiskBackend(max_bytes=2500)
+        for cotizacion_id in (1, 2):
+            backend.save(cotizacion_id, 'a', b'x' * 1000)
+        os.utime(backend.root / '1' / 'a.pdf', (0, 0))
+        backend.open(2, 'a').close()
+
+        backend.save(3, 'a', b'x' * 1000)
+
+        self.assertIsNone(backend.open(1, 'a'))
+        self.assertIsNotNone(backend.open(2, 'a'))
+        self.assertIsNotNone(backend.open(3, 'a'))
+        self.assertLessEqual(backend.size(), 2500)
+
+
+class TestColaPdf(TestCase):
+    """Tests para los renders en segundo plano (pdf_queue.py)."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave-segura-123'))
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        override = override_settings(CACHE_ROOT=cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def crear(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('cotizador_app:crear_cotizacion'), {
+                'proyecto_nombre': 'Galpón',
+                'total_costo': 0,
+                'structural_items_json': json.dumps([
+                    {'material_nombre': 'Perfil A', 'cortes': [{'largo_m': 3, 'cantidad': 2}], 'valor_unitario_m': 1000},
+                ]),
+                'overhead_items_json': '[]',
+            })
+        return Cotizacion.objects.get()
+
+    def test_pre_renderiza_al_crear(self):
+        cotizacion = self.crear()
+        key = content_key(load_pdf_data(cotizacion.id))
+        pdf_queue.esperar(cotizacion.id, key, timeout=30)
+
+        self.assertTrue(DiskBackend().contains(cotizacion.id, key))
+        response = self.client.get(reverse('cotizador_app:pdf_estado_api', args=[cotizacion.id]))
+        self.assertEqual(response.json()['estado'], pdf_queue.LISTO)
+        self.assertEqual(response.json()['etag'], key)
+
+    def test_estado_encola_la_version_actual(self):
+        cotizacion = self.crear()
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion.notas_internas = 'Revisar flete'
+            cotizacion.save()
+        key = content_key(load_pdf_data(cotizacion.id))
+        self.assertFalse(DiskBackend().contains(cotizacion.id, key))
+
+        url = reverse('cotizador_app:pdf_estado_api', args=[cotizacion.id])
+        self.assertIn(self.client.get(url).json()['estado'], (pdf_queue.PENDIENTE, pdf_queue.LISTO))
+        pdf_queue.esperar(cotizacion.id, key, timeout=30)
+        self.assertEqual(self.client.get(url).json()['estado'], pdf_queue.LISTO)
+        self.assertEqual(self.client.get(reverse('cotizador_app:pdf_estado_api', args=[0])).status_code, 404)
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    def test_sin_workers_renderiza_en_el_momento(self):
+        cotizacion = Cotizacion.objects.create(proyecto_nombre='Bodega')
+        with self.assertRaises(Cotizacion.DoesNotExist):
+            pdf_queue.encolar(0)
+
+        estado = pdf_queue.encolar(cotizacion.id)
+        self.assertEqual(estado.estado, pdf_queue.LISTO)
+        self.assertTrue(DiskBackend().contains(cotizacion.id, estado.key))
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    def test_el_pre_render_sobrevive_a_la_invalidacion(self):
+        # El borrado de PDFs de aplazar_actualizaciones corre antes del render
+        cotizacion = self.crear()
+        key = content_key(load_pdf_data(cotizacion.id))
+        self.assertTrue(DiskBackend().contains(cotizacion.id, key))
+
+    def test_descarga_no_espera_la_cola(self):
+        # Los workers quedan ocupados: el render de la cotización queda en cola
+        liberar = threading.Event()
+        self.addCleanup(liberar.set)
+        executor = pdf_queue._get_executor()
+        for _ in range(executor._max_workers):
+            executor.submit(liberar.wait, 30)
+        cotizacion = Cotizacion.objects.create(proyecto_nombre='Bodega')
+        self.assertEqual(pdf_queue.encolar(cotizacion.id).estado, pdf_queue.PENDIENTE)
+
+        response = self.client.get(reverse('cotizador_app:generar_pdf', args=[cotizacion.id]))
+        self.assertEqual(response.status_code, 200)
+        key = content_key(load_pdf_data(cotizacion.id))
+        self.assertNotIn((cotizacion.id, key), pdf_queue._trabajos)
+        self.assertTrue(DiskBackend().contains(cotizacion.id, key))
+
+    def test_olvida_los_fallos_mas_antiguos(self):
+        claves = [(cotizacion_id, 'v1') for cotizacion_id in range(pdf_queue.MAX_FALLIDOS + 5)]
+        self.addCleanup(lambda: [pdf_queue._trabajos.pop(clave, None) for clave in claves])
+        self.addCleanup(pdf_queue._fallidos.clear)
+        with self.assertLogs('cotizador_app.pdf_queue', 'ERROR'):
+            for clave in claves:
+                trabajo = Future()
+                trabajo.set_exception(RuntimeError('render'))
+                pdf_queue._trabajos[clave] = trabajo
+                pdf_queue._terminar(*clave, trabajo)
+
+        self.assertEqual(len(pdf_queue._fallidos), pdf_queue.MAX_FALLIDOS)
+        self.assertNotIn(claves[0], pdf_queue._trabajos)
+        self.assertTrue(pdf_queue._fallo(pdf_queue._trabajos[claves[-1]]))
+
+
+class TestExportacionPdfs(TestCase):
+    """Tests para la exportación masiva de PDFs en ZIP (pdf_export.py)."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave-segura-123'))
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        override = override_settings(CACHE_ROOT=cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.cliente = Cliente.objects.create(nombre='Constructora Sur')
+        self.cotizaciones = [
+            Cotizacion.objects.create(proyecto_nombre=f'Galpón {i}', cliente=self.cliente if i < 3 else None)
+            for i in range(4)
+        ]
+        for cotizacion in self.cotizaciones:
+            MaterialEstructural.objects.create(
+                cotizacion=cotizacion, material_nombre='IN 200x100 20.1', largo_m=Decimal('6'),
+                cant_a_comprar=1, peso_kg_m=Decimal('20.1'), valor_unitario_m=Decimal('1000'),
+            )
+
+    def test_exporta_zip_reutilizando_el_cache(self):
+        cacheada = self.cotizaciones[0]
+        b''.join(self.client.get(reverse('cotizador_app:generar_pdf', args=[cacheada.id])).streaming_content)
+
+        response = self.client.get(reverse('cotizador_app:exportar_pdfs'), {'cliente': self.cliente.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        archivo = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archivo.testzip())
+        self.assertEqual(sorted(archivo.namelist()), sorted(
+            f'cotizacion_Galpn_{i}_{self.cotizaciones[i].id}.pdf' for i in range(3)
+        ))
+        for nombre in archivo.namelist():
+            self.assertTrue(archivo.read(nombre).startswith(b'%PDF'))
+        # Los PDFs renderizados para el ZIP quedan en el caché
+        self.assertEqual(len(list(DiskBackend().root.glob('*/*.pdf'))), 3)
+
+    def test_filtros_invalidos(self):
+        url = reverse('cotizador_app:exportar_pdfs')
+        self.assertEqual(self.client.get(url, {'desde': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': '0'}).status_code, 404)
+
+    def test_comando_con_pool_de_procesos(self):
+        salida = os.path.join(self.cache_dir, 'exportacion.zip')
+        ids = [str(cotizacion.id) for cotizacion in self.cotizaciones[:2]]
+        call_command('exportar_pdfs', salida, *ids, '--workers', '2', stdout=io.StringIO())
+
+        with zipfile.ZipFile(salida) as archivo:
+            self.assertIsNone(archivo.testzip())
+            self.assertEqual(len(archivo.namelist()), 2)
+
+        with self.assertRaises(CommandError):
+            call_command('exportar_pdfs', salida, '--desde', 'ayer', stdout=io.StringIO())
+
+
+class TestPdfTablasLargas(TestCase):
+    """Tests para las tablas en tramos de las cotizaciones grandes (pdf.py)."""
+
+    def setUp(self):
+        self.cotizacion = Cotizacion.objects.create(proyecto_nombre='Planta')
+        techo = SeccionMaterial.objects.create(cotizacion=self.cotizacion, nombre='Techo', orden=0)
+        muros = SeccionMaterial.objects.create(cotizacion=self.cotizacion, nombre='Muros', orden=1)
+        filas_techo = 2 * pdf_styles.FILAS_POR_TABLA + 1
+        MaterialEstructural.objects.bulk_create([
+            MaterialEstructural(
+                cotizacion=self.cotizacion, seccion=techo if i < filas_techo else muros,
+                material_nombre=f'Perfil {i}', largo_m=Decimal('6'), cant_a_comprar=1,
+                peso_kg_m=Decimal('1'), valor_unitario_m=Decimal('10'),
+            )
+            for i in range(filas_techo + 3)
+        ])
+
+    def test_tramos_con_acumulado_y_subtotal_por_seccion(self):
+        story = []
+        _build_materials_section(story, load_pdf_data(self.cotizacion.id))
+        tablas = [f._table() if isinstance(f, _TablaDiferida) else f for f in story]
+        tablas = [t for t in tablas if isinstance(t, Table)]
+        pies = [t._cellvalues[-1][0] for t in tablas]
+
+        # Techo: 3 tramos (35 + 35 + 1); Muros: 1 tabla; subtotal estructural
+        self.assertEqual(pies, [
+            'ACUMULADO:', 'ACUMULADO:', 'SUBTOTAL TECHO:', 'SUBTOTAL MUROS:', 'SUBTOTAL ESTRUCTURAL:',
+        ])
+        # Cada tramo repite el encabezado; el acumulado del 2° es 70 materiales × 6 m × $10
+        self.assertEqual([t._cellvalues[0][0] for t in tablas[:4]], ['Material'] * 4)
+        self.assertEqual(tablas[1]._cellvalues[-1][5], '4,200')
+
+        self.assertTrue(render_pdf(load_pdf_data(self.cotizacion.id)).startswith(b'%PDF'))
+
+
+class TestListadoPaginado(TestCase):
+    """Tests para la paginación keyset del listado (pagination.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+        # 7 cotizaciones, 3 de ellas con la misma fecha para probar el desempate por id
+        ahora = timezone.now()
+        fechas = [ahora, ahora, ahora] + [ahora - timedelta(days=dias) for dias in range(1, 5)]
+        for numero, fecha in enumerate(fechas):
+            Cotizacion.objects.create(proyecto_nombre=f'Proyecto {numero}', fecha_creacion=fecha)
+
+    def test_recorre_todas_sin_repetir(self):
+        esperado = list(Cotizacion.objects.order_by('-fecha_creacion', '-id').values_list('id', flat=True))
+
+        vistos = []
+        cursor = None
+        while True:
+            page = paginate(Cotizacion.objects.all(), cursor, page_size=2)
+            vistos.extend(cotizacion.id for cotizacion in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(vistos, esperado)
+
+    def test_api_de_scroll_infinito(self):
+        url = reverse('cotizador_app:cotizacion_page_api')
+        primera = self.client.get(url, {'page_size': 5}).json()
+        segunda = self.client.get(url, {'page_size': 5, 'cursor': primera['next_cursor']}).json()
+
+        self.assertEqual(len(primera['results']), 5)
+        self.assertEqual(len(segunda['results']), 2)
+        self.assertIsNone(segunda['next_cursor'])
+        self.assertIn('Proyecto 6', segunda['html'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'no-es-un-cursor'}).status_code, 400)
+
+    def test_listado_en_una_consulta(self):
+        """La tabla no carga ítems ni columnas que no muestra."""
+        url = reverse('cotizador_app:cotizaciones')
+        # sesión + usuario + listado + conteos + carpetas
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(len(response.context['cotizaciones']), 7)
+
+
+class TestBusquedaCotizaciones(TestCase):
+    """Tests para el índice full-text (search.py) y cotizacion_search_api."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+        cliente = Cliente.objects.create(nombre='Constructora Ñuñoa')
+        self.galpon = Cotizacion.objects.create(proyecto_nombre='Galpón Industrial', cliente=cliente)
+        self.bodega = Cotizacion.objects.create(
+            proyecto_nombre='Bodega', notas_internas='Revisar galpón vecino',
+        )
+        MaterialEstructural.objects.create(cotizacion=self.bodega, material_nombre='HN 300x200 56.8')
+
+    def test_prefijos_sin_tildes_y_ranking(self):
+        """'galp' calza en el proyecto de una y en las notas de la otra; el proyecto pesa más."""
+        self.assertEqual(search('galp').ids, [self.galpon.id, self.bodega.id])
+        self.assertEqual(search('nunoa galpon').ids, [self.galpon.id])
+        self.assertEqual(search('HN 300x200').ids, [self.bodega.id])
+        self.assertEqual(search('"; DROP').ids, [])
+        self.assertEqual(search('   ').ids, [])
+
+    def test_indice_se_actualiza_al_guardar(self):
+        self.galpon.proyecto_nombre = 'Techumbre'
+        self.galpon.save()
+        MaterialEstructural.objects.create(cotizacion=self.galpon, material_nombre='Costanera C 150x50')
+
+        self.assertEqual(search('techum').ids, [self.galpon.id])
+        self.assertEqual(search('costanera').ids, [self.galpon.id])
+        self.assertEqual(search('industrial').ids, [])
+
+        self.galpon.delete()
+        self.assertEqual(search('techum').ids, [])
+
+    def test_api_paginada(self):
+        for numero in range(3):
+            Cotizacion.objects.create(proyecto_nombre=f'Galpón {numero}')
+        url = reverse('cotizador_app:cotizacion_search_api')
+
+        primera = self.client.get(url, {'q': 'galpon', 'page_size': 3}).json()
+        segunda = self.client.get(url, {'q': 'galpon', 'page_size': 3, 'page': 2}).json()
+
+        self.assertEqual(primera['count'], 3)
+        self.assertTrue(primera['has_more'])
+        self.assertEqual(segunda['count'], 2)
+        self.assertFalse(segunda['has_more'])
+        self.assertEqual(primera['cotizaciones'][0]['cliente_nombre'], 'N/A')
+        self.assertFalse(primera['truncated'])
+
+    def test_ranking_limitado_a_las_mas_recientes(self):
+        """Con más coincidencias que RANK_CANDIDATES se rankean solo las más recientes."""
+        self.addCleanup(setattr, search_module, 'RANK_CANDIDATES', search_module.RANK_CANDIDATES)
+        search_module.RANK_CANDIDATES = 2
+        reciente = Cotizacion.objects.create(proyecto_nombre='Bodega', notas_internas='Galpón')
+
+        # El proyecto de self.galpon pesa más, pero quedó fuera de los candidatos
+        resultado = search('galp', page_size=1)
+        self.assertEqual(resultado.ids, [reciente.id])
+        self.assertTrue(resultado.truncated)
+        self.assertFalse(search('industrial').truncated)
+
+
+class TestCarpetasYEstados(TestCase):
+    """Tests para los filtros por carpeta/estado y ConteoCotizaciones."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendedor', password='clave-segura-123')
+        self.client.force_login(self.user)
+
+        self.obras = Carpeta.objects.create(nombre='Obras 2025')
+        self.galpon = Cotizacion.objects.create(proyecto_nombre='Galpón', carpeta=self.obras)
+        self.bodega = Cotizacion.objects.create(
+            proyecto_nombre='Bodega galpón', carpeta=self.obras, estado=Cotizacion.ESTADO_TERMINADO,
+        )
+        self.casa = Cotizacion.objects.create(proyecto_nombre='Casa')
+
+    def test_conteos_se_mantienen(self):
+        self.assertEqual(resumen_conteos(), {
+            'total': 3,
+            'por_estado': {Cotizacion.ESTADO_BORRADOR: 2, Cotizacion.ESTADO_TERMINADO: 1},
+            'por_carpeta': {self.obras.id: 2, ConteoCotizaciones.SIN_CARPETA: 1},
+        })
+
+        # Mover de carpeta y estado, borrar y borrar la carpeta
+        self.casa.carpeta = self.obras
+        self.casa.estado = Cotizacion.ESTADO_POR_REVISAR
+        self.casa.save()
+        Cotizacion.objects.get(pk=self.galpon.pk).delete()
+        self.assertEqual(resumen_conteos()['por_carpeta'], {self.obras.id: 2})
+
+        self.obras.delete()
+        resumen = resumen_conteos()
+        self.assertEqual(resumen['total'], 2)
+        self.assertEqual(resumen['por_carpeta'], {ConteoCotizaciones.SIN_CARPETA: 2})
+        self.assertEqual(conteos_desalineados(), [])
+
+    def test_save_con_campos_diferidos(self):
+        cotizacion = Cotizacion.objects.only('id', 'proyecto_nombre').get(pk=self.casa.pk)
+        cotizacion.proyecto_nombre = 'Casa 2'
+        cotizacion.save()
+
+        self.assertEqual(Cotizacion.objects.get(pk=self.casa.pk).estado, Cotizacion.ESTADO_BORRADOR)
+        self.assertEqual(conteos_desalineados(), [])
+
+        # Estado cargado y carpeta diferida, como en el listado; sin recontar
+        cotizacion = Cotizacion.objects.only('id', 'estado').get(pk=self.casa.pk)
+        cotizacion.estado = Cotizacion.ESTADO_TERMINADO
+        with CaptureQueriesContext(connection) as queries:
+            cotizacion.save()
+        recuentos = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE') and ConteoCotizaciones._meta.db_table in query['sql']
+        ]
+        self.assertEqual(recuentos, [])
+        self.assertEqual(conteos_desalineados(), [])
+
+        Cotizacion.objects.only('id').get(pk=self.galpon.pk).delete()
+        self.assertEqual(conteos_desalineados(), [])
+
+    def test_listado_filtrado(self):
+        url = reverse('cotizador_app:cotizaciones')
+        response = self.client.get(url, {'carpeta': self.obras.id, 'estado': Cotizacion.ESTADO_BORRADOR})
+        self.assertEqual([c.id for c in response.context['cotizaciones']], [self.galpon.id])
+
+        response = self.client.get(url, {'carpeta': 'sin_carpeta'})
+        self.assertEqual([c.id for c in response.context['cotizaciones']], [self.casa.id])
+        self.assertEqual(response.context['cantidad_sin_carpeta'], 1)
+
+        page_api = reverse('cotizador_app:cotizacion_page_api')
+        data = self.client.get(page_api, {'estado': Cotizacion.ESTADO_TERMINADO}).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.bodega.id])
+        self.assertEqual(data['results'][0]['carpeta_nombre'], 'Obras 2025')
+        self.assertEqual(self.client.get(page_api, {'estado': 'NO_EXISTE'}).status_code, 400)
+
+    def test_busqueda_filtrada(self):
+        url = reverse('cotizador_app:cotizacion_search_api')
+        data = self.client.get(url, {'q': 'galpon', 'estado': Cotizacion.ESTADO_TERMINADO}).json()
+
+        self.assertEqual([row['id'] for row in data['cotizaciones']], [self.bodega.id])
+        self.assertEqual(data['cotizaciones'][0]['estado_display'], 'Terminado')
+        self.assertEqual(search('galpon', queryset=Cotizacion.objects.filter(carpeta__isnull=True)).ids, [])
+
+    def test_comando_verifica_conteos(self):
+        ConteoCotizaciones.objects.filter(carpeta_id=self.obras.id).update(cantidad=10)
+        with self.assertRaises(CommandError):
+            call_command('recalcular_totales', verificar=True, stdout=io.StringIO())
+
+        call_command('recalcular_totales', stdout=io.StringIO())
+        self.assertEqual(conteos_desalineados(), [])
+
+
+class TestImportacionCotizaciones(TestCase):
+    """Tests para la importación masiva (importer.py y importar_cotizaciones)."""
+
+    GALPON = {
+        'ref': 'H-1',
+        'proyecto_nombre': 'Galpón Lampa',
+        'cliente': 'Constructora Ñuñoa',
+        'carpeta': 'Históricas',
+        'estado': 'TERMINADO',
+        'fecha_creacion': '14-03-2019',
+        'secciones': [{
+            'nombre': 'techo',
+            'materiales': [{
+                'material_nombre': 'Costanera C 150x50',
+                'peso_kg_m': 4.5,
+                'valor_unitario_m': 1000,
+                'cortes': [{'largo_m': 2.5, 'cantidad': 4}],
+            }],
+        }],
+        'materiales': [{'material_nombre': 'Pletina 50x5', 'largo_m': 7, 'valor_unitario_m': 500}],
+        'costos': [{'descripcion': 'Flete', 'cantidad': 2, 'valor_unitario': 85000}],
+    }
+
+    def test_importa_con_calculo_del_servidor(self):
+        resultado = importar_cotizaciones([self.GALPON, dict(self.GALPON, ref='H-2', carpeta=None)], batch_size=1)
+
+        self.assertEqual((resultado.creadas, resultado.errores), (2, []))
+        cotizacion = Cotizacion.objects.get(carpeta__nombre='Históricas')
+        # 10 m -> 2 barras -> 3 a comprar × 6 m × 1000; 7 m -> 2 -> 3 × 6 × 500; flete 170000
+        self.assertEqual(cotizacion.total_costo, 18000 + 9000 + 170000)
+        self.assertEqual(cotizacion.total_materiales, Decimal('27000.00'))
+        self.assertEqual(cotizacion.fecha_creacion.date().isoformat(), '2019-03-14')
+        self.assertEqual(cotizacion.secciones.get().nombre, 'Techo')
+        self.assertEqual(cotizacion.secciones.get().cant_materiales, 1)
+        self.assertEqual(Cliente.objects.filter(nombre='Constructora Ñuñoa').count(), 1)
+
+        self.assertEqual(totales_desalineados(), [])
+        self.assertEqual(conteos_desalineados(), [])
+        self.assertEqual(len(search('lampa costanera').ids), 2)
+
+    def test_errores_por_cotizacion(self):
+        items = [
+            dict(self.GALPON, estado='ARCHIVADO'),
+            dict(self.GALPON, ref='H-2', materiales=[{'material_nombre': 'X', 'largo_m': -1}]),
+            dict(self.GALPON, ref='H-3', secciones=[{'nombre': 'Techo'}, {'nombre': ' techo '}]),
+            dict(self.GALPON, ref='H-4', fecha_creacion='ayer'),
+            'no es un objeto',
+            dict(self.GALPON, ref='H-6'),
+        ]
+        resultado = importar_cotizaciones(items)
+
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual([(error.numero, error.ref) for error in resultado.errores],
+                         [(1, 'H-1'), (2, 'H-2'), (3, 'H-3'), (4, 'H-4'), (5, None)])
+        self.assertEqual(list(Cotizacion.objects.values_list('proyecto_nombre', flat=True)), ['Galpón Lampa'])
+
+    def test_comando_csv(self):
+        filas = [
+            'ref,proyecto_nombre,cliente,tipo,seccion,material_nombre,largo_m,cantidad,valor_unitario_m,descripcion,valor_unitario',
+            '1,Bodega,Ana,material,Muros,Perfil L,3,2,100,,',
+            '1,Bodega,Ana,material,Muros,Perfil L,2,1,100,,',
+            '1,Bodega,Ana,costo,,,,3,,Soldadura,1000',
+            '2,Casa,,material,,Perfil L,1,1,100,,',
+        ]
+        with tempfile.TemporaryDirectory() as directorio:
+            path = os.path.join(directorio, 'historicas.csv')
+            with open(path, 'w', encoding='utf-8') as archivo:
+                archivo.write('\n'.join(filas))
+
+            call_command('importar_cotizaciones', path, dry_run=True, stdout=io.StringIO())
+            self.assertFalse(Cotizacion.objects.exists())
+            call_command('importar_cotizaciones', path, stdout=io.StringIO())
+
+        bodega = Cotizacion.objects.get(proyecto_nombre='Bodega')
+        material = bodega.materiales_estructurales.get()
+        self.assertEqual((material.largo_m, material.seccion.nombre), (Decimal('8.00'), 'Muros'))
+        self.assertEqual(bodega.costos_adicionales.get().cantidad, Decimal('3.00'))
+        self.assertEqual(Cotizacion.objects.count(), 2)
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave-segura-123'))
+        url = reverse('cotizador_app:importar_cotizaciones_api')
+        body = '\n'.join(json.dumps(item) for item in [self.GALPON, {'ref': 'vacía'}])
+
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+        data = response.json()
+        self.assertEqual(data['creadas'], 1)
+        self.assertEqual(data['errores'], [{'numero': 2, 'ref': 'vacía', 'mensaje': 'Falta proyecto_nombre'}])
+
+        self.assertEqual(self.client.post(url, '[{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, 'x', content_type='text/plain').status_code, 415)
+
+
+class TestEdicionCotizacion(TestCase):
+    """Tests para la edición con patch (editor.py y editar_cotizacion_api)."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('vendedor', password='clave-segura-123'))
+        items = [
+            {'profile_id': 1, 'material_nombre': 'Perfil A', 'cortes': [{'largo_m': 3, 'cantidad': 2}],
+             'valor_unitario_m': 1000, 'peso_kg_m': 1.333, 'seccion_id': 'sec_1'},
+            {'profile_id': 2, 'material_nombre': 'Perfil B', 'cortes': [{'largo_m': 2.5, 'cantidad': 1}],
+             'valor_unitario_m': 500, 'peso_kg_m': 2.5, 'seccion_id': 'sec_2'},
+            {'profile_id': 3, 'material_nombre': 'Perfil C', 'largo_m': 1, 'valor_unitario_m': 100},
+        ]
+        costos = [
+            {'descripcion': 'Flete', 'unidad': 'Viaje', 'cantidad': 1, 'valor_unitario': 50000},
+            {'descripcion': 'Soldadura', 'unidad': 'Unidad', 'cantidad': 3, 'valor_unitario': 333.33},
+        ]
+        self.client.post(reverse('cotizador_app:crear_cotizacion'), {
+            'proyecto_nombre': 'Galpón',
+            'total_costo': 0,
+            'structural_items_json': json.dumps(items),
+            'overhead_items_json': json.dumps(costos),
+            'secciones_json': json.dumps([{'id': 'sec_1', 'nombre': 'Techo'}, {'id': 'sec_2', 'nombre': 'Muros'}]),
+        })
+        self.cotizacion = Cotizacion.objects.get()
+        self.url = reverse('cotizador_app:editar_cotizacion_api', args=[self.cotizacion.id])
+        self.materiales = {m.material_nombre: m for m in self.cotizacion.materiales_estructurales.all()}
+        self.costos = {c.descripcion: c for c in self.cotizacion.costos_adicionales.all()}
+        self.secciones = {s.nombre: s for s in self.cotizacion.secciones.all()}
+
+    def editar(self, patch):
+        return self.client.post(self.url, json.dumps(patch), content_type='application/json')
+
+    def test_aplica_solo_los_cambios(self):
+        techo, muros = self.secciones['Techo'], self.secciones['Muros']
+        response = self.editar({
+            'cotizacion': {'notas_internas': 'Precio revisado'},
+            'secciones': {
+                'agregar': [{'id': 'sec_9', 'nombre': 'bodega'}],
+                'orden': ['sec_9', muros.id, techo.id],
+            },
+            'materiales': {
+                'agregar': [{'material_nombre': 'Perfil D', 'cortes': [{'largo_m': 6, 'cantidad': 1}],
+                             'valor_unitario_m': 200, 'seccion_id': 'sec_9'}],
+                'modificar': [{'id': self.materiales['Perfil A'].id, 'valor_unitario_m': 1500}],
+                'eliminar': [self.materiales['Perfil B'].id],
+            },
+            'costos': {
+                'agregar': [{'descripcion': 'Pintura', 'cantidad': 1.5, 'valor_unitario': 10000.05}],
+                'modificar': [{'id': self.costos['Flete'].id, 'cantidad': 2}],
+                'eliminar': [self.costos['Soldadura'].id],
+            },
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+
+        self.assertEqual(totales_desalineados(), [])
+        cotizacion = Cotizacion.objects.get()
+        # A: 6 m -> 1 barra -> 2 × 6 × 1500; C: 2 × 6 × 100; D: 6 m -> 2 × 6 × 200; costos 100000 + 15000.075
+        self.assertEqual(cotizacion.total_materiales, Decimal('18000') + Decimal('1200') + Decimal('2400'))
+        self.assertEqual(cotizacion.total_costo, Decimal('136600'))
+        self.assertEqual(data['total_costo'], 136600)
+        self.assertEqual(cotizacion.notas_internas, 'Precio revisado')
+
+        # Las filas sin cambios o modificadas conservan su id
+        perfil_a = MaterialEstructural.objects.get(material_nombre='Perfil A')
+        self.assertEqual(perfil_a.id, self.materiales['Perfil A'].id)
+        self.assertEqual(perfil_a.cant_a_comprar, 2)
+        self.assertTrue(MaterialEstructural.objects.filter(id=self.materiales['Perfil C'].id).exists())
+
+        bodega = SeccionMaterial.objects.get(id=data['ids']['secciones']['sec_9'])
+        self.assertEqual((bodega.nombre, bodega.orden, bodega.cant_materiales), ('Bodega', 0, 1))
+        self.assertEqual(SeccionMaterial.objects.get(id=techo.id).orden, 2)
+
+        # El snapshot queda igual a las filas, con sus ids
+        snapshot = {entrada['id']: entrada for entrada in cotizacion.structural_items_json}
+        self.assertEqual(set(snapshot), set(cotizacion.materiales_estructurales.values_list('id', flat=True)))
+        self.assertEqual(snapshot[perfil_a.id]['cortes'], [{'largo_m': 3.0, 'cantidad': 2}])
+        self.assertEqual(snapshot[perfil_a.id]['valor_unitario_m'], 1500.0)
+        self.assertEqual([entrada['descripcion'] for entrada in cotizacion.overhead_items_json],
+                         ['Flete', 'Pintura'])
+        self.assertEqual(len(search('perfil d').ids), 1)
+
+    def test_eliminar_seccion_deja_materiales_en_general(self):
+        techo = self.secciones['Techo']
+        self.assertEqual(self.editar({'secciones': {'eliminar': [techo.id]}}).status_code, 200)
+
+        self.assertIsNone(MaterialEstructural.objects.get(material_nombre='Perfil A').seccion_id)
+        self.assertEqual(totales_desalineados(), [])
+        self.assertTrue(all(
+            entrada['seccion_id'] != techo.id for entrada in Cotizacion.objects.get().structural_items_json
+        ))
+
+    def test_patch_invalido_no_guarda_nada(self):
+        otra = Cotizacion.objects.create(proyecto_nombre='Otra')
+        ajeno = MaterialEstructural.objects.create(cotizacion=otra, material_nombre='Ajeno')
+
+        for patch in (
+            {'materiales': {'eliminar': [ajeno.id]}},
+            {'materiales': {'modificar': [{'id': self.materiales['Perfil A'].id, 'cortes': [{'largo_m': -1}]}]},
+             'cotizacion': {'proyecto_nombre': 'Cambiado'}},
+            {'secciones': {'modificar': [{'id': self.secciones['Techo'].id, 'nombre': 'muros'}]}},
+            {'materiales': {'agregar': [{'material_nombre': 'X', 'seccion_id': 'sec_99'}]}},
+            {'costos': {'eliminar': ['1']}},
+            {'precio': 1},
+        ):
+            response = self.editar(patch)
+            self.assertEqual(response.status_code, 400, patch)
+
+        self.assertEqual(Cotizacion.objects.get(id=self.cotizacion.id).proyecto_nombre, 'Galpón')
+        self.assertTrue(MaterialEstructural.objects.filter(id=ajeno.id).exists())
+        self.assertEqual(self.client.post(
+            reverse('cotizador_app:editar_cotizacion_api', args=[otra.id + 1]), '{}', content_type='application/json',
+        ).status_code, 404)
+
+    def test_pagina_de_edicion(self):
+        response = self.client.get(reverse('cotizador_app:editar_cotizacion', args=[self.cotizacion.id]))
+        self.assertContains(response, 'id="datosEdicion"')
+        self.assertContains(response, 'Guardar Cambios')
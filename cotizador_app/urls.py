@@ -6,9 +6,16 @@ app_name = 'cotizador_app'  # Agregando el app_name
 urlpatterns = [
     path('', views.cotizacion, name='cotizaciones'),
     path('crear/', views.crear_cotizacion, name='crear_cotizacion'),
+    path('<int:cotizacion_id>/editar/', views.editar_cotizacion, name='editar_cotizacion'),
     path('<int:cotizacion_id>/pdf/', views.generar_pdf, name='generar_pdf'),
+    path('exportar-pdfs/', views.exportar_pdfs, name='exportar_pdfs'),
     path('detalle/', views.detalle_cotizacion, name='detalle_cotizacion'),
     path('<int:cotizacion_id>/eliminar/', views.eliminar_cotizacion, name='eliminar_cotizacion'),
     # API endpoints for AJAX calls
     path('api/search/', views.cotizacion_search_api, name='cotizacion_search_api'),
+    path('api/page/', views.cotizacion_page_api, name='cotizacion_page_api'),
+    path('api/optimizar-cortes/', views.optimizar_cortes_api, name='optimizar_cortes_api'),
+    path('api/importar/', views.importar_cotizaciones_api, name='importar_cotizaciones_api'),
+    path('api/<int:cotizacion_id>/editar/', views.editar_cotizacion_api, name='editar_cotizacion_api'),
+    path('api/<int:cotizacion_id>/pdf/estado/', views.pdf_estado_api, name='pdf_estado_api'),
 ]
\ No newline at end of file
@@ -4,21 +4,38 @@ Vistas para el sistema de Cotizaciones.
 Maneja la creación, visualización y generación de PDFs de cotizaciones.
 """
 
+import io
+import json
 from json import JSONDecodeError  # ✅ FIX BAJO-001: Import específico
 import logging
+import time
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
 from django.db import transaction, IntegrityError
-from django.http import HttpResponse
+from django.core.exceptions import RequestDataTooBig
+from django.http import FileResponse, Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-
+from django.views.decorators.http import require_POST
+
+from . import search
+from .aggregates import recalcular_totales, resumen_conteos
+from .calculations import (
+    CalculationError, MM_POR_METRO, calcular_barras, calcular_cotizacion, cortes_mm, material_como_json,
+)
+from .cutting import LARGO_BARRA_MM, TIEMPO_MAXIMO_S, CuttingError, optimizar_cortes, plan_como_json
+from .editor import EdicionError, aplicar_cambios, datos_edicion
 from .forms import CotizacionForm
-from .models import Cotizacion, MaterialEstructural, CostoAdicional
+from .importer import importar_cotizaciones, leer_cotizaciones_stream
+from .models import Carpeta, ConteoCotizaciones, Cotizacion, MaterialEstructural, CostoAdicional, SeccionMaterial
+from .pagination import PAGE_SIZE, CursorError, paginate
+from .pdf import content_key, load_pdf_data, pdf_filename
+from . import pdf_queue
+from .pdf_cache import abrir_pdf
+from .pdf_export import exportar_zip, seleccionar_cotizaciones
+from .signals import aplazar_actualizaciones
+from profiles_api.readers import FORMATS, ReaderError
 from usuarios_app.models import Cliente
 
 # Configurar logger para este módulo
@@ -26,29 +43,135 @@ logger = logging.getLogger(__name__)
 
 
 
+# Columnas que muestra el listado (coti_app/_cotizacion_fila.html)
+LISTADO_CAMPOS = (
+    'id', 'proyecto_nombre', 'fecha_creacion', 'total_costo', 'estado', 'cliente__nombre', 'carpeta__nombre',
+)
+
+# Valor del filtro ?carpeta= para las cotizaciones sin carpeta
+SIN_CARPETA = 'sin_carpeta'
+
+
 @login_required
 def cotizacion(request):
     """
-    Lista todas las cotizaciones ordenadas por fecha de creación.
+    Lista las cotizaciones de más reciente a más antigua.
     
-    Las mostramos de más reciente a más antigua para que el usuario
-    vea primero lo que acaba de crear.
+    Solo se renderiza la primera página; el resto lo va agregando el scroll
+    infinito del template con cotizacion_page_api.
     
-    Optimización: Usamos select_related('cliente') para evitar N+1 queries
-    cuando el template acceda a cotizacion.cliente.nombre
+    Filtros GET opcionales: estado y carpeta (id o 'sin_carpeta'). Los
+    contadores de cada filtro salen de ConteoCotizaciones, sin COUNT(*).
     
-    Optimización CRÍTICO-003: prefetch_related para materiales y costos
-    evita N+1 queries al acceder a calculated_total en el template
+    Optimización: select_related('cliente') + only() trae en una consulta
+    exactamente las columnas que muestra la tabla, y la paginación keyset
+    usa el índice (fecha_creacion, id) -o (estado|carpeta, fecha_creacion,
+    id) al filtrar- en vez de recorrer toda la tabla
     """
-    cotizaciones = Cotizacion.objects.select_related('cliente')\
-        .prefetch_related('materiales_estructurales', 'costos_adicionales')\
-        .order_by('-fecha_creacion')
+    try:
+        queryset, filtros = _filtrar_listado(_listado_queryset(), request.GET)
+    except ValueError:
+        queryset, filtros = _listado_queryset(), {}
+    page = paginate(queryset)
+    
+    conteos = resumen_conteos()
+    carpetas = [
+        {'id': carpeta.id, 'nombre': carpeta.nombre, 'cantidad': conteos['por_carpeta'].get(carpeta.id, 0)}
+        for carpeta in Carpeta.objects.all()
+    ]
+    estados = [
+        {'valor': valor, 'nombre': nombre, 'cantidad': conteos['por_estado'].get(valor, 0)}
+        for valor, nombre in Cotizacion.ESTADOS
+    ]
     
     return render(request, 'coti_app/cotizacion.html', {
-        'cotizaciones': cotizaciones,
+        'cotizaciones': page.items,
+        'next_cursor': page.next_cursor,
+        'filtros': filtros,
+        'carpetas': carpetas,
+        'estados': estados,
+        'total_cotizaciones': conteos['total'],
+        'sin_carpeta': SIN_CARPETA,
+        'cantidad_sin_carpeta': conteos['por_carpeta'].get(ConteoCotizaciones.SIN_CARPETA, 0),
     })
 
 
+@login_required
+def cotizacion_page_api(request):
+    """
+    Siguiente página del listado para el scroll infinito.
+    
+    Parámetros GET:
+        cursor: next_cursor de la página anterior
+        page_size: Filas por página (máximo MAX_PAGE_SIZE)
+        estado, carpeta: Los mismos filtros de la primera página
+    
+    Returns:
+        JsonResponse con las filas ya renderizadas ('html', para agregar a
+        cotizaciones-tbody), sus datos ('results') y 'next_cursor'
+    """
+    try:
+        page_size = int(request.GET.get('page_size', PAGE_SIZE))
+        queryset, _ = _filtrar_listado(_listado_queryset(), request.GET)
+        page = paginate(queryset, request.GET.get('cursor'), page_size)
+    except (CursorError, ValueError):
+        return JsonResponse({'error': 'Parámetros de paginación inválidos'}, status=400)
+    
+    html = render_to_string('coti_app/_cotizacion_fila.html', {'cotizaciones': page.items}, request=request)
+    return JsonResponse({
+        'html': html,
+        'results': [_cotizacion_como_json(cot) for cot in page.items],
+        'next_cursor': page.next_cursor,
+    })
+
+
+def _listado_queryset():
+    return Cotizacion.objects.select_related('cliente', 'carpeta').only(*LISTADO_CAMPOS)
+
+
+def _filtrar_listado(queryset, params):
+    """
+    Aplica los filtros ?estado= y ?carpeta= (id o 'sin_carpeta').
+    
+    Returns:
+        (queryset filtrado, filtros aplicados)
+    
+    Raises:
+        ValueError: Si un filtro no es válido
+    """
+    filtros = {}
+    estado = params.get('estado', '').strip()
+    if estado:
+        if estado not in dict(Cotizacion.ESTADOS):
+            raise ValueError(f'Estado inválido: {estado}')
+        queryset = queryset.filter(estado=estado)
+        filtros['estado'] = estado
+    
+    carpeta = params.get('carpeta', '').strip()
+    if carpeta == SIN_CARPETA:
+        queryset = queryset.filter(carpeta__isnull=True)
+        filtros['carpeta'] = carpeta
+    elif carpeta:
+        queryset = queryset.filter(carpeta_id=int(carpeta))
+        filtros['carpeta'] = carpeta
+    
+    return queryset, filtros
+
+
+def _cotizacion_como_json(cot):
+    return {
+        'id': cot.id,
+        'proyecto_nombre': cot.proyecto_nombre,
+        'fecha_creacion': cot.fecha_creacion.strftime('%d-%m-%Y'),
+        'total_costo': float(cot.total_costo),
+        'cliente_nombre': cot.cliente.nombre if cot.cliente else 'N/A',
+        'estado': cot.estado,
+        'estado_display': cot.get_estado_display(),
+        'carpeta_id': cot.carpeta_id,
+        'carpeta_nombre': cot.carpeta.nombre if cot.carpeta else 'Sin Carpeta',
+    }
+
+
 
 
 
@@ -81,22 +204,51 @@ def crear_cotizacion(request):
                 # transaction.atomic() crea un bloque transaccional
                 # Si algo falla dentro del bloque, TODA la transacción se revierte
                 # Esto evita que tengamos una cotización guardada sin sus materiales
-                with transaction.atomic():
-                    # Guardamos primero la cotización principal
-                    cotizacion = form.save()
+                # aplazar_actualizaciones indexa la cotización para la búsqueda
+                # al final, cuando ya tiene sus materiales
+                with transaction.atomic(), aplazar_actualizaciones():
+                    structural_data = form.cleaned_data.get('structural_items_json') or []
+                    overhead_data = form.cleaned_data.get('overhead_items_json') or []
+
+                    # Recalculamos barras y totales desde los cortes: no confiamos
+                    # en los números que calculó el navegador
+                    calculo = calcular_cotizacion(structural_data, overhead_data)
+                    if form.cleaned_data.get('total_costo') != calculo.total_costo:
+                        logger.warning(
+                            "Total enviado por el navegador (%s) difiere del recalculado (%s)",
+                            form.cleaned_data.get('total_costo'), calculo.total_costo,
+                        )
 
-                    # Creamos los materiales estructurales desde el JSON
-                    structural_data = form.cleaned_data.get('structural_items_json')
-                    if structural_data:
-                        _create_structural_materials(cotizacion, structural_data)
+                    # Guardamos primero la cotización principal
+                    cotizacion = form.save(commit=False)
+                    cotizacion.total_costo = calculo.total_costo
+                    cotizacion.structural_items_json = [
+                        material_como_json(material) for material in calculo.materiales
+                    ]
+                    cotizacion.save()
+
+                    # Secciones del constructor (SectionManager) y materiales ya
+                    # recalculados, enlazados a su sección y a su perfil
+                    secciones = _create_sections(cotizacion, form.cleaned_data.get('secciones_json') or [])
+                    if calculo.materiales:
+                        _create_structural_materials(cotizacion, calculo.materiales, secciones)
 
                     # Creamos los costos adicionales desde el JSON
-                    overhead_data = form.cleaned_data.get('overhead_items_json')
                     if overhead_data:
                         _create_additional_costs(cotizacion, overhead_data)
-                    
-                    # Si llegamos aquí, todo salió bien. Redirigimos al listado
-                    return redirect(reverse('cotizador_app:cotizaciones'))
+
+                    # bulk_create no envía señales: actualizamos los totales
+                    # almacenados dentro de la misma transacción
+                    recalcular_totales([cotizacion.id])
+
+                # El PDF se renderiza en segundo plano al confirmar, así la
+                # primera descarga ya lo encuentra en el caché. Va fuera del
+                # bloque: al salir, aplazar_actualizaciones programa el borrado
+                # de los PDFs cacheados, que si no correría después del render
+                pdf_queue.encolar_al_confirmar(cotizacion.id)
+
+                # Si llegamos aquí, todo salió bien. Redirigimos al listado
+                return redirect(reverse('cotizador_app:cotizaciones'))
 
             except JSONDecodeError as e:
                 logger.error(f"JSON inválido en cotización: {e}", exc_info=True)
@@ -129,7 +281,112 @@ def crear_cotizacion(request):
     return render(request, 'coti_app/crear_cotizacion.html', context)
 
 
-def _create_structural_materials(cotizacion, items_data):
+@login_required
+def editar_cotizacion(request, cotizacion_id):
+    """
+    Abre una cotización guardada en el constructor de crear_cotizacion.
+    
+    El constructor carga sus secciones, materiales y costos, y al guardar
+    envía solo lo que cambió a editar_cotizacion_api (ver editor.py).
+    """
+    cotizacion = get_object_or_404(Cotizacion, id=cotizacion_id)
+    
+    return render(request, 'coti_app/crear_cotizacion.html', {
+        'clientes_disponibles': Cliente.objects.all(),
+        'cotizacion': cotizacion,
+        'datos_edicion': datos_edicion(cotizacion),
+    })
+
+
+@login_required
+@require_POST
+def editar_cotizacion_api(request, cotizacion_id):
+    """
+    Aplica un patch de edición a una cotización (formato en editor.py).
+    
+    Solo escribe los ítems agregados, modificados o eliminados, y ajusta
+    los totales almacenados con las diferencias.
+    
+    Returns:
+        JsonResponse con los totales nuevos y los ids asignados a las
+        secciones, materiales y costos agregados
+    """
+    try:
+        resultado = aplicar_cambios(cotizacion_id, json.loads(request.body))
+    except Cotizacion.DoesNotExist:
+        return JsonResponse({'error': 'Cotización no encontrada'}, status=404)
+    except (JSONDecodeError, EdicionError) as e:
+        return JsonResponse({'error': f"Solicitud inválida: {e}"}, status=400)
+    except IntegrityError as e:
+        logger.error(f"Error de integridad en BD al editar cotización: {e}", exc_info=True)
+        return JsonResponse({'error': 'No se pudo guardar la edición (datos duplicados)'}, status=409)
+    
+    cotizacion = resultado.cotizacion
+    pdf_queue.encolar_al_confirmar(cotizacion.id)
+    return JsonResponse({
+        'id': cotizacion.id,
+        'total_costo': float(cotizacion.total_costo),
+        'total_materiales': float(cotizacion.total_materiales),
+        'total_adicional': float(cotizacion.total_adicional),
+        'peso_total_kg': float(cotizacion.peso_total_kg),
+        'cant_materiales': cotizacion.cant_materiales,
+        'cant_costos': cotizacion.cant_costos,
+        'ids': {
+            'secciones': resultado.secciones,
+            'materiales': resultado.materiales,
+            'costos': resultado.costos,
+        },
+    })
+
+
+def _create_sections(cotizacion, secciones_data):
+    """
+    Crea las secciones de la cotización con un solo bulk_create.
+    
+    bulk_create no llama a SeccionMaterial.clean() (que hace una consulta
+    por sección para buscar duplicados): como la cotización es nueva, basta
+    con normalizar los nombres y juntar los repetidos aquí.
+    
+    Args:
+        cotizacion: Instancia de Cotizacion padre
+        secciones_data: [{id, nombre, orden, colapsada}, ...] donde 'id' es
+            el id de la sección en el navegador ('sec_1'), el mismo que
+            traen los materiales en seccion_id
+    
+    Returns:
+        Diccionario {id del navegador: SeccionMaterial}
+    
+    Raises:
+        ValueError: Si los datos de las secciones no son válidos
+    """
+    if not isinstance(secciones_data, list):
+        raise ValueError("Las secciones deben ser una lista")
+    
+    por_nombre = {}
+    por_id = {}
+    for orden, data in enumerate(secciones_data):
+        if not isinstance(data, dict) or not str(data.get('nombre') or '').strip():
+            raise ValueError(f"Sección #{orden + 1} inválida")
+        nombre = SeccionMaterial.normalizar_nombre(str(data['nombre']))
+        if len(nombre) > SeccionMaterial._meta.get_field('nombre').max_length:
+            raise ValueError(f"Nombre de sección demasiado largo: {nombre[:30]}...")
+        
+        # Dos secciones con el mismo nombre se guardan como una sola
+        seccion = por_nombre.get(nombre.lower())
+        if seccion is None:
+            seccion = por_nombre[nombre.lower()] = SeccionMaterial(
+                cotizacion=cotizacion,
+                nombre=nombre,
+                orden=data.get('orden') if type(data.get('orden')) is int else orden,
+                colapsada=bool(data.get('colapsada')),
+            )
+        por_id[str(data.get('id'))] = seccion
+    
+    SeccionMaterial.objects.bulk_create(por_nombre.values())
+    return por_id
+
+
+def _create_structural_materials(cotizacion, items_data, secciones=None):
     """
     Función helper que crea múltiples registros de MaterialEstructural.
     
@@ -140,20 +397,26 @@ def _create_structural_materials(cotizacion, items_data):
     
     Args:
         cotizacion: Instancia de Cotizacion padre
-        items_data: Lista de diccionarios con datos de materiales
+        items_data: Lista de MaterialCalculado (ver calculations.py)
+        secciones: {seccion_id del navegador: SeccionMaterial} (ver
+            _create_sections); los materiales sin sección quedan con
+            seccion=None, sin crear una fila de sección
     """
+    secciones = secciones or {}
     # Usamos bulk_create en vez de create() dentro de un loop
     # Esto reduce las queries a la BD de N a 1 (mucho más rápido)
     materials_to_create = [
         MaterialEstructural(
             cotizacion=cotizacion,
-            material_nombre=item.get('material_nombre', ''),
-            largo_m=item.get('largo_m', 0.0),
-            unidad_comercial=item.get('unidad_comercial', 0.0),
-            cant_necesaria=item.get('cant_necesaria', 1),
-            cant_a_comprar=item.get('cant_a_comprar', 1),
-            valor_unitario_m=item.get('valor_unitario_m', 0.0),
-            peso_kg_m=item.get('peso_kg_m', 0.0),
+            seccion=secciones.get(str(item.seccion_id)) if item.seccion_id is not None else None,
+            profile_id=item.profile_id,
+            material_nombre=item.material_nombre,
+            largo_m=item.largo_m,
+            unidad_comercial=item.unidad_comercial,
+            cant_necesaria=item.cant_necesaria,
+            cant_a_comprar=item.cant_a_comprar,
+            valor_unitario_m=item.valor_unitario_m,
+            peso_kg_m=item.peso_kg_m,
         )
         for item in items_data
     ]
@@ -186,308 +449,108 @@ def _create_additional_costs(cotizacion, items_data):
 
 
 # ========================================================================
-# GENERACIÓN DE PDF - Dividido en funciones pequeñas y reutilizables
+# GENERACIÓN DE PDF - El documento se arma en pdf.py y se cachea en pdf_cache.py
 # ========================================================================
 
 
 @login_required
 def generar_pdf(request, cotizacion_id):
     """
-    Genera un PDF profesional con los detalles de la cotización.
-    
-    Esta función coordina la generación del PDF pero delega el trabajo
-    específico a funciones helper. Esto nos da:
-    - Código más legible y mantenible
-    - Facilidad para testear cada sección por separado
-    - Posibilidad de reutilizar secciones en otros reportes
-    """
-    # Obtenemos la cotización con sus relaciones
-    # select_related optimiza el query para evitar N+1
-    cotizacion = get_object_or_404(
-        Cotizacion.objects.select_related('cliente'),
-        id=cotizacion_id
-    )
-    
-    # Configuramos la respuesta HTTP como PDF
-    response = HttpResponse(content_type='application/pdf')
-    filename = _generate_pdf_filename(cotizacion)
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    # Creamos el documento con márgenes personalizados
-    doc = SimpleDocTemplate(
-        response, 
-        pagesize=letter,
-        leftMargin=0.5*inch,
-        rightMargin=0.5*inch,
-        topMargin=0.5*inch,
-        bottomMargin=0.5*inch
-    )
-    
-    # Story es una lista de elementos que ReportLab renderizará en orden
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Construimos cada sección del PDF
-    _build_header_section(story, cotizacion, styles)
-    _build_materials_section(story, cotizacion, styles)
-    _build_costs_section(story, cotizacion, styles)
-    _build_total_section(story, cotizacion, styles)
-    _build_notes_section(story, cotizacion, styles)
-    
-    # Renderizamos el PDF completo
-    doc.build(story)
-    return response
+    Descarga el PDF profesional con los detalles de la cotización.
 
-
-
-def _generate_pdf_filename(cotizacion):
+    El PDF se sirve desde el caché si la cotización no cambió desde el
+    último render (o lo termina la cola de pdf_queue). El hash del
+    contenido va como ETag: el navegador que ya tiene esa versión recibe
+    un 304 sin que se lea el archivo.
     """
-    Genera un nombre de archivo descriptivo y seguro para el PDF.
-    
-    Sanitiza el nombre del proyecto para prevenir path traversal y
-    caracteres problemáticos en sistemas de archivos.
-    
-    Ejemplo: "cotizacion_Proyecto_Edificio_ABC_123.pdf"
-    """
-    import re
-    
-    # Eliminar caracteres peligrosos, permitir solo alfanuméricos, espacios, guiones y guiones bajos
-    safe_project_name = re.sub(r'[^a-zA-Z0-9\s\-_]', '', cotizacion.proyecto_nombre)
-    
-    # Limitar largo para evitar nombres de archivo excesivamente largos
-    safe_project_name = safe_project_name[:50].strip()
-    
-    # Reemplazar espacios por guiones bajos
-    safe_project_name = safe_project_name.replace(' ', '_')
-    
-    # Si después de sanitizar quedó vacío, usar un nombre por defecto
-    if not safe_project_name:
-        safe_project_name = "sin_nombre"
-    
-    return f"cotizacion_{safe_project_name}_{cotizacion.id}.pdf"
+    try:
+        data = load_pdf_data(cotizacion_id)
+    except Cotizacion.DoesNotExist:
+        raise Http404('No existe la cotización.')
+
+    key = content_key(data)
+    etag = f'"{key}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    # Si la cola ya está renderizando esta versión, esperamos ese render;
+    # si todavía no empieza, lo renderizamos aquí
+    pdf_queue.esperar_descarga(data.id, key)
+    file = abrir_pdf(data, key)
+    response = FileResponse(file, as_attachment=True, filename=pdf_filename(data), content_type='application/pdf')
+    response['ETag'] = etag
+    return response
 
 
+# Máximo de PDFs por exportación desde la web; para más está el comando exportar_pdfs
+MAX_PDFS_EXPORTACION = 500
 
-def _build_header_section(story, cotizacion, styles):
-    """
-    Construye la sección de encabezado del PDF con información general.
-    
-    Incluye: Título, ID, fecha, cliente
-    """
-    # Título principal
-    story.append(Paragraph(
-        f"<b>REGISTRO DE COSTOS INTERNOS - PROYECTO: {cotizacion.proyecto_nombre.upper()}</b>", 
-        styles['Heading1']
-    ))
-    story.append(Spacer(1, 0.2 * inch))
 
-    # Información básica
-    cliente_nombre = cotizacion.cliente.nombre if cotizacion.cliente else "N/A (Sin Cliente Asociado)"
-    
-    story.append(Paragraph(f"<b>ID Cotización:</b> {cotizacion.id}", styles['Normal']))
-    story.append(Paragraph(
-        f"<b>Fecha de Registro:</b> {cotizacion.fecha_creacion.strftime('%d-%m-%Y %H:%M')}", 
-        styles['Normal']
-    ))
-    story.append(Paragraph(f"<b>Cliente:</b> {cliente_nombre}", styles['Normal']))
-    story.append(Spacer(1, 0.1 * inch))
-
-
-def _build_materials_section(story, cotizacion, styles):
-    """
-    Construye la tabla de materiales estructurales con totales.
-    
-    Esta tabla incluye: material, largo, unidad comercial, cantidad,
-    valores unitarios y totales, pesos.
+@login_required
+def exportar_pdfs(request):
     """
-    story.append(Paragraph("<b>1. Material Estructural (Metales, Planchas, etc.)</b>", styles['h2']))
-    story.append(Spacer(1, 0.1 * inch))
-
-    # Encabezados de columna
-    table_data = [[
-        "Material", "Largo (m)", "Unidad Com.", "Cant. Comp.", 
-        "Valor Unit. ($)", "Valor Total ($)", "Peso (kg/m)", "Peso Total (kg)"
-    ]]
-    
-    # Obtenemos todos los materiales de la cotización
-    materiales = cotizacion.materiales_estructurales.all()
-    
-    # Calculamos los totales acumulando en cada iteración
-    structural_total_value = 0
-    structural_total_weight = 0
-    
-    for material in materiales:
-        # Usamos las properties del modelo para los cálculos
-        total_value = material.total_value
-        total_weight = material.total_weight
-        
-        structural_total_value += total_value
-        structural_total_weight += total_weight
-        
-        table_data.append([
-            material.material_nombre,
-            f"{material.largo_m:.2f}",
-            f"{material.unidad_comercial:.2f}",
-            material.cant_a_comprar,
-            f"{material.valor_unitario:,.0f}",
-            f"{total_value:,.0f}",
-            f"{material.peso_kg_m:.3f}",
-            f"{total_weight:.3f}",
-        ])
-    
-    # Fila de totales
-    table_data.append([
-        "SUBTOTAL ESTRUCTURAL:", '', '', '', '', 
-        f"{structural_total_value:,.0f}", 
-        "PESO TOTAL:", 
-        f"{structural_total_weight:.3f}"
-    ])
-
-    # Creamos y estilizamos la tabla
-    table = _create_styled_table(
-        table_data,
-        col_widths=[1.8*inch, 0.6*inch, 0.7*inch, 0.6*inch, 0.9*inch, 1.1*inch, 0.8*inch, 1.0*inch],
-        subtotal_span=(0, 4)  # Merge primeras 5 columnas en última fila
-    )
-    
-    story.append(table)
-    story.append(Spacer(1, 0.3 * inch))
+    Descarga un ZIP con los PDFs de varias cotizaciones (ver pdf_export.py).
 
+    El ZIP se envía a medida que se renderiza cada PDF. Para exportaciones
+    grandes en paralelo está el comando exportar_pdfs.
 
-def _build_costs_section(story, cotizacion, styles):
-    """
-    Construye la tabla de costos adicionales con totales.
-    
-    Incluye: descripción, unidad, cantidad, valores unitarios y totales.
+    Parámetros GET:
+        ids: Ids separados por coma (opcional)
+        cliente: Id del cliente (opcional)
+        desde, hasta: Fechas AAAA-MM-DD de creación (opcional)
+        estado, carpeta: Filtros del listado (ver _filtrar_listado)
     """
-    story.append(Paragraph("<b>2. Insumos y Costos Adicionales</b>", styles['h2']))
-    story.append(Spacer(1, 0.1 * inch))
+    try:
+        ids = request.GET.get('ids', '').strip()
+        queryset, _filtros = _filtrar_listado(Cotizacion.objects.all(), request.GET)
+        cotizacion_ids = list(seleccionar_cotizaciones(
+            ids=[int(pk) for pk in ids.split(',')] if ids else None,
+            cliente=request.GET.get('cliente') or None,
+            desde=request.GET.get('desde'),
+            hasta=request.GET.get('hasta'),
+            queryset=queryset,
+        )[:MAX_PDFS_EXPORTACION + 1])
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros de exportación inválidos'}, status=400)
+
+    if not cotizacion_ids:
+        return JsonResponse({'error': 'No hay cotizaciones para exportar'}, status=404)
+    if len(cotizacion_ids) > MAX_PDFS_EXPORTACION:
+        return JsonResponse(
+            {'error': f'Máximo {MAX_PDFS_EXPORTACION} cotizaciones por exportación; use el comando exportar_pdfs'},
+            status=400,
+        )
 
-    # Encabezados
-    table_data = [[
-        "Descripción / Concepto", "Unidad", "Cantidad", "Valor Unitario ($)", "Valor Total ($)"
-    ]]
-    
-    costos = cotizacion.costos_adicionales.all()
-    overhead_total_value = 0
-    
-    for costo in costos:
-        total_value = costo.total_value
-        overhead_total_value += total_value
-        
-        table_data.append([
-            costo.descripcion,
-            costo.unidad,
-            f"{costo.cantidad:.2f}",
-            f"{costo.valor_unitario:,.0f}",
-            f"{total_value:,.0f}",
-        ])
-    
-    # Fila de subtotal
-    table_data.append([
-        "SUBTOTAL INSUMOS:", '', '', '', 
-        f"{overhead_total_value:,.0f}"
-    ])
-
-    table = _create_styled_table(
-        table_data,
-        col_widths=[2.8*inch, 0.8*inch, 0.8*inch, 1.2*inch, 1.2*inch],
-        subtotal_span=(0, 3)  # Merge primeras 4 columnas en última fila
+    # Se renderiza en este request (workers=0): un pool de procesos por
+    # request multiplicaría los procesos con cada exportación simultánea
+    response = StreamingHttpResponse(
+        exportar_zip(cotizacion_ids, workers=0),
+        content_type='application/zip',
     )
-    
-    story.append(table)
-    story.append(Spacer(1, 0.5 * inch))
-
-
-def _build_total_section(story, cotizacion, styles):
-    """
-    Construye la sección de total general destacada.
-    
-    Usa el campo total_costo que se guardó al crear la cotización.
-    """
-    grand_total = cotizacion.total_costo
-    
-    total_data = [[
-        "TOTAL GENERAL DE COSTOS:", f"${grand_total:,.0f}"
-    ]]
-    
-    total_table = Table(total_data, colWidths=[4*inch, 2*inch])
-    total_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.yellow),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#FFCC00')),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (0, 0), 16),
-        ('FONTSIZE', (1, 0), (1, 0), 20),
-        ('TEXTCOLOR', (1, 0), (1, 0), colors.red),
-        ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('INNERPADDING', (0, 0), (-1, -1), 10),
-    ]))
-    
-    story.append(total_table)
-    story.append(Spacer(1, 0.5 * inch))
+    response['Content-Disposition'] = f'attachment; filename="cotizaciones_{timezone.localdate():%Y%m%d}.zip"'
+    return response
 
 
-def _build_notes_section(story, cotizacion, styles):
-    """
-    Construye la sección de notas internas al final del documento.
+@login_required
+def pdf_estado_api(request, cotizacion_id):
     """
-    story.append(Paragraph("<b>Notas Internas:</b>", styles['h2']))
-    
-    if cotizacion.notas_internas:
-        # Convertimos saltos de línea a tags HTML para que se muestren correctamente
-        formatted_notes = cotizacion.notas_internas.replace('\n', '<br/>')
-        story.append(Paragraph(formatted_notes, styles['Normal']))
-    else:
-        story.append(Paragraph("No se registraron notas internas.", styles['Italic']))
-
+    Estado del PDF de la cotización: 'listo', 'pendiente' o 'error'.
 
-def _create_styled_table(data, col_widths, subtotal_span):
-    """
-    Crea una tabla estilizada según el diseño corporativo.
-    
-    Esta función centraliza el estilo de todas las tablas para mantener
-    consistencia visual en todo el documento.
-    
-    Args:
-        data: Lista de listas con los datos de la tabla
-        col_widths: Lista con anchos de cada columna
-        subtotal_span: Tupla (start_col, end_col) para merge en última fila
-        
-    Returns:
-        Table: Objeto Table de ReportLab estilizado
+    Si el PDF de la versión actual no está renderizado ni en la cola, lo
+    encola. Con 'listo' la descarga (url) sale directo del caché.
     """
-    table = Table(data, colWidths=col_widths)
-    
-    # Aplicamos estilos comunes a todas las tablas
-    table.setStyle(TableStyle([
-        # Encabezado: fondo azul oscuro, texto blanco
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#002B5B')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        
-        # Alineación: números a la derecha, texto a la izquierda
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        
-        # Tipografía
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Bordes para todas las filas excepto la última (subtotal)
-        ('GRID', (0, 0), (-1, -2), 0.5, colors.grey),
-        
-        # Fila de subtotal: fondo gris, texto en negrita
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('SPAN', subtotal_span + (-1, -1)),  # Merge columnas especificadas
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        
-        # Destacar columna de total en rojo
-        ('TEXTCOLOR', (-1, -1), (-1, -1), colors.red),
-    ]))
-    
-    return table
-
+    try:
+        estado = pdf_queue.estado(cotizacion_id)
+    except Cotizacion.DoesNotExist:
+        return JsonResponse({'error': 'Cotización no encontrada'}, status=404)
 
+    return JsonResponse({
+        'estado': estado.estado,
+        'etag': estado.key,
+        'url': reverse('cotizador_app:generar_pdf', args=[cotizacion_id]),
+    })
 
 
 @login_required
@@ -521,68 +584,184 @@ def eliminar_cotizacion(request, cotizacion_id):
 @login_required
 def cotizacion_search_api(request):
     """
-    Endpoint JSON para búsqueda y filtrado de cotizaciones.
+    Endpoint JSON para la búsqueda (typeahead) de cotizaciones.
+    
+    Busca en nombre del proyecto, cliente, materiales y notas internas con
+    el índice full-text de search.py: cada palabra es un prefijo y los
+    resultados vienen ordenados por relevancia.
     
     Parámetros GET:
-        q: Query de búsqueda (busca en proyecto_nombre y cliente__nombre)
-        carpeta: Filtro por carpeta específica
-        estado: Filtro por estado
+        q: Texto a buscar
+        page: Número de página (desde 1)
+        page_size: Resultados por página (máximo search.MAX_PAGE_SIZE)
+        estado, carpeta: Filtros del listado (ver _filtrar_listado)
     
     Returns:
-        JsonResponse con lista de cotizaciones filtradas
+        JsonResponse con las cotizaciones de la página, si hay más y si el
+        orden por relevancia se limitó a las coincidencias más recientes
+        (truncated, ver search.RANK_CANDIDATES)
     """
-    from django.http import JsonResponse
-    from django.db.models import Q
-    
-    # Obtenemos parámetros de búsqueda
     search_query = request.GET.get('q', '').strip()
-    carpeta_filter = request.GET.get('carpeta', '').strip()
-    estado_filter = request.GET.get('estado', '').strip()
-    
-    # Query base optimizado
-    cotizaciones = Cotizacion.objects.select_related('cliente')\
-        .prefetch_related('materiales_estructurales', 'costos_adicionales')\
-        .order_by('-fecha_creacion')
-    
-    # Aplicar filtro de búsqueda (case-insensitive)
-    if search_query:
-        cotizaciones = cotizaciones.filter(
-            Q(proyecto_nombre__icontains=search_query) |
-            Q(cliente__nombre__icontains=search_query)
-        )
-    
-    # Filtrar por carpeta
-    if carpeta_filter:
-        if carpeta_filter == 'sin_carpeta':
-            cotizaciones = cotizaciones.filter(carpeta__isnull=True)
-        else:
-            # Filtrar por nombre de carpeta
-            cotizaciones = cotizaciones.filter(carpeta__nombre=carpeta_filter)
-    
-    # Filtrar por estado
-    if estado_filter:
-        cotizaciones = cotizaciones.filter(estado=estado_filter)
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', search.PAGE_SIZE))
+        filtradas, filtros = _filtrar_listado(Cotizacion.objects.all(), request.GET)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros de búsqueda inválidos'}, status=400)
+
+    # Los filtros se aplican dentro de la consulta al índice
+    resultado = search.search(search_query, page, page_size, filtradas if filtros else None)
+
+    # Solo las columnas que se devuelven, respetando el orden por relevancia
+    cotizaciones = _listado_queryset().in_bulk(resultado.ids)
     
     # Serializar datos a JSON
     data = []
-    for cot in cotizaciones:
+    for cot in (cotizaciones[pk] for pk in resultado.ids if pk in cotizaciones):
         data.append({
-            'id': cot.id,
-            'proyecto_nombre': cot.proyecto_nombre,
-            'fecha_creacion': cot.fecha_creacion.strftime('%d-%m-%Y'),
-            'total_costo': float(cot.total_costo),
-            'cliente_nombre': cot.cliente.nombre if cot.cliente else 'N/A',
-            'estado': cot.estado,
-            'estado_display': cot.get_estado_display(),
-            'carpeta_id': cot.carpeta.id if cot.carpeta else None,
-            'carpeta_nombre': cot.carpeta.nombre if cot.carpeta else 'Sin Carpeta',
+            **_cotizacion_como_json(cot),
             # URLs para acciones
             'url_detalle': reverse('cotizador_app:detalle_cotizacion'),
+            'url_editar': reverse('cotizador_app:editar_cotizacion', args=[cot.id]),
             'url_pdf': reverse('cotizador_app:generar_pdf', args=[cot.id]),
             'url_eliminar': reverse('cotizador_app:eliminar_cotizacion', args=[cot.id]),
         })
     
     return JsonResponse({
         'cotizaciones': data,
-        'count': len(data)
+        'count': len(data),
+        'page': page,
+        'has_more': resultado.has_more,
+        'truncated': resultado.truncated,
+    })
+
+
+# Límite de piezas por solicitud al optimizador de cortes (BFD es
+# O(n log n), pero no queremos que una sola solicitud acapare el worker)
+MAX_PIEZAS_OPTIMIZACION = 200000
+
+
+@login_required
+@require_POST
+def optimizar_cortes_api(request):
+    """
+    Endpoint JSON con el plan de corte real de cada perfil.
+
+    Body (JSON):
+        largo_barra_m: Largo de la barra comercial (opcional, 6 m)
+        kerf_mm: Espesor de la sierra en mm (opcional, 0)
+        perfiles: [{profile_id, cortes: [{largo_m, cantidad}, ...]}, ...]
+
+    Para cada perfil retorna el plan (barras, patrones de corte, desperdicio)
+    junto a la estimación por metros totales de calcular_barras, para que el
+    constructor muestre cuántas barras se necesitan de verdad.
+
+    El presupuesto de tiempo de la fase de mejora (TIEMPO_MAXIMO_S) se
+    reparte entre los perfiles, así la latencia queda acotada aunque la
+    cotización tenga muchos.
+    """
+    started = time.perf_counter()
+    try:
+        data = json.loads(request.body)
+        perfiles = data['perfiles']
+        if not isinstance(perfiles, list) or not all(isinstance(perfil, dict) for perfil in perfiles):
+            raise CalculationError("'perfiles' debe ser una lista de objetos")
+
+        largo_barra_m = data.get('largo_barra_m') or LARGO_BARRA_MM / MM_POR_METRO
+        kerf_mm = data.get('kerf_mm') or 0
+        if type(largo_barra_m) not in (int, float) or not 0 < largo_barra_m <= 100:
+            raise CalculationError("largo_barra_m debe ser un número entre 0 y 100")
+        if type(kerf_mm) not in (int, float) or not 0 <= kerf_mm <= 100:
+            raise CalculationError("kerf_mm debe ser un número entre 0 y 100")
+        largo_barra_mm = round(largo_barra_m * MM_POR_METRO)
+        kerf_mm = round(kerf_mm)
+
+        cortes_por_perfil = [cortes_mm(perfil, indice) for indice, perfil in enumerate(perfiles)]
+    except (JSONDecodeError, KeyError, TypeError, AttributeError, CalculationError) as e:
+        return JsonResponse({'error': f"Solicitud inválida: {e}"}, status=400)
+
+    piezas = sum(cantidad for cortes in cortes_por_perfil for _, cantidad in cortes)
+    if piezas > MAX_PIEZAS_OPTIMIZACION:
+        return JsonResponse(
+            {'error': f"Demasiados cortes ({piezas}); el máximo es {MAX_PIEZAS_OPTIMIZACION}"},
+            status=400,
+        )
+
+    resultados = []
+    tiempo_por_perfil = TIEMPO_MAXIMO_S / max(len(perfiles), 1)
+    for perfil, cortes in zip(perfiles, cortes_por_perfil):
+        try:
+            plan = optimizar_cortes(cortes, largo_barra_mm, kerf_mm, tiempo_por_perfil)
+        except CuttingError as e:
+            return JsonResponse({'error': str(e), 'profile_id': perfil.get('profile_id')}, status=400)
+
+        cant_necesaria, cant_a_comprar = calcular_barras(sum(largo * cantidad for largo, cantidad in cortes))
+        resultados.append({
+            'profile_id': perfil.get('profile_id'),
+            'plan': plan_como_json(plan),
+            # Estimación por metros totales (la que usa la cotización)
+            'estimacion': {
+                'cant_necesaria': cant_necesaria,
+                'cant_a_comprar': cant_a_comprar,
+            },
+        })
+
+    return JsonResponse({
+        'perfiles': resultados,
+        'total_barras': sum(resultado['plan']['barras'] for resultado in resultados),
+        'total_desperdicio_mm': sum(resultado['plan']['desperdicio_mm'] for resultado in resultados),
+        'tiempo_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+# Formato del body de importar_cotizaciones_api según su Content-Type
+FORMATOS_IMPORTACION = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+@login_required
+@require_POST
+def importar_cotizaciones_api(request):
+    """
+    Importación masiva de cotizaciones (ver importer.py).
+
+    Body: JSON (lista de cotizaciones), NDJSON o CSV, según el Content-Type
+    o el parámetro GET 'format'. El tamaño del body está acotado por
+    DATA_UPLOAD_MAX_MEMORY_SIZE; para archivos grandes está el comando
+    importar_cotizaciones.
+
+    Parámetros GET:
+        format: json, ndjson o csv (opcional)
+        dry_run: '1' para solo validar
+
+    Returns:
+        JsonResponse con las cotizaciones creadas y los errores por
+        cotización ({numero, ref, mensaje})
+    """
+    format = request.GET.get('format') or FORMATOS_IMPORTACION.get(request.content_type)
+    if format not in FORMATS:
+        return JsonResponse(
+            {'error': f"Formato no soportado; use Content-Type {', '.join(FORMATOS_IMPORTACION)}"},
+            status=415,
+        )
+
+    try:
+        # Se lee todo antes de insertar: un archivo mal formado no deja
+        # lotes importados a medias
+        items = list(leer_cotizaciones_stream(io.StringIO(request.body.decode('utf-8-sig')), format))
+    except RequestDataTooBig:
+        return JsonResponse({'error': 'Archivo demasiado grande; use el comando importar_cotizaciones'}, status=413)
+    except (ReaderError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': f"No se pudo leer el archivo: {e}"}, status=400)
+
+    resultado = importar_cotizaciones(items, dry_run=request.GET.get('dry_run') == '1')
+    return JsonResponse({
+        'creadas': resultado.creadas,
+        'errores': [error._asdict() for error in resultado.errores],
+        'dry_run': request.GET.get('dry_run') == '1',
+        'tiempo_ms': round(resultado.segundos * 1000, 1),
     })
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProfilesApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profiles_api'
+
+    def ready(self):
+        # Registra los receivers que invalidan el índice del catálogo
+        from . import signals  # noqa: F401
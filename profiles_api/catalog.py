@@ -0,0 +1,274 @@
+"""
+Índice en memoria del catálogo de perfiles.
+
+El catálogo es pequeño (~1.200 perfiles) y casi nunca cambia, pero los
+endpoints de la API se consultan en cada tecla que presiona el usuario en el
+cotizador. Filtrar por claves JSON (attributes__ALTURA_d=...) no puede usar
+índices, así que cada worker construye una sola vez un índice inmutable con:
+
+- Mapas hash por id y por dimensiones (category, d, bf, tf, tw)
+- Arreglos ordenados por categoría
+- Listas de opciones precalculadas para los filtros en cascada
+- Un índice de búsqueda por prefijos/trigramas para el autocompletado
+
+El índice se invalida comparando su sello con CatalogVersion, que se
+incrementa cada vez que Profile cambia (ver signals.py y load_profiles).
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from .models import CatalogVersion, Profile
+from .search import ProfileSearchIndex
+
+# Cada cuántos segundos un worker vuelve a leer el sello de versión en la BD.
+# Dentro de esta ventana las consultas se responden sin tocar la base de datos.
+VERSION_CHECK_INTERVAL = 2.0
+
+# Sello de versión tal como se leyó de CatalogVersion
+CatalogStamp = namedtuple('CatalogStamp', ['version', 'stamp', 'updated_at'])
+
+# Claves JSON que forman la "identidad" dimensional de un perfil
+DIMENSION_KEYS = ('ALTURA_d', 'ANCHURA_bf', 'DIMENSION_tf', 'DIMENSION_tw')
+
+
+def _sort_key(value):
+    """Orden estable y tolerante a None (los nulos primero, como en SQLite)."""
+    return (value is not None, value)
+
+
+class ProfileCatalog:
+    """
+    Snapshot inmutable del catálogo de perfiles.
+
+    Cada fila es un dict con la misma forma que ProfileSerializer
+    ({id, name, category, attributes}), así que puede devolverse tal cual
+    en un Response sin pasar por el serializer.
+    """
+
+    def __init__(self, version, stamp, rows, previous=None):
+        self.version = version
+        self.stamp = stamp
+        self.rows = tuple(sorted(rows, key=lambda row: row['id']))
+
+        self.by_id = {row['id']: row for row in self.rows}
+        self.by_name = {row['name']: row for row in self.rows}
+        self.by_dimensions = {}
+        by_category = {}
+
+        for row in self.rows:
+            # Las filas vienen ordenadas por id: setdefault conserva la de menor
+            # id, igual que .first() sobre el queryset original
+            self.by_dimensions.setdefault(self.dimension_key(row), row)
+            by_category.setdefault(row['category'], []).append(row)
+
+        # Arreglos por categoría ordenados por dimensiones
+        self.by_category = {
+            category: tuple(sorted(
+                category_rows,
+                key=lambda row: tuple(_sort_key(row['attributes'].get(k)) for k in DIMENSION_KEYS),
+            ))
+            for category, category_rows in by_category.items()
+        }
+        self.categories = sorted(self.by_category, key=_sort_key)
+
+        self.search_index = self._build_search_index(previous)
+
+        self._options_cache = {}
+        self._thickness = {}
+        self._build_cascade_options()
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_database(cls, previous=None):
+        """Lee el sello y todas las filas de Profile (2 queries)."""
+        version = CatalogVersion.current()
+        rows = Profile.objects.values('id', 'name', 'category', 'attributes')
+        return cls(version.version, version.stamp, rows, previous=previous)
+
+    def _build_search_index(self, previous):
+        """
+        Construye el índice de búsqueda. Si hay un catálogo anterior, parte
+        de una copia de su índice y aplica solo los perfiles que cambiaron.
+        """
+        if previous is None:
+            return ProfileSearchIndex(self.rows)
+
+        index = previous.search_index.copy()
+        for profile_id in previous.by_id.keys() - self.by_id.keys():
+            index.remove(profile_id)
+        for row in self.rows:
+            if previous.by_id.get(row['id']) != row:
+                index.add(row)
+        return index
+
+    @staticmethod
+    def dimension_key(row):
+        attributes = row['attributes']
+        return (row['category'],) + tuple(attributes.get(k) for k in DIMENSION_KEYS)
+
+    def _build_cascade_options(self):
+        """
+        Precalcula las opciones que usa el cotizador en su cascada
+        Tipo -> Altura -> Ancho -> Espesores.
+        """
+        self._options_cache[('category', ())] = list(self.categories)
+
+        for category, rows in self.by_category.items():
+            heights = {}
+            for row in rows:
+                attributes = row['attributes']
+                d = attributes.get('ALTURA_d')
+                bf = attributes.get('ANCHURA_bf')
+                heights.setdefault(d, {}).setdefault(bf, []).append(row)
+
+            self._options_cache[('attributes__ALTURA_d', (('category', category),))] = \
+                sorted(heights, key=_sort_key)
+
+            for d, widths in heights.items():
+                self._options_cache[(
+                    'attributes__ANCHURA_bf',
+                    (('attributes__ALTURA_d', d), ('category', category)),
+                )] = sorted(widths, key=_sort_key)
+
+                for bf, width_rows in widths.items():
+                    combos = []
+                    seen = set()
+                    for row in width_rows:
+                        combo = (row['attributes'].get('DIMENSION_tf'), row['attributes'].get('DIMENSION_tw'))
+                        if combo not in seen:
+                            seen.add(combo)
+                            combos.append({'tf': combo[0], 'tw': combo[1]})
+                    # Espesor de ala descendente (más grueso primero)
+                    combos.sort(key=lambda x: x['tf'] if x['tf'] is not None else 0, reverse=True)
+                    self._thickness[(category, d, bf)] = combos
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def get(self, profile_id):
+        return self.by_id.get(profile_id)
+
+    def get_by_name(self, name):
+        return self.by_name.get(name)
+
+    def find_unique(self, category, altura, ancho, tf, tw):
+        return self.by_dimensions.get((category, altura, ancho, tf, tw))
+
+    def thickness_combinations(self, category, altura, ancho):
+        # Copiamos los dicts para que nadie modifique el snapshot compartido
+        return [dict(combo) for combo in self._thickness.get((category, altura, ancho), [])]
+
+    def search(self, term, limit=15):
+        """Perfiles que calzan con 'term', ordenados por relevancia."""
+        return [self.by_id[pid] for pid in self.search_index.search(term, limit=limit)]
+
+    def options(self, field, filters):
+        """
+        Valores únicos y ordenados de 'field' entre los perfiles que cumplen
+        'filters'. Los campos usan la misma sintaxis que el ORM
+        ('category', 'name' o 'attributes__CLAVE').
+
+        Raises:
+            ValueError: Si el campo o algún filtro no existe en el modelo
+        """
+        field = self._canonical_field(field)
+        filters = {self._canonical_field(key): value for key, value in filters.items()}
+
+        cache_key = (field, tuple(sorted(filters.items())))
+        cached = self._options_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        getter = self._field_getter(field)
+        predicates = [(self._field_getter(key), value) for key, value in filters.items()]
+
+        values = {
+            getter(row)
+            for row in self.rows
+            if all(get(row) == value for get, value in predicates)
+        }
+        # No se guarda: los filtros vienen de la query string (también de
+        # anónimos) y cada combinación nueva haría crecer el caché. Solo las
+        # claves de _build_cascade_options quedan cacheadas
+        return sorted(values, key=_sort_key)
+
+    @staticmethod
+    def _canonical_field(field):
+        """Traduce columnas materializadas (altura_d) a 'attributes__ALTURA_d'."""
+        for key, column in Profile.MATERIALIZED_ATTRIBUTES.items():
+            if field == column:
+                return f'attributes__{key}'
+        return field
+
+    @staticmethod
+    def _field_getter(field):
+        if field in ('id', 'name', 'category'):
+            return lambda row: row[field]
+        if field.startswith('attributes__'):
+            key = field[len('attributes__'):]
+            if key and '__' not in key:
+                return lambda row: row['attributes'].get(key)
+        raise ValueError(f"Campo no soportado: {field}")
+
+
+# ----------------------------------------------------------------------
+# Caché por proceso
+# ----------------------------------------------------------------------
+
+_lock = threading.Lock()
+_catalog = None
+_known_version = None  # CatalogStamp leído de la BD
+_checked_at = 0.0
+
+
+def current_version():
+    """
+    Retorna el CatalogStamp vigente.
+
+    Lee la BD como máximo una vez cada VERSION_CHECK_INTERVAL, así que es
+    barato llamarlo en cada request (ej. para calcular ETags).
+    """
+    global _known_version, _checked_at
+
+    now = time.monotonic()
+    if _known_version is None or now - _checked_at >= VERSION_CHECK_INTERVAL:
+        current = CatalogVersion.current()
+        _known_version = CatalogStamp(current.version, current.stamp, current.updated_at)
+        _checked_at = now
+    return _known_version
+
+
+def get_catalog():
+    """
+    Retorna el índice del catálogo para este proceso, reconstruyéndolo si
+    el sello de versión cambió.
+    """
+    global _catalog
+
+    stamp = current_version().stamp
+    catalog = _catalog
+    if catalog is not None and catalog.stamp == stamp:
+        return catalog
+
+    with _lock:
+        # Otro thread pudo haberlo reconstruido mientras esperábamos el lock
+        if _catalog is None or _catalog.stamp != stamp:
+            _catalog = ProfileCatalog.from_database(previous=_catalog)
+        return _catalog
+
+
+def invalidate():
+    """
+    Olvida el sello conocido para que la próxima consulta lo vuelva a leer.
+
+    Se llama después de cada escritura en Profile dentro de este proceso;
+    los demás workers lo detectan al vencer VERSION_CHECK_INTERVAL.
+    """
+    global _known_version
+    _known_version = None
@@ -0,0 +1,204 @@
+"""
+Carga incremental e idempotente del catálogo de perfiles.
+
+En vez de borrar la tabla y volver a insertarla (lo que cambia todos los
+ids referenciados por MaterialEstructural.profile_id), se compara cada
+perfil del archivo contra la BD por su nombre, que es la clave natural
+("H 1100x600 596.6"), y su content_hash:
+
+- Nombre nuevo                        -> bulk_create
+- Nombre existente con hash distinto  -> bulk_update (mismo id)
+- Nombre existente con el mismo hash  -> no se toca
+- Nombre en la BD que ya no viene     -> delete
+
+Todo ocurre en una sola transacción y el sello del catálogo se incrementa
+una única vez (y solo si algo cambió). Si el archivo repite un nombre, gana la última aparición
+(igual que el update_or_create que usaba recuperar_datos.py).
+"""
+
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from . import catalog
+from .models import CatalogVersion, Profile, profile_content_hash
+from .signals import suspend_catalog_signals
+
+BATCH_SIZE = 1000
+
+# Columnas que se reescriben al actualizar un perfil existente
+UPDATE_FIELDS = (
+    ['category', 'attributes', 'content_hash']
+    + list(Profile.MATERIALIZED_ATTRIBUTES.values())
+)
+
+LoadResult = namedtuple(
+    'LoadResult',
+    ['created', 'updated', 'unchanged', 'deleted', 'duplicates', 'skipped', 'elapsed'],
+)
+
+
+def profile_name(item):
+    """Nombre único del perfil, ej. "H 1100x600 596.6"."""
+    return f"{item.get('PREFIJO')} {item.get('ALTURA_d', 0)}x{item.get('ANCHURA_bf', 0)} {item.get('PESO_KG_M', 0)}"
+
+
+def sync_profiles(items, batch_size=BATCH_SIZE, delete_missing=True, dry_run=False, progress=None):
+    """
+    Sincroniza la tabla Profile con 'items' (dicts con PREFIJO y atributos).
+
+    'items' puede ser cualquier iterable (ej. profiles_api.readers): se
+    consume en lotes de 'batch_size', así que solo un lote de instancias
+    Profile vive en memoria a la vez. Con dry_run=True se calculan los
+    cambios y se deshace la transacción. 'progress', si se entrega, se
+    llama después de cada lote con la cantidad de filas leídas.
+
+    Returns:
+        LoadResult con los conteos y el tiempo total en segundos
+    """
+    started = time.perf_counter()
+    loader = _ProfileLoader(batch_size, progress)
+
+    with transaction.atomic():
+        with suspend_catalog_signals():
+            loader.load(items, delete_missing)
+        result = loader.result()
+
+        if dry_run:
+            transaction.set_rollback(True)
+        elif result.created or result.updated or result.deleted:
+            # Sin cambios no hay que invalidar los índices de los workers
+            CatalogVersion.bump()
+
+    if not dry_run:
+        catalog.invalidate()
+    return result._replace(elapsed=time.perf_counter() - started)
+
+
+class _ProfileLoader:
+    """
+    Aplica los perfiles lote a lote.
+
+    Por cada lote se consultan solo los perfiles de la BD con esos nombres
+    (índice único de 'name'), así que la memoria no crece con el catálogo
+    ni con el archivo: lo único que se acumula son los ids vistos, que
+    hacen falta al final para saber qué perfiles borrar.
+    """
+
+    def __init__(self, batch_size, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.read = 0
+        self.seen_ids = set()      # perfiles presentes en el archivo
+        self.created_ids = set()
+        self.updated_ids = set()
+        self.duplicates = 0
+        self.skipped = 0
+        self.deleted = 0
+
+    def load(self, items, delete_missing):
+        chunk = {}
+        for item in items:
+            self.read += 1
+            if not isinstance(item, dict) or not item.get('PREFIJO'):
+                self.skipped += 1
+                continue
+
+            name = profile_name(item)
+            if name in chunk:
+                self.duplicates += 1
+            chunk[name] = item
+
+            if len(chunk) >= self.batch_size:
+                self._apply(chunk)
+                chunk = {}
+
+        if chunk:
+            self._apply(chunk)
+
+        if delete_missing:
+            self._delete_missing()
+
+    def _apply(self, chunk):
+        current = self._existing(list(chunk))
+        to_create = []
+        to_update = []
+
+        for name, item in chunk.items():
+            profile_id, stored_hash = current.get(name, (None, None))
+            if profile_id in self.seen_ids:
+                # El nombre ya apareció en un lote anterior: gana este
+                self.duplicates += 1
+
+            content_hash = profile_content_hash(item['PREFIJO'], item)
+            if content_hash == stored_hash:
+                self.seen_ids.add(profile_id)
+                continue
+
+            profile = Profile(name=name, category=item['PREFIJO'], attributes=item)
+            # bulk_create/bulk_update no llaman a save()
+            profile.sync_materialized_fields()
+
+            if profile_id is None:
+                to_create.append(profile)
+            else:
+                profile.id = profile_id
+                to_update.append(profile)
+
+        if to_create:
+            created = Profile.objects.bulk_create(to_create, batch_size=self.batch_size)
+            ids = self._created_ids(created)
+            self.created_ids.update(ids)
+            self.seen_ids.update(ids)
+        if to_update:
+            Profile.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.batch_size)
+            ids = {profile.id for profile in to_update}
+            # Un duplicado que reescribe un perfil creado en esta misma
+            # carga sigue contando como creado
+            self.updated_ids.update(ids - self.created_ids)
+            self.seen_ids.update(ids)
+
+        if self.progress:
+            self.progress(self.read)
+
+    def _existing(self, names):
+        """nombre -> (id, content_hash) de los perfiles de la BD con esos nombres."""
+        existing = {}
+        if not names:
+            return existing
+        step = connection.ops.bulk_batch_size(['name'], names)
+        for start in range(0, len(names), step):
+            rows = Profile.objects.filter(name__in=names[start:start + step]) \
+                .values_list('name', 'id', 'content_hash')
+            existing.update((name, (profile_id, content_hash)) for name, profile_id, content_hash in rows)
+        return existing
+
+    def _created_ids(self, created):
+        ids = [profile.pk for profile in created]
+        if None in ids:
+            # Backends sin RETURNING (MySQL): recuperamos los ids por nombre
+            return {profile_id for profile_id, _ in self._existing([p.name for p in created]).values()}
+        return set(ids)
+
+    def _delete_missing(self):
+        stale_ids = [
+            profile_id
+            for profile_id in Profile.objects.values_list('id', flat=True).iterator(chunk_size=self.batch_size)
+            if profile_id not in self.seen_ids
+        ]
+        for start in range(0, len(stale_ids), self.batch_size):
+            Profile.objects.filter(id__in=stale_ids[start:start + self.batch_size]).delete()
+        self.deleted = len(stale_ids)
+
+    def result(self):
+        return LoadResult(
+            created=len(self.created_ids),
+            updated=len(self.updated_ids),
+            unchanged=len(self.seen_ids) - len(self.created_ids) - len(self.updated_ids),
+            deleted=self.deleted,
+            duplicates=self.duplicates,
+            skipped=self.skipped,
+            elapsed=None,
+        )
+
@@ -0,0 +1,79 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from profiles_api.models import Profile
+from profiles_api.renderers import FastJSONRenderer, orjson
+from profiles_api.serializers import ProfileRowSerializer, ProfileSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compara el costo por fila de ProfileSerializer contra la ruta rápida de solo lectura'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 50000],
+            help='Cantidades de filas sintéticas a medir (default: 1000 50000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por medición')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson no está instalado: FastJSONRenderer usará json.dumps'))
+
+        for size in options['sizes']:
+            rows = self._synthetic_rows(size)
+            instances = [Profile(**row) for row in rows]
+
+            self.stdout.write(self.style.SUCCESS(f'\n{size} filas'))
+
+            drf_data = ProfileSerializer(instances, many=True).data
+            fast_data = ProfileRowSerializer().serialize(rows)
+
+            self._report('ProfileSerializer', size, options['repeat'],
+                         lambda: ProfileSerializer(instances, many=True).data)
+            self._report('ProfileRowSerializer', size, options['repeat'],
+                         lambda: ProfileRowSerializer().serialize(rows))
+            self._report('JSONRenderer (DRF)', size, options['repeat'],
+                         lambda: JSONRenderer().render(drf_data))
+            self._report('FastJSONRenderer', size, options['repeat'],
+                         lambda: FastJSONRenderer().render(fast_data))
+
+            # Ambas rutas deben producir exactamente el mismo JSON
+            same = json.loads(JSONRenderer().render(drf_data)) == json.loads(FastJSONRenderer().render(fast_data))
+            self.stdout.write(f'  salida idéntica: {"sí" if same else "NO"}')
+
+    def _report(self, label, size, repeat, func):
+        best = min(self._time(func) for _ in range(repeat))
+        self.stdout.write(f'  {label:<22} {best * 1000:9.1f} ms  {best / size * 1e6:7.2f} µs/fila')
+
+    @staticmethod
+    def _time(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _synthetic_rows(size):
+        rng = random.Random(size)
+        rows = []
+        for i in range(1, size + 1):
+            d = rng.randrange(100, 1200, 50)
+            bf = rng.randrange(100, 600, 25)
+            peso = round(rng.uniform(5, 600), 1)
+            rows.append({
+                'id': i,
+                'name': f'H {d}x{bf} {peso}',
+                'category': rng.choice(('H', 'HR', 'T', 'PH')),
+                'attributes': {
+                    'ALTURA_d': d,
+                    'ANCHURA_bf': bf,
+                    'DIMENSION_tf': rng.randrange(6, 40),
+                    'DIMENSION_tw': rng.randrange(4, 25),
+                    'PESO_KG_M': peso,
+                },
+            })
+        return rows
@@ -1,53 +1,67 @@
-import json
-from django.core.management.base import BaseCommand
 from django.conf import settings
-from profiles_api.models import Profile
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles_api.loader import BATCH_SIZE, sync_profiles
+from profiles_api.readers import FORMATS, ReaderError, read_profiles
+
 
 class Command(BaseCommand):
-    help = 'Carga perfiles estructurales desde un archivo JSON a la base de datos'
+    help = 'Sincroniza los perfiles estructurales de un archivo JSON, NDJSON o CSV con la base de datos'
 
-    def handle(self, *args, **options):
-        # Ruta al archivo JSON de perfiles
-        json_file_path = settings.BASE_DIR / 'perfiles_data.json'
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', default=str(settings.BASE_DIR / 'perfiles_data.json'),
+            help='Archivo de perfiles, opcionalmente .gz (default: perfiles_data.json)',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Formato del archivo (por defecto se deduce de la extensión)',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--keep-missing', action='store_true',
+            help='No borrar los perfiles de la BD que no vienen en el archivo',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Calcula los cambios sin guardarlos',
+        )
 
-        self.stdout.write(self.style.SUCCESS(f'Iniciando carga de datos desde {json_file_path}'))
+    def handle(self, *args, **options):
+        file_path = options['file']
 
-        # Limpiar la tabla de perfiles existente para evitar duplicados
-        Profile.objects.all().delete()
-        self.stdout.write(self.style.WARNING('Se han eliminado los perfiles existentes.'))
+        self.stdout.write(self.style.SUCCESS(f'Iniciando carga de datos desde {file_path}'))
 
+        # El archivo se lee en streaming: sync_profiles consume los perfiles
+        # de a un lote, así que nunca se carga completo en memoria
         try:
-            with open(json_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            self.stdout.write(self.style.ERROR(f'Error: No se encontró el archivo {json_file_path}'))
-            return
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR('Error: El archivo JSON está mal formado.'))
-            return
-
-        profiles_to_create = []
-        # Usar un contador para garantizar la unicidad
-        for i, item in enumerate(data):
-            # Extraer datos comunes y el resto para attributes
-            category = item.pop('PREFIJO', None)
-            peso = item.get('PESO_KG_M', '')
-            altura = item.get('ALTURA_d', '')
-            anchura = item.get('ANCHURA_bf', '')
-
-            # Crear un nombre único garantizado con un contador
-            name = f"{category} {altura}x{anchura} {peso}kg - ID {i + 1}"
-
-            # Crear instancia del modelo sin guardar aún
-            profiles_to_create.append(
-                Profile(
-                    name=name.strip(),
-                    category=category,
-                    attributes=item
-                )
+            result = sync_profiles(
+                read_profiles(file_path, options['format']),
+                batch_size=options['batch_size'],
+                delete_missing=not options['keep_missing'],
+                dry_run=options['dry_run'],
+                progress=self._report_progress if options['verbosity'] >= 1 else None,
             )
+        except FileNotFoundError:
+            raise CommandError(f'No se encontró el archivo {file_path}')
+        except (ReaderError, UnicodeDecodeError) as exc:
+            raise CommandError(f'No se pudo leer {file_path}: {exc}')
+
+        self.stdout.write(
+            f'Creados: {result.created} | Actualizados: {result.updated} | '
+            f'Sin cambios: {result.unchanged} | Eliminados: {result.deleted}'
+        )
+        if result.duplicates:
+            self.stdout.write(self.style.WARNING(
+                f'{result.duplicates} filas repetían un nombre ya visto (se usó la última).'
+            ))
+        if result.skipped:
+            self.stdout.write(self.style.WARNING(f'{result.skipped} filas sin PREFIJO fueron ignoradas.'))
 
-        # Crear todos los objetos en una sola consulta (bulk_create)
-        Profile.objects.bulk_create(profiles_to_create)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no se guardó ningún cambio.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'¡Carga completada en {result.elapsed:.2f} s!'))
 
-        self.stdout.write(self.style.SUCCESS(f'¡Carga completada! Se han añadido {len(profiles_to_create)} perfiles a la base de datos.'))
+    def _report_progress(self, processed):
+        self.stdout.write(f'Procesados {processed} perfiles...')
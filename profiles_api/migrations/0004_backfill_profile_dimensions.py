@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Copia de Profile.MATERIALIZED_ATTRIBUTES: las migraciones usan el modelo
+# histórico y no deben depender del código actual del modelo.
+MATERIALIZED_ATTRIBUTES = {
+    'ALTURA_d': 'altura_d',
+    'ANCHURA_bf': 'anchura_bf',
+    'DIMENSION_tf': 'dimension_tf',
+    'DIMENSION_tw': 'dimension_tw',
+    'PESO_KG_M': 'peso_kg_m',
+    'AREA_mm2': 'area_mm2',
+}
+
+BATCH_SIZE = 1000
+
+
+def _to_float(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def backfill_dimensions(apps, schema_editor):
+    """Rellena las columnas materializadas en lotes con bulk_update."""
+    Profile = apps.get_model('profiles_api', 'Profile')
+    columns = list(MATERIALIZED_ATTRIBUTES.values())
+
+    batch = []
+    for profile in Profile.objects.only('id', 'attributes').iterator(chunk_size=BATCH_SIZE):
+        attributes = profile.attributes or {}
+        for key, column in MATERIALIZED_ATTRIBUTES.items():
+            setattr(profile, column, _to_float(attributes.get(key)))
+        batch.append(profile)
+
+        if len(batch) >= BATCH_SIZE:
+            Profile.objects.bulk_update(batch, columns)
+            batch = []
+
+    if batch:
+        Profile.objects.bulk_update(batch, columns)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0003_profile_materialized_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0004_backfill_profile_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
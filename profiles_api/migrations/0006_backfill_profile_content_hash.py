@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _content_hash(category, attributes):
+    # Copia de models.profile_content_hash: el hash debe calzar exactamente
+    # con el que calcula el modelo, o load_profiles vería todo como cambiado
+    payload = json.dumps(
+        [category, attributes],
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def backfill_content_hash(apps, schema_editor):
+    """Calcula content_hash de los perfiles existentes en lotes con bulk_update."""
+    Profile = apps.get_model('profiles_api', 'Profile')
+
+    batch = []
+    for profile in Profile.objects.only('id', 'category', 'attributes').iterator(chunk_size=BATCH_SIZE):
+        profile.content_hash = _content_hash(profile.category, profile.attributes or {})
+        batch.append(profile)
+
+        if len(batch) >= BATCH_SIZE:
+            Profile.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+
+    if batch:
+        Profile.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0005_profile_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
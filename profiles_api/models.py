@@ -1,4 +1,11 @@
+import hashlib
+import json
+import uuid
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
 
 class Profile(models.Model):
     """
@@ -9,13 +16,135 @@ class Profile(models.Model):
     - 'attributes' es un campo JSON para almacenar propiedades flexibles
       (ej. {"ALTURA_d": 1100, "PESO_KG_M": 596.6, ...}).
     """
+    # Claves de 'attributes' que se copian a columnas numéricas indexables.
+    # Filtrar por attributes__CLAVE obliga a extraer el JSON de cada fila
+    # (full scan); las columnas permiten usar el índice compuesto de Meta.
+    MATERIALIZED_ATTRIBUTES = {
+        'ALTURA_d': 'altura_d',
+        'ANCHURA_bf': 'anchura_bf',
+        'DIMENSION_tf': 'dimension_tf',
+        'DIMENSION_tw': 'dimension_tw',
+        'PESO_KG_M': 'peso_kg_m',
+        'AREA_mm2': 'area_mm2',
+    }
+
     name = models.CharField(max_length=255, unique=True)
     category = models.CharField(max_length=50, db_index=True)
     attributes = models.JSONField()
 
+    # === Columnas materializadas desde 'attributes' ===
+    # editable=False: nunca se escriben a mano, se derivan en save()
+    altura_d = models.FloatField(null=True, blank=True, editable=False)
+    anchura_bf = models.FloatField(null=True, blank=True, editable=False)
+    dimension_tf = models.FloatField(null=True, blank=True, editable=False)
+    dimension_tw = models.FloatField(null=True, blank=True, editable=False)
+    peso_kg_m = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    area_mm2 = models.FloatField(null=True, blank=True, editable=False)
+
+    # Huella de (category, attributes): permite a load_profiles comparar el
+    # archivo con la BD sin leer el JSON de cada fila
+    content_hash = models.CharField(max_length=40, blank=True, default='', editable=False)
+
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name = "Perfil"
-        verbose_name_plural = "Perfiles"
\ No newline at end of file
+        verbose_name_plural = "Perfiles"
+        indexes = [
+            # Cubre find-unique y la cascada Tipo -> Altura -> Ancho -> Espesores
+            models.Index(
+                fields=['category', 'altura_d', 'anchura_bf', 'dimension_tf', 'dimension_tw'],
+                name='profile_dimensions_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Sincroniza las columnas materializadas antes de guardar."""
+        self.sync_materialized_fields()
+        super().save(*args, **kwargs)
+
+    def sync_materialized_fields(self):
+        """
+        Copia los atributos dimensionales del JSON a sus columnas tipadas
+        y recalcula content_hash.
+
+        Se llama desde save(), pero bulk_create/bulk_update no pasan por
+        save(): los comandos de carga masiva deben llamarlo explícitamente.
+        """
+        attributes = self.attributes or {}
+        for key, column in self.MATERIALIZED_ATTRIBUTES.items():
+            setattr(self, column, to_float(attributes.get(key)))
+        self.content_hash = profile_content_hash(self.category, attributes)
+
+
+def profile_content_hash(category, attributes):
+    """SHA-1 estable de la categoría y los atributos (claves ordenadas)."""
+    payload = json.dumps(
+        [category, attributes],
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def to_float(value):
+    """Convierte un valor del JSON a float, o None si no es numérico."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CatalogVersion(models.Model):
+    """
+    Sello de versión del catálogo de perfiles (fila única, pk=1).
+
+    Cada vez que cambia la tabla Profile (carga masiva, admin o API) se
+    incrementa 'version' y se genera un 'stamp' nuevo. Los workers comparan
+    este sello con el de su índice en memoria para saber si deben
+    reconstruirlo (ver profiles_api/catalog.py).
+
+    El 'stamp' aleatorio evita confundir dos catálogos distintos que por un
+    rollback terminaron con el mismo número de versión.
+    """
+    SINGLETON_PK = 1
+
+    version = models.PositiveBigIntegerField(default=0)
+    stamp = models.CharField(max_length=32, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versión del Catálogo"
+        verbose_name_plural = "Versión del Catálogo"
+
+    def __str__(self):
+        return f"Catálogo v{self.version}"
+
+    @classmethod
+    def current(cls):
+        """Retorna la fila singleton, creándola si aún no existe."""
+        obj, _ = cls.objects.get_or_create(
+            pk=cls.SINGLETON_PK,
+            defaults={'stamp': uuid.uuid4().hex},
+        )
+        return obj
+
+    @classmethod
+    def bump(cls):
+        """
+        Marca el catálogo como modificado.
+
+        Usamos update() con F() para que el incremento sea atómico en la BD
+        aunque varios procesos escriban al mismo tiempo.
+        """
+        updated = cls.objects.filter(pk=cls.SINGLETON_PK).update(
+            version=F('version') + 1,
+            stamp=uuid.uuid4().hex,
+            updated_at=timezone.now(),  # update() no dispara auto_now
+        )
+        if not updated:
+            cls.objects.create(pk=cls.SINGLETON_PK, version=1, stamp=uuid.uuid4().hex)
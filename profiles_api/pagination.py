@@ -0,0 +1,30 @@
+"""
+Paginación por cursor para el listado de perfiles.
+
+Es opcional: GET /api/profiles/ sin parámetros sigue devolviendo la lista
+completa (la usa perfiles_icha.html). Basta con pedir ?page_size=N para
+recibir páginas {"next", "previous", "results"}; los links 'next' ya
+incluyen el cursor y el page_size.
+
+Usamos cursor (id > último visto) en vez de offset porque con catálogos de
+varios proveedores un OFFSET alto obliga a la BD a recorrer todas las filas
+anteriores en cada página.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class ProfileCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = None  # Sin page_size en la URL no se pagina
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    # Tamaño usado si llega un ?cursor= sin ?page_size=
+    default_cursor_page_size = 100
+
+    def get_page_size(self, request):
+        page_size = super().get_page_size(request)
+        if page_size is None and self.cursor_query_param in request.query_params:
+            return self.default_cursor_page_size
+        return page_size
@@ -0,0 +1,217 @@
+"""
+Lectores en streaming para archivos de perfiles (JSON, NDJSON y CSV).
+También los usa la importación de cotizaciones (cotizador_app.importer).
+
+json.load necesita el archivo completo en memoria (y el objeto Python
+resultante ocupa varias veces más). Estos lectores entregan un perfil a la
+vez, leyendo el archivo en bloques de READ_SIZE, así que la memoria usada
+no depende del tamaño del archivo.
+
+Formatos:
+
+- JSON:   una lista de objetos ([{...}, {...}]), como perfiles_data.json
+- NDJSON: un objeto por línea (.ndjson / .jsonl)
+- CSV:    una fila por perfil con encabezados (PREFIJO, ALTURA_d, ...)
+
+Cualquiera de ellos puede venir comprimido con gzip (.json.gz, .csv.gz...).
+"""
+
+import csv
+import gzip
+import json
+import re
+from pathlib import Path
+
+READ_SIZE = 64 * 1024
+
+# Tamaño máximo de un elemento del arreglo: evita que un archivo corrupto
+# (ej. un string sin cerrar) termine cargándose completo en el buffer
+MAX_ELEMENT_SIZE = 16 * 1024 * 1024
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+_EXTENSIONS = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+
+_WHITESPACE = ' \t\n\r'
+_INT_RE = re.compile(r'-?\d+')
+
+
+class ReaderError(ValueError):
+    """El archivo no tiene el formato esperado."""
+
+
+def detect_format(path):
+    """Deduce el formato por la extensión (ignorando un .gz final)."""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    if suffixes and suffixes[-1] == '.gz':
+        suffixes.pop()
+    if suffixes and suffixes[-1] in _EXTENSIONS:
+        return _EXTENSIONS[suffixes[-1]]
+    raise ReaderError(f'No se pudo deducir el formato de {path}; use uno de: {", ".join(FORMATS)}')
+
+
+def read_profiles(path, format=None):
+    """
+    Itera los perfiles de 'path' sin cargar el archivo completo.
+
+    Es un generador: el archivo se abre al pedir el primer perfil y se
+    cierra al terminar de recorrerlo.
+    """
+    return read_records(path, format)
+
+
+def read_records(path, format=None):
+    """Itera los objetos (o filas CSV) de 'path', en cualquiera de los FORMATS."""
+    format = format or detect_format(path)
+    if format not in FORMATS:
+        raise ReaderError(f'Formato no soportado: {format}')
+
+    opener = gzip.open if str(path).lower().endswith('.gz') else open
+    # utf-8-sig: los CSV exportados desde Excel suelen traer BOM
+    with opener(path, 'rt', encoding='utf-8-sig', newline='') as stream:
+        yield from iter_records(stream, format)
+
+
+def iter_records(stream, format):
+    """Itera los objetos de un stream de texto ya abierto."""
+    if format == 'json':
+        return iter_json_array(stream)
+    if format == 'ndjson':
+        return iter_ndjson(stream)
+    if format == 'csv':
+        return iter_csv(stream)
+    raise ReaderError(f'Formato no soportado: {format}')
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Parser incremental de un arreglo JSON: entrega cada elemento apenas se
+    completa, usando JSONDecoder.raw_decode sobre un buffer que se va
+    rellenando y recortando.
+    """
+    decoder = json.JSONDecoder()
+    reader = _BufferedText(stream, read_size)
+
+    if reader.next_char() != '[':
+        raise ReaderError('Se esperaba un arreglo JSON ("[" al inicio del archivo)')
+    reader.pos += 1
+
+    if reader.next_char() == ']':
+        reader.pos += 1
+        reader.expect_end()
+        return
+
+    while True:
+        yield reader.decode(decoder)
+
+        separator = reader.next_char()
+        reader.pos += 1
+        if separator == ']':
+            reader.expect_end()
+            return
+        if separator != ',':
+            raise ReaderError(f'Se esperaba "," o "]" en la posición {reader.offset - 1}')
+
+
+class _BufferedText:
+    """Buffer de texto sobre un stream, con la posición actual de lectura."""
+
+    def __init__(self, stream, read_size):
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.consumed = 0  # caracteres descartados del inicio del buffer
+        self.eof = False
+
+    @property
+    def offset(self):
+        return self.consumed + self.pos
+
+    def fill(self):
+        """Descarta lo ya procesado y lee un bloque más. Retorna False en EOF."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def next_char(self):
+        """Salta espacios y retorna el próximo carácter ('' al final del archivo)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def decode(self, decoder):
+        """Decodifica el próximo valor JSON, leyendo más bloques si está incompleto."""
+        self.next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as exc:
+                if len(self.buffer) - self.pos <= MAX_ELEMENT_SIZE and self.fill():
+                    continue
+                raise ReaderError(f'JSON mal formado cerca de la posición {self.consumed + exc.pos}') from exc
+
+            # Un número al final del buffer podría seguir en el próximo bloque
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def expect_end(self):
+        if self.next_char():
+            raise ReaderError(f'Contenido inesperado después del arreglo en la posición {self.offset}')
+
+
+def iter_ndjson(stream):
+    """Un objeto JSON por línea; las líneas vacías se ignoran."""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ReaderError(f'JSON mal formado en la línea {line_number}: {exc.msg}') from exc
+
+
+def iter_csv(stream):
+    """
+    Una fila por perfil. Las celdas vacías se omiten y los números se
+    convierten a int/float para que el perfil quede igual que si viniera
+    del JSON (y su content_hash coincida).
+    """
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        return
+    for row in reader:
+        yield {
+            key.strip(): _parse_cell(value)
+            for key, value in row.items()
+            if key and value not in (None, '')
+        }
+
+
+def _parse_cell(value):
+    value = value.strip()
+    if _INT_RE.fullmatch(value):
+        return int(value)
+    try:
+        return float(value)
+    except ValueError:
+        return value
@@ -0,0 +1,67 @@
+"""
+Renderers adicionales para la API de perfiles.
+"""
+
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él usamos el JSONRenderer de DRF
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer que usa orjson cuando está instalado.
+
+    orjson serializa las respuestas del catálogo varias veces más rápido que
+    json.dumps. Se mantiene el comportamiento de DRF en los casos que orjson
+    no cubre igual (indentación distinta de 2, tipos no soportados como
+    Decimal): ahí se delega al JSONRenderer original.
+    """
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        options = self.ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            ret = orjson.dumps(data, option=options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: escapamos U+2028/U+2029 para que sea JavaScript válido
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    JSON delimitado por saltos de línea (un objeto por línea).
+
+    Se selecciona con ?format=ndjson o Accept: application/x-ndjson.
+    El listado de perfiles no pasa por aquí: lo transmite directamente con
+    StreamingHttpResponse (ver ProfileViewSet.list). Este renderer cubre el
+    resto de las respuestas (detalle, errores) para que el formato sea
+    consistente en toda la API.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        items = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_line(item) for item in items).encode(self.charset)
+
+
+def ndjson_line(item):
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n'
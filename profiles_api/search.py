@@ -0,0 +1,201 @@
+"""
+Índice de búsqueda para el autocompletado de perfiles.
+
+name__icontains hace un LIKE '%term%' que recorre toda la tabla y devuelve
+resultados en orden arbitrario. Este índice vive dentro del catálogo en
+memoria (catalog.py) y combina tres estructuras:
+
+- Lista ordenada de nombres: prefijo exacto del nombre con bisect
+- Prefijos de tokens: "H 1100" encuentra perfiles con categoría H y d=1100
+- Trigramas del nombre: subcadenas arbitrarias, verificadas con 'in'
+
+Los resultados se ordenan por relevancia: primero los nombres que empiezan
+con el término, luego los que calzan todos los tokens y al final las
+coincidencias por subcadena.
+"""
+
+import bisect
+import heapq
+import re
+
+_TOKEN_RE = re.compile(r'[a-z0-9.]+')
+_EMPTY = frozenset()
+
+# Atributos que se indexan como tokens además del nombre
+TOKEN_ATTRIBUTES = ('ALTURA_d', 'ANCHURA_bf', 'DIMENSION_tf', 'DIMENSION_tw', 'PESO_KG_M')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _format_number(value):
+    """1100.0 -> '1100', para que calce con lo que escribe el usuario."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProfileSearchIndex:
+    """
+    Índice de búsqueda que se puede actualizar de forma incremental.
+
+    Las listas de postings son frozensets: copy() solo duplica los dicts
+    (copia superficial) y cada add/remove reemplaza los sets afectados, así
+    que una copia nunca modifica al índice original que otros threads
+    pueden estar leyendo.
+    """
+
+    def __init__(self, rows=()):
+        self._names = {}         # id -> nombre en minúsculas
+        self._sorted_names = []  # [(nombre en minúsculas, id)] para bisect
+        self._prefixes = {}      # prefijo de token -> frozenset(ids)
+        self._trigrams = {}      # trigrama -> frozenset(ids)
+        self._keys = {}          # id -> (prefijos, trigramas) para poder borrar
+
+        self._bulk_load(rows)
+
+    def _bulk_load(self, rows):
+        """Construcción inicial con sets mutables, congelados al final."""
+        prefixes_index = {}
+        trigrams_index = {}
+
+        for row in rows:
+            profile_id = row['id']
+            name, prefixes, trigrams = _index_keys(row)
+            self._names[profile_id] = name
+            self._keys[profile_id] = (prefixes, trigrams)
+            for key in prefixes:
+                prefixes_index.setdefault(key, set()).add(profile_id)
+            for key in trigrams:
+                trigrams_index.setdefault(key, set()).add(profile_id)
+
+        self._sorted_names = sorted((name, pid) for pid, name in self._names.items())
+        self._prefixes = {key: frozenset(ids) for key, ids in prefixes_index.items()}
+        self._trigrams = {key: frozenset(ids) for key, ids in trigrams_index.items()}
+
+    def copy(self):
+        clone = ProfileSearchIndex()
+        clone._names = dict(self._names)
+        clone._sorted_names = list(self._sorted_names)
+        clone._prefixes = dict(self._prefixes)
+        clone._trigrams = dict(self._trigrams)
+        clone._keys = dict(self._keys)
+        return clone
+
+    def __len__(self):
+        return len(self._names)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def add(self, row):
+        profile_id = row['id']
+        if profile_id in self._names:
+            self.remove(profile_id)
+
+        name, prefixes, trigrams = _index_keys(row)
+        self._names[profile_id] = name
+        bisect.insort(self._sorted_names, (name, profile_id))
+        self._keys[profile_id] = (prefixes, trigrams)
+        _add_postings(self._prefixes, prefixes, profile_id)
+        _add_postings(self._trigrams, trigrams, profile_id)
+
+    def remove(self, profile_id):
+        name = self._names.pop(profile_id, None)
+        if name is None:
+            return
+
+        position = bisect.bisect_left(self._sorted_names, (name, profile_id))
+        del self._sorted_names[position]
+
+        prefixes, trigrams = self._keys.pop(profile_id)
+        _remove_postings(self._prefixes, prefixes, profile_id)
+        _remove_postings(self._trigrams, trigrams, profile_id)
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def search(self, term, limit=15):
+        """
+        Retorna hasta 'limit' ids ordenados por relevancia (y por id dentro
+        de cada rango).
+        """
+        needle = term.lower().strip()
+        if not needle:
+            return []
+
+        results = []
+        seen = set()
+
+        def collect(ids):
+            pending = (i for i in ids if i not in seen)
+            for profile_id in heapq.nsmallest(limit - len(results), pending):
+                seen.add(profile_id)
+                results.append(profile_id)
+            return len(results) >= limit
+
+        if collect(self._name_prefix_ids(needle)):
+            return results
+        if collect(self._token_ids(needle)):
+            return results
+        collect(self._substring_ids(needle))
+        return results
+
+    def _name_prefix_ids(self, needle):
+        # Todos los nombres que empiezan con 'needle' quedan contiguos en la
+        # lista ordenada, entre (needle,) y (needle + '\uffff',)
+        start = bisect.bisect_left(self._sorted_names, (needle,))
+        end = bisect.bisect_left(self._sorted_names, (needle + '\uffff',), start)
+        return [profile_id for _, profile_id in self._sorted_names[start:end]]
+
+    def _token_ids(self, needle):
+        tokens = tokenize(needle)
+        if not tokens:
+            return _EMPTY
+        postings = sorted((self._prefixes.get(token, _EMPTY) for token in tokens), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def _substring_ids(self, needle):
+        if len(needle) < 3:
+            # Sin trigramas posibles: recorremos los nombres (términos muy cortos)
+            return [pid for pid, name in self._names.items() if needle in name]
+
+        postings = sorted((self._trigrams.get(t, _EMPTY) for t in _trigrams(needle)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return [pid for pid in candidates if needle in self._names[pid]]
+
+
+def _index_keys(row):
+    """Retorna (nombre normalizado, prefijos de tokens, trigramas) de una fila."""
+    name = row['name'].lower()
+    tokens = set(tokenize(name))
+    tokens.update(tokenize(row.get('category') or ''))
+    attributes = row.get('attributes') or {}
+    for key in TOKEN_ATTRIBUTES:
+        value = attributes.get(key)
+        if value is not None:
+            tokens.add(_format_number(value))
+
+    prefixes = {token[:i] for token in tokens for i in range(1, len(token) + 1)}
+    return name, prefixes, _trigrams(name)
+
+
+def _add_postings(index, keys, profile_id):
+    for key in keys:
+        index[key] = index.get(key, _EMPTY) | {profile_id}
+
+
+def _remove_postings(index, keys, profile_id):
+    for key in keys:
+        remaining = index[key] - {profile_id}
+        if remaining:
+            index[key] = remaining
+        else:
+            del index[key]
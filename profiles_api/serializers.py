@@ -11,3 +11,26 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ['id', 'name', 'category', 'attributes']  # ✅ FIX MEDIO-007: Explícito en lugar de '__all__'
+
+
+class ProfileRowSerializer:
+    """
+    Serializer liviano de solo lectura para respuestas de perfiles.
+
+    ProfileSerializer pasa cada fila por la maquinaria de campos de DRF
+    (to_representation de cada Field, OrderedDict, etc.). Para lecturas la
+    forma es fija ({id, name, category, attributes}), así que basta con
+    armar dicts directamente desde filas de .values() o del catálogo en
+    memoria. Las escrituras siguen usando ProfileSerializer.
+    """
+    FIELDS = ('id', 'name', 'category', 'attributes')
+
+    def __init__(self, fields=None):
+        self.fields = tuple(fields) if fields else self.FIELDS
+
+    def to_representation(self, row):
+        return {field: row[field] for field in self.fields}
+
+    def serialize(self, rows):
+        fields = self.fields
+        return [{field: row[field] for field in fields} for row in rows]
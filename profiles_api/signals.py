@@ -0,0 +1,47 @@
+"""
+Señales que mantienen sincronizado el sello de versión del catálogo.
+
+Cualquier escritura individual sobre Profile (admin, API, shell) incrementa
+CatalogVersion para que los índices en memoria se reconstruyan. Las cargas
+masivas (bulk_create) no disparan señales: esos comandos llaman a
+CatalogVersion.bump() explícitamente, y usan suspend_catalog_signals() cuando una operación en
+lote (ej. QuerySet.delete) enviaría una señal por fila.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog
+from .models import CatalogVersion, Profile
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def bump_catalog_version(sender, **kwargs):
+    if getattr(_state, 'suspended', False):
+        return
+    CatalogVersion.bump()
+    catalog.invalidate()
+
+
+_state = threading.local()
+
+
+@contextmanager
+def suspend_catalog_signals():
+    """
+    Desactiva el bump por fila dentro del bloque.
+
+    QuerySet.delete() envía post_delete por cada perfil borrado; sin esto
+    una carga que elimina 5.000 perfiles haría 5.000 UPDATE al sello. Quien
+    lo use debe llamar a CatalogVersion.bump() una vez al terminar.
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
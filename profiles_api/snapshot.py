@@ -0,0 +1,141 @@
+"""
+Snapshot columnar y precomprimido del catálogo de perfiles.
+
+En vez de un objeto por perfil con las mismas claves repetidas 1.200 veces,
+el snapshot guarda una columna por atributo:
+
+{
+    "version": 12,
+    "count": 3,
+    "ids": [1, 2, 3],
+    "names": ["H 1100x600 596.6", ...],
+    "categories": ["H", "T"],           <- diccionario de categorías
+    "category": [0, 0, 1],              <- índice en 'categories' por perfil
+    "attributes": {"ALTURA_d": [1100, 1100, 400], ...}
+}
+
+Con esto el navegador puede filtrar la cascada de dropdowns localmente.
+El JSON se comprime una sola vez por versión del catálogo (gzip y, si está
+instalado, brotli) y se guarda en disco en CACHE_ROOT/profiles.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo servimos gzip
+    brotli = None
+
+# Codificaciones soportadas, en orden de preferencia
+ENCODINGS = ('br', 'gzip', 'identity') if brotli else ('gzip', 'identity')
+
+_SUFFIXES = {'br': '.json.br', 'gzip': '.json.gz', 'identity': '.json'}
+
+
+def build_snapshot(catalog):
+    """Construye el payload columnar a partir de un ProfileCatalog."""
+    rows = catalog.rows
+    categories = list(catalog.categories)
+    category_index = {category: i for i, category in enumerate(categories)}
+
+    attribute_keys = sorted({key for row in rows for key in row['attributes']})
+
+    return {
+        'version': catalog.version,
+        'count': len(rows),
+        'ids': [row['id'] for row in rows],
+        'names': [row['name'] for row in rows],
+        'categories': categories,
+        'category': [category_index[row['category']] for row in rows],
+        'attributes': {
+            key: [row['attributes'].get(key) for row in rows]
+            for key in attribute_keys
+        },
+    }
+
+
+def snapshot_dir():
+    return Path(settings.CACHE_ROOT) / 'profiles'
+
+
+def negotiate_encoding(accept_encoding):
+    """Elige la mejor codificación que acepta el cliente."""
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.lower().split(',')}
+    for encoding in ENCODINGS:
+        if encoding == 'identity' or encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def open_snapshot(catalog, encoding):
+    """
+    Abre (en modo binario) el snapshot de la versión del catálogo,
+    generándolo en todas sus codificaciones si todavía no existe en disco.
+    """
+    directory = snapshot_dir()
+    base = f"catalog-{catalog.version}-{catalog.stamp[:12]}"
+    path = directory / f"{base}{_SUFFIXES[encoding]}"
+
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        # No existe aún, o un worker con una versión más nueva lo acaba de borrar
+        _write_snapshot(catalog, directory, base)
+        return open(path, 'rb')
+
+
+def _write_snapshot(catalog, directory, base):
+    directory.mkdir(parents=True, exist_ok=True)
+
+    payload = json.dumps(
+        build_snapshot(catalog),
+        separators=(',', ':'),
+        ensure_ascii=False,
+    ).encode('utf-8')
+
+    contents = {
+        'identity': payload,
+        'gzip': gzip.compress(payload, compresslevel=9, mtime=0),
+    }
+    if brotli:
+        contents['br'] = brotli.compress(payload, quality=11)
+
+    for encoding, data in contents.items():
+        _atomic_write(directory / f"{base}{_SUFFIXES[encoding]}", data)
+
+    _remove_stale_snapshots(directory, catalog.version)
+
+
+def _atomic_write(path, data):
+    """Escribe en un archivo temporal y lo renombra: otro worker nunca lee un archivo a medias."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _remove_stale_snapshots(directory, current_version):
+    """
+    Borra los snapshots de versiones anteriores. Nunca toca versiones más
+    nuevas: un worker atrasado no debe borrar lo que generó otro más al día.
+    """
+    for path in directory.glob('catalog-*'):
+        try:
+            version = int(path.name.split('-')[1])
+        except (IndexError, ValueError):
+            continue
+        if version < current_version:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass  # otro worker lo borró primero
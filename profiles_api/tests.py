@@ -1,3 +1,509 @@
-from django.test import TestCase
+"""
+Tests para la API de perfiles estructurales.
 
-# Create your tests here.
+Verifican que los endpoints del cotizador se respondan desde el índice en
+memoria del catálogo y que éste se invalide cuando cambian los perfiles.
+"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from profiles_api import catalog
+from profiles_api.loader import sync_profiles
+from profiles_api.models import CatalogVersion, Profile
+from profiles_api.readers import ReaderError, iter_csv, iter_json_array, iter_ndjson
+from profiles_api.search import ProfileSearchIndex
+from profiles_api.serializers import ProfileSerializer
+
+
+def crear_perfil(category, d, bf, tf, tw, peso):
+    """Helper para crear perfiles con la misma forma que perfiles_data.json."""
+    return Profile.objects.create(
+        name=f"{category} {d}x{bf} {peso}",
+        category=category,
+        attributes={
+            'ALTURA_d': d,
+            'ANCHURA_bf': bf,
+            'DIMENSION_tf': tf,
+            'DIMENSION_tw': tw,
+            'PESO_KG_M': peso,
+        },
+    )
+
+
+class TestCatalogoEnMemoria(TestCase):
+    """Tests para los endpoints servidos desde catalog.py."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+        self.h1 = crear_perfil('H', 1100, 600, 50, 16, 596.6)
+        self.h2 = crear_perfil('H', 1100, 600, 40, 16, 504.9)
+        self.h3 = crear_perfil('H', 1000, 350, 32, 12, 179.1)
+        self.t1 = crear_perfil('T', 400, 500, 50, 25, 264.9)
+
+    def test_find_unique_por_dimensiones(self):
+        """find-unique retorna el perfil exacto con la forma del serializer."""
+        response = self.client.get('/api/profiles/find-unique/', {
+            'category': 'H',
+            'attributes__ALTURA_d': '1100',
+            'attributes__ANCHURA_bf': '600.0',
+            'attributes__DIMENSION_tf': '40',
+            'attributes__DIMENSION_tw': '16',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.h2.id)
+        self.assertEqual(set(response.json()), {'id', 'name', 'category', 'attributes'})
+
+    def test_get_options_en_cascada(self):
+        """get-options respeta los filtros y retorna valores ordenados."""
+        categorias = self.client.get('/api/profiles/get-options/', {'field': 'category'})
+        alturas = self.client.get('/api/profiles/get-options/', {
+            'field': 'attributes__ALTURA_d', 'category': 'H',
+        })
+        anchos = self.client.get('/api/profiles/get-options/', {
+            'field': 'attributes__ANCHURA_bf', 'category': 'H', 'attributes__ALTURA_d': '1000',
+        })
+
+        self.assertEqual(categorias.json(), ['H', 'T'])
+        self.assertEqual(alturas.json(), [1000, 1100])
+        self.assertEqual(anchos.json(), [350])
+
+    def test_get_options_campo_invalido(self):
+        """Un campo que no existe retorna 400 en vez de un error del ORM."""
+        response = self.client.get('/api/profiles/get-options/', {'field': 'precio'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_options_no_cachea_filtros_arbitrarios(self):
+        """Los filtros de la query string no agregan entradas al caché del catálogo."""
+        snapshot = catalog.get_catalog()
+        antes = len(snapshot._options_cache)
+        for categoria in ('X1', 'X2', 'X3'):
+            response = self.client.get('/api/profiles/get-options/', {'field': 'name', 'category': categoria})
+            self.assertEqual(response.json(), [])
+
+        self.assertIs(catalog.get_catalog(), snapshot)
+        self.assertEqual(len(snapshot._options_cache), antes)
+
+    def test_thickness_combinations_ordenadas(self):
+        """Las combinaciones vienen con el ala más gruesa primero."""
+        response = self.client.get('/api/profiles/get-thickness-combinations/', {
+            'category': 'H', 'height': '1100', 'width': '600',
+        })
+        self.assertEqual(response.json(), [{'tf': 50, 'tw': 16}, {'tf': 40, 'tw': 16}])
+
+    def test_consultas_sin_sql_tras_construir_indice(self):
+        """Una vez construido el índice, las consultas no tocan la BD."""
+        self.client.get('/api/profiles/search/', {'term': 'h'})
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/profiles/search/', {'term': '1100'})
+            self.client.get('/api/profiles/get-options/', {'field': 'category'})
+
+    def test_resolve_en_lote(self):
+        """resolve() resuelve por id, nombre y dimensiones en una sola llamada."""
+        response = self.client.post('/api/profiles/resolve/', {'lookups': [
+            {'id': self.h1.id},
+            {'name': self.t1.name},
+            {'category': 'H', 'attributes__ALTURA_d': 1000, 'attributes__ANCHURA_bf': '350',
+             'attributes__DIMENSION_tf': 32, 'attributes__DIMENSION_tw': 12},
+            {'id': 999999},
+            {'foo': 'bar'},
+        ]}, format='json')
+
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['profile']['id'] for item in data['results'][:3]],
+            [self.h1.id, self.t1.id, self.h3.id]
+        )
+        self.assertTrue(data['results'][3]['not_found'])
+        self.assertIn('error', data['results'][4])
+        self.assertEqual((data['found'], data['missing']), (3, 2))
+
+    def test_resolve_requiere_lista(self):
+        """'lookups' debe ser una lista de búsquedas."""
+        response = self.client.post('/api/profiles/resolve/', {'lookups': 'H'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_escritura_invalida_el_indice(self):
+        """Crear o borrar un perfil se refleja en la siguiente consulta."""
+        self.client.get('/api/profiles/search/', {'term': 'h'})
+
+        nuevo = crear_perfil('PH', 200, 200, 10, 8, 50.2)
+        response = self.client.get('/api/profiles/get-options/', {'field': 'category'})
+        self.assertEqual(response.json(), ['H', 'PH', 'T'])
+
+        nuevo.delete()
+        response = self.client.get('/api/profiles/get-options/', {'field': 'category'})
+        self.assertEqual(response.json(), ['H', 'T'])
+
+
+class TestColumnasMaterializadas(TestCase):
+    """Tests para las columnas dimensionales derivadas de 'attributes'."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+
+    def test_save_sincroniza_columnas(self):
+        """save() copia los atributos del JSON a columnas tipadas."""
+        perfil = crear_perfil('H', 1100, 600, 50, 16, 596.6)
+        perfil.refresh_from_db()
+
+        self.assertEqual(perfil.altura_d, 1100.0)
+        self.assertEqual(perfil.peso_kg_m, 596.6)
+        self.assertIsNone(perfil.area_mm2)
+
+        perfil.attributes['ALTURA_d'] = 1000
+        perfil.save()
+        perfil.refresh_from_db()
+        self.assertEqual(perfil.altura_d, 1000.0)
+
+    def test_filtros_usan_columnas(self):
+        """Los atributos dimensionales se traducen a columnas materializadas."""
+        from profiles_api.views import ProfileViewSet
+
+        filters = ProfileViewSet()._build_filters_from_params({
+            'category': 'H',
+            'attributes__ALTURA_d': '1100',
+            'attributes__DISTANCIA_h': '1000',
+            'format': 'json',
+        })
+
+        self.assertEqual(filters, {
+            'category': 'H',
+            'altura_d': 1100.0,
+            'attributes__DISTANCIA_h': '1000',
+        })
+
+    def test_listado_filtrado(self):
+        """GET /api/profiles/ acepta los mismos filtros que get-options."""
+        esperado = crear_perfil('H', 1100, 600, 50, 16, 596.6)
+        crear_perfil('H', 1000, 350, 32, 12, 179.1)
+
+        response = self.client.get('/api/profiles/', {'attributes__ALTURA_d': '1100'})
+
+        self.assertEqual([p['id'] for p in response.json()], [esperado.id])
+
+
+class TestIndiceBusqueda(TestCase):
+    """Tests para el índice de autocompletado (search.py)."""
+
+    def setUp(self):
+        self.rows = [
+            {'id': 1, 'name': 'T 400x500 264.9', 'category': 'T',
+             'attributes': {'ALTURA_d': 400, 'ANCHURA_bf': 500, 'PESO_KG_M': 264.9}},
+            {'id': 2, 'name': 'Viga especial', 'category': 'H',
+             'attributes': {'ALTURA_d': 1100, 'ANCHURA_bf': 600, 'PESO_KG_M': 596.6}},
+            {'id': 3, 'name': 'H 1100x600 565.2', 'category': 'H',
+             'attributes': {'ALTURA_d': 1100, 'ANCHURA_bf': 600, 'PESO_KG_M': 565.2}},
+        ]
+        self.index = ProfileSearchIndex(self.rows)
+
+    def test_prefijo_del_nombre_primero(self):
+        """El nombre que empieza con el término va antes que los tokens."""
+        self.assertEqual(self.index.search('H 1100'), [3, 2])
+
+    def test_tokens_calzan_con_dimensiones(self):
+        """'h 600' encuentra perfiles por categoría y ancho aunque el nombre no lo diga."""
+        self.assertEqual(self.index.search('h 600'), [2, 3])
+
+    def test_subcadena_con_trigramas(self):
+        """Subcadenas en medio del nombre se encuentran por trigramas."""
+        self.assertEqual(self.index.search('special'), [2])
+        self.assertEqual(self.index.search('x50'), [1])
+
+    def test_actualizacion_incremental(self):
+        """add/remove sobre una copia no alteran el índice original."""
+        copia = self.index.copy()
+        copia.remove(1)
+        copia.add({'id': 4, 'name': 'PH 200x200 50.2', 'category': 'PH', 'attributes': {}})
+
+        self.assertEqual(copia.search('ph'), [4])
+        self.assertEqual(copia.search('x50'), [])
+        self.assertEqual(self.index.search('ph'), [])
+        self.assertEqual(self.index.search('x50'), [1])
+
+
+class TestCacheHTTP(TestCase):
+    """Tests para ETag / Last-Modified / Cache-Control de las lecturas."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+        crear_perfil('H', 1100, 600, 50, 16, 596.6)
+
+    def test_if_none_match_retorna_304(self):
+        """Con el ETag vigente, la segunda lectura es un 304 sin cuerpo."""
+        first = self.client.get('/api/profiles/get-options/', {'field': 'category'})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertEqual(first['Cache-Control'], 'public, no-cache')
+
+        second = self.client.get(
+            '/api/profiles/get-options/', {'field': 'category'},
+            HTTP_IF_NONE_MATCH=first['ETag'],
+        )
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+
+    def test_etag_cambia_con_el_catalogo(self):
+        """Modificar un perfil invalida los ETags entregados antes."""
+        etag = self.client.get('/api/profiles/')['ETag']
+        crear_perfil('T', 400, 500, 50, 25, 264.9)
+
+        response = self.client.get('/api/profiles/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_url_versionada_es_inmutable(self):
+        """?v=<versión vigente> se puede cachear sin revalidar."""
+        version = self.client.get('/api/profiles/catalog-version/').json()['version']
+
+        vigente = self.client.get('/api/profiles/', {'v': version})
+        antigua = self.client.get('/api/profiles/', {'v': version - 1})
+
+        self.assertIn('immutable', vigente['Cache-Control'])
+        self.assertEqual(antigua['Cache-Control'], 'public, no-cache')
+
+
+class TestSnapshotColumnar(TestCase):
+    """Tests para el snapshot columnar precomprimido."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+        self.h1 = crear_perfil('H', 1100, 600, 50, 16, 596.6)
+        self.t1 = crear_perfil('T', 400, 500, 50, 25, 264.9)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        override = override_settings(CACHE_ROOT=cache_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_snapshot_gzip(self):
+        """El snapshot se sirve comprimido y con una columna por atributo."""
+        response = self.client.get('/api/profiles/snapshot/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+
+        self.assertEqual(data['ids'], [self.h1.id, self.t1.id])
+        self.assertEqual(data['categories'], ['H', 'T'])
+        self.assertEqual(data['category'], [0, 1])
+        self.assertEqual(data['attributes']['ALTURA_d'], [1100, 400])
+
+    def test_snapshot_sin_compresion(self):
+        """Sin Accept-Encoding se entrega el JSON plano."""
+        response = self.client.get('/api/profiles/snapshot/', HTTP_ACCEPT_ENCODING='')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 2)
+
+    def test_etag_por_codificacion(self):
+        """Cada codificación del snapshot tiene su propio ETag."""
+        gzip_etag = self.client.get('/api/profiles/snapshot/', HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        plano = self.client.get('/api/profiles/snapshot/', HTTP_ACCEPT_ENCODING='', HTTP_IF_NONE_MATCH=gzip_etag)
+
+        self.assertEqual(plano.status_code, 200)
+        self.assertNotEqual(plano['ETag'], gzip_etag)
+
+
+class TestListadoGrande(TestCase):
+    """Tests para paginación, ?fields= y NDJSON en el listado."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+        self.perfiles = [
+            crear_perfil('H', 1000 + i, 300, 20, 10, 100.0 + i)
+            for i in range(5)
+        ]
+
+    def test_sin_page_size_retorna_lista_completa(self):
+        """Sin parámetros se mantiene la respuesta original (una lista)."""
+        response = self.client.get('/api/profiles/')
+        self.assertEqual(len(response.json()), 5)
+
+    def test_paginacion_por_cursor(self):
+        """Recorrer los links 'next' entrega todos los perfiles una sola vez."""
+        ids = []
+        url = '/api/profiles/?page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(p['id'] for p in data['results'])
+            url = data['next']
+
+        self.assertEqual(ids, [p.id for p in self.perfiles])
+
+    def test_fields_limita_los_campos(self):
+        """?fields= devuelve solo los campos pedidos y rechaza los desconocidos."""
+        response = self.client.get('/api/profiles/', {'fields': 'id,name'})
+        self.assertEqual(set(response.json()[0]), {'id', 'name'})
+
+        invalido = self.client.get('/api/profiles/', {'fields': 'id,precio'})
+        self.assertEqual(invalido.status_code, 400)
+
+    def test_ndjson_streaming(self):
+        """?format=ndjson transmite un perfil por línea."""
+        response = self.client.get('/api/profiles/', {'format': 'ndjson', 'fields': 'id'})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': p.id} for p in self.perfiles])
+
+
+class TestRutaRapidaLectura(TestCase):
+    """Tests para ProfileRowSerializer y FastJSONRenderer."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client = APIClient()
+        self.perfil = crear_perfil('H', 1000, 350, 25, 12, 179.1)
+
+    def test_misma_salida_que_profile_serializer(self):
+        """La ruta rápida produce el mismo JSON que ProfileSerializer."""
+        esperado = ProfileSerializer(Profile.objects.all(), many=True).data
+        response = self.client.get('/api/profiles/')
+        self.assertEqual(response.json(), json.loads(json.dumps(esperado)))
+
+    def test_detalle_desde_catalogo(self):
+        """El detalle se lee del catálogo y responde 404 si el id no existe."""
+        response = self.client.get(f'/api/profiles/{self.perfil.id}/')
+        self.assertEqual(response.json()['name'], self.perfil.name)
+
+        self.assertEqual(self.client.get('/api/profiles/999999/').status_code, 404)
+
+    def test_paginacion_sin_id_en_fields(self):
+        """La paginación funciona aunque ?fields= no incluya el id."""
+        crear_perfil('H', 1100, 350, 25, 12, 190.0)
+        data = self.client.get('/api/profiles/', {'page_size': 1, 'fields': 'name'}).json()
+
+        self.assertEqual(data['results'], [{'name': self.perfil.name}])
+        segunda = self.client.get(data['next']).json()
+        self.assertEqual(len(segunda['results']), 1)
+
+
+class TestCargaIncremental(TestCase):
+    """Tests para la carga idempotente de load_profiles (profiles_api/loader.py)."""
+
+    def setUp(self):
+        catalog.invalidate()
+        self.items = [
+            {'PREFIJO': 'H', 'ALTURA_d': 1000, 'ANCHURA_bf': 350, 'PESO_KG_M': 179.1,
+             'DIMENSION_tf': 25, 'DIMENSION_tw': 12},
+            {'PREFIJO': 'T', 'ALTURA_d': 400, 'ANCHURA_bf': 200, 'PESO_KG_M': 40.5,
+             'DIMENSION_tf': 10, 'DIMENSION_tw': 8},
+        ]
+
+    def test_segunda_carga_no_cambia_nada(self):
+        """Cargar dos veces el mismo archivo no modifica filas ni la versión."""
+        primera = sync_profiles(self.items)
+        self.assertEqual(primera.created, 2)
+        version = CatalogVersion.current().version
+
+        segunda = sync_profiles(self.items)
+        self.assertEqual((segunda.created, segunda.updated, segunda.unchanged), (0, 0, 2))
+        self.assertEqual(CatalogVersion.current().version, version)
+
+    def test_actualiza_conservando_ids(self):
+        """Un perfil modificado se actualiza en su misma fila."""
+        sync_profiles(self.items)
+        perfil = Profile.objects.get(name='H 1000x350 179.1')
+
+        self.items[0]['DIMENSION_tf'] = 28
+        result = sync_profiles(self.items)
+
+        self.assertEqual(result.updated, 1)
+        perfil_actualizado = Profile.objects.get(name='H 1000x350 179.1')
+        self.assertEqual(perfil_actualizado.id, perfil.id)
+        self.assertEqual(perfil_actualizado.dimension_tf, 28.0)
+        self.assertEqual(perfil_actualizado.attributes['DIMENSION_tf'], 28)
+
+    def test_elimina_los_que_no_vienen(self):
+        """Los perfiles ausentes del archivo se borran, salvo con delete_missing=False."""
+        sync_profiles(self.items)
+
+        sync_profiles(self.items[:1], delete_missing=False)
+        self.assertEqual(Profile.objects.count(), 2)
+
+        result = sync_profiles(self.items[:1])
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(list(Profile.objects.values_list('name', flat=True)), ['H 1000x350 179.1'])
+
+    def test_duplicados_gana_el_ultimo(self):
+        """Si el archivo repite un nombre se guarda la última aparición."""
+        repetido = dict(self.items[0], AREA_mm2=9999)
+        result = sync_profiles(self.items + [repetido], batch_size=1)
+
+        self.assertEqual((result.created, result.duplicates), (2, 1))
+        self.assertEqual(Profile.objects.get(name='H 1000x350 179.1').area_mm2, 9999.0)
+
+    def test_dry_run_no_guarda(self):
+        """dry_run informa los cambios pero deshace la transacción."""
+        result = sync_profiles(self.items, dry_run=True)
+
+        self.assertEqual(result.created, 2)
+        self.assertFalse(Profile.objects.exists())
+
+
+class TestLectoresStreaming(TestCase):
+    """Tests para los lectores incrementales de profiles_api/readers.py."""
+
+    def test_arreglo_json_en_bloques_pequenos(self):
+        """El parser entrega los mismos elementos que json.load aunque lea de a 7 caracteres."""
+        items = [{'PREFIJO': 'H', 'ALTURA_d': 1000 + i, 'PESO_KG_M': 179.125} for i in range(20)]
+        texto = json.dumps(items, indent=4)
+
+        leidos = list(iter_json_array(io.StringIO(texto), read_size=7))
+        self.assertEqual(leidos, items)
+
+    def test_numero_cortado_entre_bloques(self):
+        """Un número partido entre dos bloques no se decodifica a medias."""
+        leidos = list(iter_json_array(io.StringIO('[12345, 678]'), read_size=3))
+        self.assertEqual(leidos, [12345, 678])
+
+    def test_json_mal_formado(self):
+        """Un arreglo truncado o con basura al final levanta ReaderError."""
+        with self.assertRaises(ReaderError):
+            list(iter_json_array(io.StringIO('[{"PREFIJO": "H"}, {"PREF'), read_size=4))
+        with self.assertRaises(ReaderError):
+            list(iter_json_array(io.StringIO('[1] 2')))
+
+    def test_ndjson_y_csv(self):
+        """NDJSON y CSV producen los mismos dicts que el JSON (números incluidos)."""
+        esperado = [{'PREFIJO': 'T', 'ALTURA_d': 400, 'PESO_KG_M': 40.5}]
+
+        ndjson = io.StringIO('{"PREFIJO": "T", "ALTURA_d": 400, "PESO_KG_M": 40.5}\n\n')
+        self.assertEqual(list(iter_ndjson(ndjson)), esperado)
+
+        csv_texto = io.StringIO('PREFIJO,ALTURA_d,PESO_KG_M,AREA_mm2\r\nT,400,40.5,\r\n')
+        self.assertEqual(list(iter_csv(csv_texto)), esperado)
+
+    def test_load_profiles_desde_csv_gzip(self):
+        """load_profiles lee archivos .csv.gz en streaming."""
+        catalog.invalidate()
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'perfiles.csv.gz')
+            with gzip.open(ruta, 'wt', encoding='utf-8', newline='') as archivo:
+                archivo.write('PREFIJO,ALTURA_d,ANCHURA_bf,PESO_KG_M\n')
+                archivo.write('H,1000,350,179.1\nT,400,200,40.5\n')
+
+            call_command('load_profiles', file=ruta, verbosity=0)
+
+        self.assertEqual(
+            sorted(Profile.objects.values_list('name', flat=True)),
+            ['H 1000x350 179.1', 'T 400x200 40.5'],
+        )
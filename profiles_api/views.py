@@ -3,14 +3,34 @@ API ViewSet para gestión de Perfiles Estructurales.
 
 Este módulo proporciona endpoints RESTful para consultar perfiles de acero
 con filtros avanzados y búsqueda por autocompletado.
+
+Los endpoints de consulta del cotizador (search, get-options, find-unique y
+get-thickness-combinations) se responden desde el índice en memoria de
+catalog.py, sin ir a la base de datos en cada tecla.
+
+Como el catálogo casi nunca cambia, todas las lecturas (GET/HEAD) llevan un
+ETag fuerte derivado de la versión del catálogo: el navegador o un proxy
+revalidan con If-None-Match y reciben un 304 sin cuerpo.
 """
 
+import zlib
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.settings import api_settings
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
+from .catalog import current_version, get_catalog
 from .models import Profile
-from .serializers import ProfileSerializer
+from .pagination import ProfileCursorPagination
+from .renderers import FastJSONRenderer, NDJSONRenderer, ndjson_line
+from .serializers import ProfileRowSerializer, ProfileSerializer
+from .snapshot import negotiate_encoding, open_snapshot
 
 
 class ProfileViewSet(viewsets.ModelViewSet):
@@ -21,7 +41,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     de múltiples vistas relacionadas (list, create, retrieve, update, delete).
     
     Endpoints estándar (generados automáticamente):
-    - GET /api/profiles/ -> list()
+    - GET /api/profiles/ -> list() (acepta ?page_size=, ?fields= y ?format=ndjson)
     - POST /api/profiles/ -> create()
     - GET /api/profiles/{id}/ -> retrieve()
     - PUT/PATCH /api/profiles/{id}/ -> update()
@@ -30,11 +50,112 @@ class ProfileViewSet(viewsets.ModelViewSet):
     Endpoints personalizados (definidos con @action):
     - GET /api/profiles/search/?term=xxx -> search()
     - GET /api/profiles/get-options/?field=xxx -> get_options()
+    - POST /api/profiles/resolve/ -> resolve() (resolución en lote)
     - etc.
     """
+
+    # Campos que se pueden pedir con ?fields=
+    LIST_FIELDS = ProfileRowSerializer.FIELDS
+
+    # Filas que se leen de la BD por cada vuelta del iterator() en NDJSON
+    STREAM_CHUNK_SIZE = 2000
+
+    # Máximo de búsquedas aceptadas en una sola llamada a resolve()
+    MAX_BATCH_LOOKUPS = 500
+
+    # Cache-Control de las lecturas. Las URLs con ?v=<versión vigente> nunca
+    # cambian de contenido (una versión nueva implica otra URL), así que se
+    # pueden guardar por un año; el resto se guarda pero se revalida siempre.
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]  # ✅ FIX CRÍTICO-001
+    pagination_class = ProfileCursorPagination
+    renderer_classes = [FastJSONRenderer] + api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Agrega validación condicional (ETag / Last-Modified) a las lecturas.
+        
+        Si el cliente ya tiene la versión vigente (If-None-Match), respondemos
+        304 antes de ejecutar la vista: ni índice, ni serialización, ni cuerpo.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        stamp = current_version()
+        # self.action todavía no está asignado: lo resolvemos desde action_map
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        etag = self._catalog_etag(request, stamp, action)
+        last_modified = int(stamp.updated_at.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            response['Cache-Control'] = (
+                self.IMMUTABLE_CACHE_CONTROL
+                if request.GET.get('v') == str(stamp.version)
+                else self.REVALIDATE_CACHE_CONTROL
+            )
+        # El mismo URL puede renderizarse como JSON o como API navegable
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lista los perfiles, con tres opciones para catálogos grandes:
+        
+        - ?page_size=N: paginación por cursor (ver pagination.py)
+        - ?fields=id,name: solo los campos pedidos
+        - ?format=ndjson: un perfil por línea, transmitido a medida que se
+          lee la BD con .iterator() (nunca arma la lista completa en memoria)
+        
+        Las filas se leen con .values() y se arman con ProfileRowSerializer,
+        sin instanciar modelos ni pasar por los Fields de DRF.
+        """
+        fields = self._requested_fields(request) or self.LIST_FIELDS
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return self._stream_ndjson(queryset, fields)
+        
+        # 'id' siempre se lee: la paginación por cursor lo necesita
+        rows = queryset.values(*dict.fromkeys(('id',) + fields))
+        serializer = ProfileRowSerializer(fields)
+        
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        
+        return Response(serializer.serialize(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Detalle de un perfil, servido desde el catálogo en memoria."""
+        try:
+            profile = get_catalog().get(int(kwargs[self.lookup_field]))
+        except (TypeError, ValueError):
+            profile = None
+        
+        if profile is None:
+            raise NotFound()
+        return Response(ProfileRowSerializer().to_representation(profile))
+
+    def get_queryset(self):
+        """
+        Permite filtrar el listado con los mismos parámetros que get-options.
+        
+        Ej: GET /api/profiles/?category=H&attributes__ALTURA_d=1100
+        """
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.filter(**self._build_filters_from_params(self.request.query_params))
+        return queryset
 
 
     @action(detail=False, methods=['get'], url_path='search')
@@ -55,19 +176,20 @@ class ProfileViewSet(viewsets.ModelViewSet):
         if len(term) < 1:
             return Response([])
 
-        # Búsqueda case-insensitive limitada a 15 resultados
-        # OPTIMIZACIÓN: [:15] limita en la BD, no en Python (más eficiente)
-        profiles = Profile.objects.filter(name__icontains=term)[:15]
+        # Búsqueda en el índice en memoria, limitada a 15 resultados y
+        # ordenada por relevancia: prefijo del nombre, tokens ("H 1100"
+        # calza con d=1100) y finalmente subcadenas
+        profiles = get_catalog().search(term, limit=15)
 
         # Formatearmos los resultados para el plugin select2 de jQuery
         # Requiere estructura: [{"id": 1, "text": "H 1100x600 | ..."}, ...]
         results = [
             {
-                "id": profile.id,
-                "text": f"{profile.name} | {profile.attributes.get('ALTURA_d', 'N/A')}x"
-                        f"{profile.attributes.get('ANCHURA_bf', 'N/A')} mm",
-                "tf": profile.attributes.get('DIMENSION_tf'),
-                "tw": profile.attributes.get('DIMENSION_tw')
+                "id": profile['id'],
+                "text": f"{profile['name']} | {profile['attributes'].get('ALTURA_d', 'N/A')}x"
+                        f"{profile['attributes'].get('ANCHURA_bf', 'N/A')} mm",
+                "tf": profile['attributes'].get('DIMENSION_tf'),
+                "tw": profile['attributes'].get('DIMENSION_tw')
             }
             for profile in profiles
         ]
@@ -94,11 +216,13 @@ class ProfileViewSet(viewsets.ModelViewSet):
         # Construimos filtros dinámicamente basados en los query params
         filters = self._build_filters_from_params(request.query_params, exclude_key='field')
         
-        # Aplicamos filtros y obtenemos valores únicos del campo solicitado
-        queryset = Profile.objects.filter(**filters)
-        values = queryset.values_list(field, flat=True).distinct().order_by(field)
+        # Obtenemos los valores únicos del campo desde el índice en memoria
+        try:
+            values = get_catalog().options(field, filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
         
-        return Response(list(values))
+        return Response(values)
 
     @action(detail=False, methods=['get'], url_path='find-unique')
     def find_unique(self, request):
@@ -131,20 +255,10 @@ class ProfileViewSet(viewsets.ModelViewSet):
             tf_val = self._convert_to_numeric(tf)
             tw_val = self._convert_to_numeric(tw)
             
-            # Buscamos el perfil con todos los parámetros
-            profile = Profile.objects.filter(
-                category=category,
-                attributes__ALTURA_d=altura_val,
-                attributes__ANCHURA_bf=ancho_val,
-                attributes__DIMENSION_tf=tf_val,
-                attributes__DIMENSION_tw=tw_val
-            ).first()
-
-            if profile:
-                serializer = self.get_serializer(profile)
-                return Response(serializer.data)
-            else:
-                return Response(None)
+            # Buscamos el perfil en el mapa hash (category, d, bf, tf, tw).
+            # Las filas del índice ya tienen la forma de ProfileSerializer.
+            profile = get_catalog().find_unique(category, altura_val, ancho_val, tf_val, tw_val)
+            return Response(profile)
 
         except (ValueError, TypeError) as e:
             # Error de conversión: datos inválidos del frontend
@@ -179,27 +293,115 @@ class ProfileViewSet(viewsets.ModelViewSet):
             # Si hay error de conversión, retornamos lista vacía
             return Response([])
 
-        # Filtramos y obtenemos combinaciones únicas de espesores
-        queryset = Profile.objects.filter(
-            category=category,
-            attributes__ALTURA_d=height,
-            attributes__ANCHURA_bf=width
-        ).values('attributes__DIMENSION_tf', 'attributes__DIMENSION_tw').distinct()
+        # Combinaciones únicas de espesores, precalculadas en el índice y ya
+        # ordenadas por espesor de ala descendente (más grueso primero)
+        data = get_catalog().thickness_combinations(category, height, width)
         
-        # Formateamos la respuesta
-        data = [
-            {
-                'tf': item['attributes__DIMENSION_tf'],  # Espesor de ala
-                'tw': item['attributes__DIMENSION_tw']   # Espesor de alma
-            }
-            for item in queryset
-        ]
+        return Response(data)
+    
+    @action(detail=False, methods=['get'], url_path='catalog-version')
+    def catalog_version(self, request):
+        """
+        Retorna la versión vigente del catálogo.
         
-        # Ordenamos por espesor de ala descendente (más grueso primero)
-        # Usamos lambda con None-safe para evitar errores si hay valores null
-        data.sort(key=lambda x: x['tf'] if x['tf'] is not None else 0, reverse=True)
+        El frontend la usa para construir URLs versionadas
+        (/api/profiles/?v=<version>) que el navegador cachea sin revalidar.
         
-        return Response(data)
+        Uso: GET /api/profiles/catalog-version/
+        """
+        stamp = current_version()
+        return Response({
+            "version": stamp.version,
+            "updated_at": stamp.updated_at,
+        })
+
+    @action(detail=False, methods=['get'], url_path='snapshot')
+    def snapshot(self, request):
+        """
+        Retorna el catálogo completo en formato columnar y precomprimido.
+        
+        Pensado para que el navegador descargue todo el catálogo una vez y
+        filtre los dropdowns en cascada localmente, sin más llamadas.
+        El archivo se genera una sola vez por versión del catálogo y se
+        sirve desde disco en la codificación que acepte el cliente
+        (brotli, gzip o sin comprimir). Ver snapshot.py para el formato.
+        
+        Uso: GET /api/profiles/snapshot/?v=<versión>
+        """
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        
+        response = FileResponse(
+            open_snapshot(get_catalog(), encoding),
+            content_type='application/json',
+        )
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    @action(detail=False, methods=['post'], url_path='resolve', permission_classes=[AllowAny])
+    def resolve(self, request):
+        """
+        Resuelve muchos perfiles en una sola llamada.
+        
+        Al pegar o importar una lista de cortes, el cotizador necesitaba una
+        petición por perfil (detail, find-unique, ...). Este endpoint acepta
+        todas las búsquedas juntas y las resuelve contra el índice en memoria.
+        Es de solo lectura, por eso permite POST sin autenticación.
+        
+        Cada búsqueda puede ser:
+        - Por id:          {"id": 12}
+        - Por nombre:      {"name": "H 1100x600 596.6"}
+        - Por dimensiones: {"category": "H", "attributes__ALTURA_d": 1100,
+                            "attributes__ANCHURA_bf": 600,
+                            "attributes__DIMENSION_tf": 50,
+                            "attributes__DIMENSION_tw": 16}
+        
+        Uso: POST /api/profiles/resolve/ con {"lookups": [...]}
+        
+        Respuesta (en el mismo orden que 'lookups'):
+        {
+            "results": [
+                {"profile": {...}},
+                {"profile": null, "not_found": true},
+                {"profile": null, "error": "..."}
+            ],
+            "found": 1,
+            "missing": 2
+        }
+        """
+        lookups = request.data.get('lookups') if isinstance(request.data, dict) else None
+        
+        if not isinstance(lookups, list):
+            return Response({"error": "El parámetro 'lookups' debe ser una lista."}, status=400)
+        if len(lookups) > self.MAX_BATCH_LOOKUPS:
+            return Response(
+                {"error": f"Máximo {self.MAX_BATCH_LOOKUPS} búsquedas por llamada."},
+                status=400
+            )
+        
+        catalog = get_catalog()
+        results = []
+        found = 0
+        
+        for lookup in lookups:
+            try:
+                profile = self._resolve_lookup(catalog, lookup)
+            except (ValueError, TypeError) as e:
+                results.append({"profile": None, "error": str(e)})
+                continue
+            
+            if profile is None:
+                results.append({"profile": None, "not_found": True})
+            else:
+                found += 1
+                results.append({"profile": profile})
+        
+        return Response({
+            "results": results,
+            "found": found,
+            "missing": len(results) - found,
+        })
     
     # ========================================================================
     # MÉTODOS HELPER PRIVADOS (no son endpoints)
@@ -239,11 +441,98 @@ class ProfileViewSet(viewsets.ModelViewSet):
         
         return float_val
     
+    def _requested_fields(self, request):
+        """
+        Lee ?fields=id,name y valida que sean campos conocidos.
+        
+        Returns:
+            tuple con los campos pedidos, o None si no se pidió filtrar
+        """
+        raw = request.query_params.get('fields', '').strip()
+        if not raw:
+            return None
+        
+        fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+        unknown = [f for f in fields if f not in self.LIST_FIELDS]
+        if unknown or not fields:
+            raise ValidationError({
+                "fields": f"Campos inválidos: {', '.join(unknown)}. "
+                          f"Use: {', '.join(self.LIST_FIELDS)}."
+            })
+        return fields
+    
+    def _stream_ndjson(self, queryset, fields):
+        """Transmite el queryset como NDJSON sin cargarlo completo en memoria."""
+        rows = queryset.order_by('id').values(*fields)
+        
+        def generate():
+            buffer = []
+            for row in rows.iterator(chunk_size=self.STREAM_CHUNK_SIZE):
+                buffer.append(ndjson_line(row))
+                # Enviamos bloques de varias líneas para no hacer un write por perfil
+                if len(buffer) >= 500:
+                    yield ''.join(buffer)
+                    buffer = []
+            if buffer:
+                yield ''.join(buffer)
+        
+        return StreamingHttpResponse(generate(), content_type=NDJSONRenderer.media_type)
+    
+    @staticmethod
+    def _catalog_etag(request, stamp, action=None):
+        """
+        ETag fuerte para una lectura: versión del catálogo + formato pedido.
+        
+        La respuesta de una URL solo depende del catálogo, del renderer
+        negociado (Accept) y, en el snapshot, de la codificación negociada
+        (Accept-Encoding), así que no necesitamos hashear el cuerpo.
+        """
+        accept = zlib.crc32(request.META.get('HTTP_ACCEPT', '').encode())
+        etag = f'catalog-{stamp.version}-{stamp.stamp[:12]}-{accept:08x}'
+        if action == 'snapshot':
+            # El snapshot trae bytes distintos por codificación: cada una
+            # necesita su propio ETag fuerte
+            etag += '-' + negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        return f'"{etag}"'
+    
+    def _resolve_lookup(self, catalog, lookup):
+        """
+        Resuelve una búsqueda individual de resolve() contra el catálogo.
+        
+        Raises:
+            ValueError: Si la búsqueda no tiene un formato reconocido
+        """
+        if not isinstance(lookup, dict):
+            raise ValueError("Cada búsqueda debe ser un objeto.")
+        
+        if lookup.get('id') is not None:
+            return catalog.get(int(lookup['id']))
+        
+        if lookup.get('name'):
+            return catalog.get_by_name(str(lookup['name']).strip())
+        
+        dimension_keys = (
+            'attributes__ALTURA_d', 'attributes__ANCHURA_bf',
+            'attributes__DIMENSION_tf', 'attributes__DIMENSION_tw',
+        )
+        values = [lookup.get(key) for key in dimension_keys]
+        if lookup.get('category') and all(value not in (None, '') for value in values):
+            return catalog.find_unique(
+                lookup['category'],
+                *(self._convert_to_numeric(value) for value in values)
+            )
+        
+        raise ValueError("Búsqueda inválida: use 'id', 'name' o category + dimensiones.")
+    
     def _build_filters_from_params(self, query_params, exclude_key=None):
         """
         Construye un diccionario de filtros desde los query parameters.
         
         Centraliza la lógica de conversión de tipos para evitar duplicación.
+        Los atributos dimensionales (attributes__ALTURA_d, etc.) se traducen
+        a sus columnas materializadas (altura_d, ...), que sí usan índices.
+        Los parámetros que no corresponden a campos del modelo (format,
+        cursor, etc.) se ignoran.
         
         Args:
             query_params: QueryDict de Django con parámetros de la URL
@@ -252,11 +541,6 @@ class ProfileViewSet(viewsets.ModelViewSet):
         Returns:
             dict: Filtros listos para usar en .filter(**filters)
         """
-        # Definimos qué campos deben convertirse a qué tipo
-        # Esto lo sabemos por la estructura del JSON en la BD
-        int_attributes = ['attributes__ALTURA_d', 'attributes__ANCHURA_bf']
-        float_attributes = ['attributes__PESO_KG_M']
-        
         filters = {}
         
         for key, value in query_params.items():
@@ -264,17 +548,23 @@ class ProfileViewSet(viewsets.ModelViewSet):
             if key == exclude_key or not value:
                 continue
             
-            try:
-                # Aplicamos conversión según el tipo esperado
-                if key in int_attributes:
-                    filters[key] = int(float(value))  # float() primero por seguridad
-                elif key in float_attributes:
-                    filters[key] = float(value)
-                else:
-                    # Para strings (como category), usamos el valor directo
+            if key in ('category', 'name'):
+                # Para strings usamos el valor directo
+                filters[key] = value
+            elif key.startswith('attributes__'):
+                attribute = key[len('attributes__'):]
+                column = Profile.MATERIALIZED_ATTRIBUTES.get(attribute)
+                
+                if column is None:
+                    # Atributo no materializado: filtramos por el JSON
                     filters[key] = value
-            except (ValueError, TypeError):
-                # Si un filtro es inválido, lo ignoramos en vez de romper todo
-                continue
+                    continue
+                
+                try:
+                    # float() también acepta "1100", y 1100.0 == 1100 en la BD
+                    filters[column] = float(value)
+                except (ValueError, TypeError):
+                    # Si un filtro es inválido, lo ignoramos en vez de romper todo
+                    continue
         
-        return filters
\ No newline at end of file
+        return filters